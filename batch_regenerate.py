@@ -0,0 +1,358 @@
+"""Offline regeneration of summaries or claim edits for the whole corpus through the Batch API.
+
+Every step records its progress in <workdir>/state.json, so an interrupted run is
+resumed by running the same command again.
+
+Usage (from the repository root):
+    python batch_regenerate.py prepare --task claim_edits --workdir batch_runs/edits
+    python batch_regenerate.py submit --workdir batch_runs/edits [--local]
+    python batch_regenerate.py wait --workdir batch_runs/edits
+    python batch_regenerate.py ingest --workdir batch_runs/edits
+    python batch_regenerate.py run --task summaries --workdir batch_runs/summaries   (all of the above)
+
+--local runs the requests through the app's own rate-limited gateway instead of
+the Batch API and writes the same output format, for testing and small runs.
+"""
+import os
+import json
+import time
+import logging
+import argparse
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from sqlalchemy import select, update
+from models import db, Input, ClaimEdit
+import llm_cache
+import llm_gateway
+import search_index
+from prompt_compaction import compact_for_prompt
+from summarize_input import build_summary_payload, summary_columns
+from generate_claim_edits import (
+    build_claim_edits_payload, claim_edit_chunks, merge_claim_edits, replace_claim_edits, with_page_range
+)
+
+logger = logging.getLogger(__name__)
+
+TASKS = ('summaries', 'claim_edits')
+BATCH_ENDPOINT = '/v1/chat/completions'
+# Batch API limits per input file are 50,000 requests and 200 MB
+BATCH_MAX_REQUESTS = int(os.environ.get('BATCH_MAX_REQUESTS', 50000))
+BATCH_MAX_BYTES = int(os.environ.get('BATCH_MAX_BYTES', 190 * 1024 * 1024))
+BATCH_POLL_SECONDS = int(os.environ.get('BATCH_POLL_SECONDS', 60))
+# Requests in flight at once for --local runs (the gateway's own limits still apply)
+LOCAL_BATCH_CONCURRENCY = int(os.environ.get('LOCAL_BATCH_CONCURRENCY', 4))
+
+FINISHED_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
+
+
+class BatchRun:
+    """Working directory of one regeneration run and its persisted state."""
+
+    def __init__(self, workdir):
+        self.workdir = workdir
+        self.state_path = os.path.join(workdir, 'state.json')
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                self.state = json.load(f)
+        else:
+            self.state = {}
+
+    def path(self, name):
+        return os.path.join(self.workdir, name)
+
+    def save(self):
+        os.makedirs(self.workdir, exist_ok=True)
+        # Write then rename so an interrupted save never leaves a truncated state file
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+
+def select_input_ids(task, input_ids=None, document_type=None, missing_only=False):
+    query = select(Input.id).order_by(Input.id)
+    if input_ids:
+        query = query.where(Input.id.in_(input_ids))
+    if document_type:
+        query = query.where(Input.document_type == document_type)
+    if missing_only:
+        if task == 'summaries':
+            query = query.where((Input.document_summary.is_(None)) | (Input.document_summary == ''))
+        else:
+            query = query.where(Input.id.not_in(select(ClaimEdit.input_id)))
+    return list(db.session.scalars(query))
+
+
+def build_requests(task, input_doc):
+    """(custom_id, payload, page range) for one input; large documents give one request per page window.
+
+    Claim edit requests are built as in generate_claim_edits, and the [first, last] page range of
+    each window is what the edits it returns are recorded with (None for summaries).
+    """
+    if task == 'summaries':
+        return [(f"summaries:{input_doc.id}", build_summary_payload(input_doc.document_contents), None)]
+
+    document_contents = compact_for_prompt(input_doc.document_contents, 'generate_claim_edits')
+    return [
+        (f"claim_edits:{input_doc.id}:{index}", build_claim_edits_payload(input_doc.document_summary, chunk.text),
+         [chunk.first_page, chunk.last_page])
+        for index, chunk in enumerate(claim_edit_chunks(document_contents))
+    ]
+
+
+def prepare(run, task, input_ids=None, document_type=None, missing_only=False):
+    """Write the Batch API request files for every selected input."""
+    if run.state.get('parts'):
+        logger.info(f"{run.workdir} is already prepared")
+        return run.state
+
+    selected = select_input_ids(task, input_ids, document_type, missing_only)
+    os.makedirs(run.workdir, exist_ok=True)
+    parts = []
+    requests_per_input = {}
+    page_ranges = {}
+    out = None
+    for input_id in selected:
+        input_doc = db.session.get(Input, input_id)
+        requests = build_requests(task, input_doc)
+        lines = [
+            json.dumps({"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": payload}) + '\n'
+            for custom_id, payload, _ in requests
+        ]
+        # Keep the deferred document text from piling up in the session
+        db.session.expunge(input_doc)
+        requests_per_input[str(input_id)] = len(lines)
+        if task == 'claim_edits':
+            page_ranges[str(input_id)] = [page_range for _, _, page_range in requests]
+
+        size = sum(len(line.encode('utf-8')) for line in lines)
+        if out is None or parts[-1]['requests'] + len(lines) > BATCH_MAX_REQUESTS or parts[-1]['bytes'] + size > BATCH_MAX_BYTES:
+            if out:
+                out.close()
+            name = f"requests-{len(parts):03d}.jsonl"
+            parts.append({'input_file': name, 'output_file': None, 'requests': 0, 'bytes': 0, 'batch_id': None, 'status': 'prepared'})
+            out = open(run.path(name), 'w')
+        out.writelines(lines)
+        parts[-1]['requests'] += len(lines)
+        parts[-1]['bytes'] += size
+    if out:
+        out.close()
+
+    run.state.update(
+        task=task,
+        created_at=datetime.utcnow().isoformat(),
+        requests_per_input=requests_per_input,
+        page_ranges=page_ranges,
+        parts=parts,
+        applied=[]
+    )
+    run.save()
+    logger.info(f"Prepared {sum(part['requests'] for part in parts)} requests for {len(selected)} inputs in {len(parts)} batch files")
+    return run.state
+
+
+def submit(run, local=False):
+    """Submit every part that has not been submitted yet (or run it locally with local=True)."""
+    for part in run.state.get('parts', []):
+        if part['batch_id']:
+            continue
+        if local:
+            # Answers are appended to the output file as they arrive, so a rerun picks up where this stopped
+            part['output_file'] = run_local_batch(run.path(part['input_file']), run.path(_output_name(part)))
+            part['batch_id'] = f"local-{part['input_file']}"
+            part['status'] = 'completed'
+        else:
+            client = llm_gateway.get_client()
+            with open(run.path(part['input_file']), 'rb') as f:
+                uploaded = client.files.create(file=f, purpose='batch')
+            batch = client.batches.create(
+                input_file_id=uploaded.id, endpoint=BATCH_ENDPOINT, completion_window='24h'
+            )
+            part['batch_id'] = batch.id
+            part['status'] = batch.status
+            logger.info(f"Submitted {part['input_file']} as batch {batch.id}")
+        run.save()
+
+
+def refresh(run):
+    """Update the status of submitted batches and download the output of finished ones."""
+    client = None
+    for part in run.state.get('parts', []):
+        if not part['batch_id'] or part['status'] in FINISHED_STATUSES:
+            continue
+        client = client or llm_gateway.get_client()
+        batch = client.batches.retrieve(part['batch_id'])
+        part['status'] = batch.status
+        if batch.status == 'completed':
+            output_name = _output_name(part)
+            with open(run.path(output_name), 'w') as f:
+                for file_id in (batch.output_file_id, batch.error_file_id):
+                    if file_id:
+                        f.write(client.files.content(file_id).text)
+            part['output_file'] = output_name
+        run.save()
+    return [part['status'] for part in run.state.get('parts', []) if part['batch_id']]
+
+
+def wait(run, poll_seconds=BATCH_POLL_SECONDS):
+    while True:
+        statuses = refresh(run)
+        if all(status in FINISHED_STATUSES for status in statuses):
+            return statuses
+        logger.info(f"Batch statuses: {', '.join(statuses)}; checking again in {poll_seconds}s")
+        time.sleep(poll_seconds)
+
+
+def ingest(run):
+    """Apply finished results to the database; inputs already applied are skipped."""
+    task = run.state['task']
+    payloads = {}
+    contents = {}
+    errors = {}
+    for part in run.state['parts']:
+        if not part['output_file']:
+            continue
+        with open(run.path(part['input_file'])) as f:
+            for line in f:
+                request = json.loads(line)
+                payloads[request['custom_id']] = request['body']
+        with open(run.path(part['output_file'])) as f:
+            for line in f:
+                result = json.loads(line)
+                response = result.get('response') or {}
+                if response.get('status_code') == 200:
+                    contents[result['custom_id']] = response['body']['choices'][0]['message']['content']
+                else:
+                    errors[result['custom_id']] = result.get('error') or response.get('body')
+
+    applied = set(run.state['applied'])
+    results = {}
+    for input_id, request_count in run.state['requests_per_input'].items():
+        if int(input_id) in applied:
+            continue
+        custom_ids = _custom_ids(task, input_id, request_count)
+        if all(custom_id in contents for custom_id in custom_ids):
+            results[int(input_id)] = [json.loads(contents[custom_id]) for custom_id in custom_ids]
+
+    if task == 'summaries':
+        rows = [{'id': input_id, **summary_columns(parsed[0])} for input_id, parsed in results.items()]
+        if rows:
+            # ORM bulk UPDATE by primary key: one executemany for every input
+            db.session.execute(update(Input), rows)
+            search_index.index_summaries([row['id'] for row in rows])
+            db.session.commit()
+        run.state['applied'].extend(results)
+        run.save()
+    else:
+        # Runs prepared before page ranges were recorded store their edits without one
+        page_ranges = run.state.get('page_ranges', {})
+        try:
+            for input_id, parsed in results.items():
+                ranges = page_ranges.get(str(input_id)) or [[None, None]] * len(parsed)
+                chunks = [with_page_range(chunk['claim_edits'], first_page, last_page)
+                          for chunk, (first_page, last_page) in zip(parsed, ranges)]
+                edits = chunks[0] if len(chunks) == 1 else merge_claim_edits(chunks)
+                replace_claim_edits(input_id, edits)
+                run.state['applied'].append(input_id)
+        finally:
+            run.save()
+
+    # Interactive regeneration of an unchanged input is then served from the cache
+    for custom_id, content in contents.items():
+        llm_cache.store_completion(payloads[custom_id], content)
+
+    summary = {
+        'applied': len(results),
+        'already_applied': len(applied),
+        'incomplete': len(run.state['requests_per_input']) - len(results) - len(applied),
+        'failed_requests': len(errors)
+    }
+    run.state['ingested'] = summary
+    run.save()
+    return summary
+
+
+def run_local_batch(input_path, output_path, concurrency=LOCAL_BATCH_CONCURRENCY):
+    """Local stand-in for the Batch API: answer every request of a JSONL file, writing Batch API output lines.
+
+    Requests already answered in output_path are skipped, so an interrupted run resumes.
+    """
+    done = set()
+    if os.path.exists(output_path):
+        with open(output_path) as f:
+            done = {json.loads(line)['custom_id'] for line in f if line.strip()}
+    with open(input_path) as f:
+        pending = [request for request in map(json.loads, f) if request['custom_id'] not in done]
+
+    write_lock = threading.Lock()
+
+    def answer(request):
+        try:
+            response = llm_gateway.chat_completion(request['body'], caller='batch_regenerate')
+            result = {"custom_id": request['custom_id'], "error": None, "response": {
+                "status_code": 200, "body": response.model_dump()
+            }}
+        except Exception as e:
+            logger.error(f"Local batch request {request['custom_id']} failed: {str(e)}")
+            result = {"custom_id": request['custom_id'], "response": None, "error": {
+                "code": type(e).__name__, "message": str(e)
+            }}
+        with write_lock, open(output_path, 'a') as out:
+            out.write(json.dumps(result) + '\n')
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        for future in as_completed([executor.submit(answer, request) for request in pending]):
+            future.result()
+    return os.path.basename(output_path)
+
+
+def status(run):
+    parts = run.state.get('parts', [])
+    return {
+        'task': run.state.get('task'),
+        'parts': [{key: part[key] for key in ('input_file', 'requests', 'batch_id', 'status')} for part in parts],
+        'inputs': len(run.state.get('requests_per_input', {})),
+        'applied': len(run.state.get('applied', [])),
+    }
+
+
+def _custom_ids(task, input_id, request_count):
+    if task == 'summaries':
+        return [f"summaries:{input_id}"]
+    return [f"claim_edits:{input_id}:{index}" for index in range(request_count)]
+
+
+def _output_name(part):
+    return part['input_file'].replace('requests-', 'results-')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=('prepare', 'submit', 'wait', 'ingest', 'status', 'run'))
+    parser.add_argument('--workdir', required=True, help="directory holding the request/result files and state.json")
+    parser.add_argument('--task', choices=TASKS, help="what to regenerate (prepare and run)")
+    parser.add_argument('--input-id', type=int, action='append', help="only these inputs (repeatable)")
+    parser.add_argument('--document-type', help="only inputs of this document type")
+    parser.add_argument('--missing-only', action='store_true', help="only inputs without a summary / claim edits")
+    parser.add_argument('--local', action='store_true', help="run requests locally instead of the Batch API")
+    parser.add_argument('--poll-seconds', type=int, default=BATCH_POLL_SECONDS)
+    args = parser.parse_args()
+
+    from main import app
+
+    batch_run = BatchRun(args.workdir)
+    with app.app_context():
+        if args.command in ('prepare', 'run'):
+            if not args.task and not batch_run.state:
+                parser.error("--task is required to prepare a new run")
+            prepare(batch_run, args.task, args.input_id, args.document_type, args.missing_only)
+        if args.command in ('submit', 'run'):
+            submit(batch_run, local=args.local)
+        if args.command in ('wait', 'run'):
+            wait(batch_run, args.poll_seconds)
+        if args.command in ('ingest', 'run'):
+            print(json.dumps(ingest(batch_run), indent=2))
+        if args.command == 'status':
+            refresh(batch_run)
+            print(json.dumps(status(batch_run), indent=2))
@@ -0,0 +1,82 @@
+"""Benchmark replacing an input's claim edits: one ORM object per edit vs. the bulk insert.
+
+Runs against DATABASE_URL when it is set (e.g. a scratch PostgreSQL database),
+otherwise against a temporary SQLite file.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_claim_edit_insert --edits 100 500 2000
+"""
+import os
+import time
+import tempfile
+import argparse
+
+if 'DATABASE_URL' not in os.environ:
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.sqlite')
+
+from flask import Flask
+from models import db, Input, ClaimEdit, configure_database
+from claim_segments import index_claim_edits, remove_index_for_input
+from generate_claim_edits import replace_claim_edits
+
+def sample_edits(count):
+    return [{
+        'edit_description': f"Edit {i}: validate the billing provider on every claim",
+        'edit_message': f"Claim rejected by edit {i}",
+        'edit_conditions': f"CLM05-1 must be 11 in Loop 2300 when NM1*85 is present (rule {i})",
+        'edit_non_conditions': "Skip the HI segment check for dental claims"
+    } for i in range(count)]
+
+def legacy_replace(input_id, claim_edits_data):
+    # The previous implementation: delete and commit, then add ORM objects one by one
+    remove_index_for_input(input_id)
+    ClaimEdit.query.filter_by(input_id=input_id).delete()
+    db.session.commit()
+    new_edits = []
+    for edit_data in claim_edits_data:
+        new_edit = ClaimEdit(input_id=input_id, **edit_data)
+        db.session.add(new_edit)
+        new_edits.append(new_edit)
+    db.session.flush()
+    index_claim_edits(new_edits)
+    db.session.commit()
+
+def time_run(label, func, input_id, edits, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(input_id, edits)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    stored = ClaimEdit.query.filter_by(input_id=input_id).count()
+    if stored != len(edits):
+        raise SystemExit(f"{label} stored {stored} edits, expected {len(edits)}")
+    print(f"{label:<22} {len(edits):6} edits {best * 1000:10.1f} ms {len(edits) / best:12.0f} edits/sec")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--edits', type=int, nargs='+', default=[100, 500, 2000])
+    parser.add_argument('--repeat', type=int, default=3, help="runs per measurement, the best is reported")
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    configure_database(app)
+    with app.app_context():
+        db.create_all()
+        print(f"Database: {db.engine.url.render_as_string(hide_password=True)}")
+        bench_input = Input(document_name="Insert benchmark", document_url="🚫 Not Applicable", document_contents="")
+        db.session.add(bench_input)
+        db.session.commit()
+        try:
+            for count in args.edits:
+                edits = sample_edits(count)
+                time_run("legacy ORM objects", legacy_replace, bench_input.id, edits, args.repeat)
+                time_run("bulk insert", replace_claim_edits, bench_input.id, edits, args.repeat)
+        finally:
+            remove_index_for_input(bench_input.id)
+            ClaimEdit.query.filter_by(input_id=bench_input.id).delete()
+            db.session.delete(bench_input)
+            db.session.commit()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Benchmark PDF text extraction: the original serial loop vs. the parallel mode.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_extract --pages 300 --workers 4
+    python -m benchmarks.bench_extract --pdf path/to/manual.pdf
+"""
+import os
+import time
+import argparse
+from io import BytesIO
+from pdfplumber import open as open_pdf
+from extract_contents import extract_text_from_pdf
+from benchmarks.sample_pdfs import make_pdf
+
+def legacy_serial_extract(data):
+    # The pre-parallel implementation: one page at a time, string built with +=
+    with open_pdf(BytesIO(data)) as pdf:
+        all_text = ""
+        for i, page in enumerate(pdf.pages, start=1):
+            extracted_text = page.extract_text()
+            cleaned_text = '\n'.join([line.strip() for line in extracted_text.split('\n') if line.strip()])
+            all_text += f"🅿️ Start of Page {i}\n{cleaned_text}\n"
+    return all_text
+
+def time_run(label, func, data, page_count):
+    start = time.perf_counter()
+    text = func(data)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed:8.2f}s {page_count / elapsed:10.1f} pages/sec")
+    return text
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pdf', help="PDF file to extract (default: a generated sample)")
+    parser.add_argument('--pages', type=int, default=300, help="page count of the generated sample")
+    parser.add_argument('--workers', type=int, nargs='+', default=[2, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    if args.pdf:
+        with open(args.pdf, 'rb') as f:
+            data = f.read()
+    else:
+        data = make_pdf(args.pages)
+    with open_pdf(BytesIO(data)) as pdf:
+        page_count = len(pdf.pages)
+    print(f"{page_count} pages, {len(data) / 1024:.0f} KiB")
+
+    baseline = time_run("legacy serial loop", legacy_serial_extract, data, page_count)
+    time_run("serial (workers=1)", lambda d: extract_text_from_pdf(d, workers=1), data, page_count)
+    for workers in args.workers:
+        text = time_run(f"parallel (workers={workers})", lambda d: extract_text_from_pdf(d, workers=workers), data, page_count)
+        if text != baseline:
+            raise SystemExit(f"parallel output with {workers} workers differs from the serial loop")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+"""Local OpenAI-compatible server with canned structured outputs, for offline runs.
+
+Answers /v1/chat/completions (plain and streamed) after a configurable latency, with
+responses shaped by the request's json_schema name (document_summary, claim_edits,
+edit_conflicts, claim_rules). It also serves generated PDFs at /docs/<pages>.pdf?revision=<n>, so
+ingest can be exercised without network-hosted documents.
+
+Usage (from the repository root):
+    python -m benchmarks.fake_openai --port 8900 --latency 0.5
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1 OPENAI_API_KEY=fake python main.py
+"""
+import re
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from functools import lru_cache
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from benchmarks.sample_pdfs import make_pdf, HEADER
+
+PDF_PATH_PATTERN = re.compile(r'^/docs/(\d+)\.pdf$')
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.2, jitter=0.0, edits_per_response=8, stream_chunk_chars=24, stream_interval=0.005):
+        super().__init__(address, FakeOpenAIHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.edits_per_response = edits_per_response
+        self.stream_chunk_chars = stream_chunk_chars
+        self.stream_interval = stream_interval
+        self.completions = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        match = PDF_PATH_PATTERN.match(url.path)
+        if not match:
+            return self._send(404, 'text/plain', b'not found')
+        revision = parse_qs(url.query).get('revision', ['0'])[0]
+        self._send(200, 'application/pdf', sample_document(int(match.group(1)), revision))
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            return self._send(404, 'application/json', b'{"error": {"message": "not found"}}')
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        with self.server.lock:
+            self.server.completions += 1
+
+        time.sleep(max(0.0, self.server.latency + random.uniform(-self.server.jitter, self.server.jitter)))
+        content = json.dumps(canned_response(payload, self.server.edits_per_response))
+        if payload.get('stream'):
+            self._stream(payload, content)
+        else:
+            self._send(200, 'application/json', json.dumps(completion(payload, content)).encode('utf-8'))
+
+    def _stream(self, payload, content):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        size = self.server.stream_chunk_chars
+        for start in range(0, len(content), size):
+            self._write_chunk(completion_chunk(payload, {"content": content[start:start + size]}))
+            time.sleep(self.server.stream_interval)
+        self._write_chunk(completion_chunk(payload, {}, finish_reason='stop'))
+        if payload.get('stream_options', {}).get('include_usage'):
+            self._write_chunk({**completion_chunk(payload, {}), "choices": [], "usage": completion(payload, content)["usage"]})
+        self._write_raw(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, chunk):
+        self._write_raw(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+
+    def _write_raw(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@lru_cache(maxsize=64)
+def sample_document(pages, revision):
+    return make_pdf(pages, title=f"{HEADER} - revision {revision}")
+
+
+def canned_response(payload, edits_per_response):
+    """Schema-valid response content for the app's structured output requests."""
+    schema = payload.get('response_format', {}).get('json_schema', {}).get('name')
+    prompt = ''.join(str(message.get('content', '')) for message in payload.get('messages', []))
+    # Distinct prompts (e.g. document chunks) get distinct edits so merging keeps them all
+    digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:8]
+
+    if schema == 'document_summary':
+        return {
+            "summary": "* 📄 **Scope:** Professional claims.\n* 🧾 **Edits:** Loop 2300 CLM05-1 rules.\n* ⚠️ **Exceptions:** Dental claims.",
+            "generated_name": f"Benchmark Manual {digest}",
+            "document_type": "Provider Manual"
+        }
+    if schema == 'claim_edits':
+        return {"claim_edits": [{
+            "edit_description": f"Edit {digest}-{i}: validate place of service",
+            "edit_message": "We recommend that you provide a valid place of service code.",
+            "edit_conditions": f"Loop 2300 CLM05-1 must be 11 or 22 when NM1*85 NM109 is present (rule {i})",
+            "edit_non_conditions": "N/A"
+        } for i in range(edits_per_response)]}
+    if schema == 'claim_rules':
+        rule = {"when": {"field": "NM1*85.NM109", "op": "present", "values": []},
+                "require": {"field": "CLM05-1", "op": "in", "values": ["11", "22"]}, "unless": None}
+        return {"rules": [
+            {"id": int(edit_id), "supported": True, "rule": json.dumps(rule), "notes": ""}
+            for edit_id in re.findall(r'"id": (\d+)', prompt)
+        ]}
+    if schema == 'edit_conflicts':
+        edit_ids = [int(edit_id) for edit_id in re.findall(r'"id": (\d+)', prompt)]
+        conflicts = []
+        if len(edit_ids) >= 2:
+            conflicts.append({
+                "title": "CLM05-1 place of service conflict",
+                "edit_ids": edit_ids[:2],
+                "details": "* **Segment:** CLM05-1 is validated by both edits.\n* **Recommendation:** Align the allowed codes."
+            })
+        return {"conflicts": conflicts}
+    return {}
+
+
+def completion(payload, content):
+    prompt_tokens = len(json.dumps(payload.get('messages', []))) // 4
+    completion_tokens = len(content) // 4
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": payload.get('model', 'fake'),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content, "refusal": None},
+            "finish_reason": "stop",
+            "logprobs": None
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+    }
+
+
+def completion_chunk(payload, delta, finish_reason=None):
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": payload.get('model', 'fake'),
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason, "logprobs": None}]
+    }
+
+
+def start_server(port=0, **settings):
+    """Start the fake server on a background thread and return it (see .base_url)."""
+    server = FakeOpenAIServer(('127.0.0.1', port), **settings)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency', type=float, default=0.2, help="seconds before each completion starts")
+    parser.add_argument('--jitter', type=float, default=0.0, help="+/- seconds of random extra latency")
+    parser.add_argument('--edits', type=int, default=8, help="claim edits per claim_edits response")
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(('127.0.0.1', args.port), latency=args.latency, jitter=args.jitter, edits_per_response=args.edits)
+    print(f"Fake OpenAI server on {server.base_url}/v1 (documents under {server.base_url}/docs/<pages>.pdf)")
+    server.serve_forever()
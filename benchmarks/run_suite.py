@@ -0,0 +1,251 @@
+"""Offline performance suite covering ingest, extraction, the LLM-backed operations and the listing routes.
+
+Everything runs locally: a fake OpenAI-compatible server (benchmarks.fake_openai) answers
+model calls after a fixed latency and serves generated PDFs, and the database is a
+temporary SQLite file unless --database-url points at a scratch PostgreSQL database.
+Each scenario reports latency percentiles, throughput where it has a natural unit, and
+the peak Python memory of one extra traced run.
+
+Usage (from the repository root):
+    python -m benchmarks.run_suite
+    python -m benchmarks.run_suite --iterations 10 --latency 0.5 --json results.json
+    python -m benchmarks.run_suite --compare baseline.json --threshold 0.2
+    python -m benchmarks.run_suite --database-url postgresql://localhost/claims_bench --only listing
+"""
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import tempfile
+import resource
+import tracemalloc
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Scenario:
+    def __init__(self, name, func, iterations=None, unit=None, setup=None):
+        self.name = name
+        self.func = func  # called with the iteration number, returns units processed (or None)
+        self.iterations = iterations
+        self.unit = unit
+        self.setup = setup  # untimed preparation, run once before the iterations
+
+    def run(self, iterations):
+        iterations = self.iterations or iterations
+        if self.setup:
+            self.setup()
+        timings = []
+        units = 0
+        for iteration in range(iterations):
+            start = time.perf_counter()
+            processed = self.func(iteration)
+            timings.append(time.perf_counter() - start)
+            units += processed or 0
+
+        # One more run under tracemalloc, kept out of the timings it would distort
+        tracemalloc.start()
+        self.func(iterations)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        result = {
+            'iterations': iterations,
+            'p50_ms': percentile(timings, 0.50) * 1000,
+            'p90_ms': percentile(timings, 0.90) * 1000,
+            'p99_ms': percentile(timings, 0.99) * 1000,
+            'max_ms': max(timings) * 1000,
+            'peak_kib': peak / 1024,
+        }
+        if self.unit and units:
+            result['throughput'] = units / sum(timings)
+            result['unit'] = self.unit
+        return result
+
+
+def build_scenarios(args, server):
+    # App modules read their configuration at import time, so they are imported here
+    from main import app
+    from models import db, Input
+    from extract_contents import extract_text_from_pdf
+    from summarize_input import summarize_input
+    from generate_claim_edits import generate_claim_edits, insert_claim_edits
+    from conflicts_gpt import analyze_edit_conflicts
+    from benchmarks.sample_pdfs import make_pdf
+    import page_cache
+
+    context = app.app_context()
+    context.push()
+    db.create_all()
+    client = app.test_client()
+    docs_url = f"{server.base_url}/docs"
+    run_id = int(time.time())
+    scenarios = []
+    ingested = []
+
+    def ingest(iteration, pages=args.ingest_pages):
+        # A new revision per call, so every document is downloaded and extracted
+        new_input = Input.create_from_url(f"{docs_url}/{pages}.pdf?revision={run_id}-{iteration}")
+        db.session.add(new_input)
+        db.session.commit()
+        ingested.append(new_input.id)
+        return pages
+
+    def ingest_duplicate(iteration):
+        # Same content as an existing input: downloaded and hashed, but not extracted again
+        new_input = Input.create_from_url(f"{docs_url}/{args.ingest_pages}.pdf?revision={run_id}-0")
+        db.session.add(new_input)
+        db.session.commit()
+        return 1
+
+    scenarios.append(Scenario(f"ingest create_from_url ({args.ingest_pages} pages)", ingest, unit='pages'))
+    scenarios.append(Scenario("ingest duplicate content", ingest_duplicate, unit='documents'))
+
+    for pages in args.pages:
+        data = make_pdf(pages)
+        scenarios.append(Scenario(
+            f"extract_text_from_pdf ({pages} pages)", lambda iteration, data=data, pages=pages: (extract_text_from_pdf(data), pages)[1],
+            unit='pages'
+        ))
+
+    def llm_input(iteration):
+        return ingested[iteration % min(len(ingested), args.llm_inputs)]
+
+    scenarios.append(Scenario("summarize_input", lambda iteration: summarize_input(llm_input(iteration), force=True) and 1, unit='documents'))
+    scenarios.append(Scenario("summarize_input (cached)", lambda iteration: summarize_input(llm_input(iteration)) and 1, unit='documents'))
+    scenarios.append(Scenario(
+        "generate_claim_edits", lambda iteration: generate_claim_edits(llm_input(iteration), force=True) and 1, unit='documents'
+    ))
+    scenarios.append(Scenario(
+        "analyze_edit_conflicts (full)", lambda iteration: analyze_edit_conflicts(force=True) and None, iterations=max(1, args.iterations // 2)
+    ))
+    scenarios.append(Scenario("analyze_edit_conflicts (nothing new)", lambda iteration: analyze_edit_conflicts() and None))
+
+    def seed_listings():
+        if Input.query.count() >= args.listing_inputs:
+            return
+        for number in range(args.listing_inputs):
+            listing_input = Input(
+                document_name=f"Listing benchmark input {number}",
+                document_url="🚫 Not Applicable",
+                document_summary="* 📄 **Scope:** Benchmark row.",
+                document_type="Provider Manual"
+            )
+            db.session.add(listing_input)
+            db.session.flush()
+            insert_claim_edits(listing_input.id, [{
+                'edit_description': f"Listing edit {number}-{i}",
+                'edit_message': "We recommend that you provide the billing provider NPI.",
+                'edit_conditions': "NM1*85 NM109 must be a valid NPI in Loop 2010AA",
+                'edit_non_conditions': "N/A"
+            } for i in range(args.listing_edits_per_input)])
+        db.session.commit()
+
+    def get(path, cached=False):
+        def request(iteration):
+            if not cached:
+                # Time the render and its queries, not a page cache hit
+                page_cache.invalidate()
+            response = client.get(path)
+            if response.status_code != 200:
+                raise RuntimeError(f"GET {path} returned {response.status_code}")
+            return 1
+        return request
+
+    middle_input = args.listing_inputs // 2
+    for path in ('/', f'/api/inputs?after={middle_input}', '/claim_edits', '/api/claim_edits?segment=NM1', '/conflicts', '/segments'):
+        scenarios.append(Scenario(f"listing GET {path}", get(path), unit='requests', setup=seed_listings))
+    def warm(path):
+        def setup():
+            seed_listings()
+            client.get(path)
+        return setup
+
+    for path in ('/', '/claim_edits', '/conflicts'):
+        scenarios.append(Scenario(f"listing GET {path} (page cache hit)", get(path, cached=True), unit='requests',
+                                  setup=warm(path)))
+
+    return scenarios
+
+
+def print_results(results):
+    print(f"{'scenario':<46} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9} {'peak KiB':>10}  throughput")
+    for name, result in results.items():
+        throughput = f"{result['throughput']:.1f} {result['unit']}/s" if 'throughput' in result else ''
+        print(
+            f"{name:<46} {result['p50_ms']:9.1f} {result['p90_ms']:9.1f} {result['p99_ms']:9.1f} "
+            f"{result['max_ms']:9.1f} {result['peak_kib']:10.0f}  {throughput}"
+        )
+
+
+def compare(results, baseline, threshold):
+    """Print scenarios whose p50 grew by more than threshold; returns the number of regressions."""
+    regressions = 0
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        change = (result['p50_ms'] - previous['p50_ms']) / previous['p50_ms'] if previous['p50_ms'] else 0.0
+        if change > threshold:
+            regressions += 1
+            print(f"REGRESSION {name}: p50 {previous['p50_ms']:.1f} ms -> {result['p50_ms']:.1f} ms ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help="scratch database to use (default: a temporary SQLite file)")
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.2, help="fake model latency in seconds")
+    parser.add_argument('--edits', type=int, default=8, help="claim edits per fake claim_edits response")
+    parser.add_argument('--pages', type=int, nargs='+', default=[10, 50, 200], help="PDF sizes for the extraction scenarios")
+    parser.add_argument('--ingest-pages', type=int, default=20)
+    parser.add_argument('--llm-inputs', type=int, default=3, help="ingested inputs reused by the LLM scenarios")
+    parser.add_argument('--listing-inputs', type=int, default=500)
+    parser.add_argument('--listing-edits-per-input', type=int, default=10)
+    parser.add_argument('--only', help="run only scenarios whose name contains this text")
+    parser.add_argument('--json', help="write the results to this file")
+    parser.add_argument('--compare', help="results file of an earlier run to check for regressions")
+    parser.add_argument('--threshold', type=float, default=0.25, help="allowed p50 growth before a regression is reported")
+    args = parser.parse_args()
+
+    from benchmarks.fake_openai import start_server
+    server = start_server(latency=args.latency, edits_per_response=args.edits)
+
+    os.environ['DATABASE_URL'] = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'suite.sqlite')
+    os.environ['OPENAI_BASE_URL'] = f"{server.base_url}/v1"
+    os.environ['OPENAI_API_KEY'] = 'fake'
+
+    scenarios = build_scenarios(args, server)
+    print(f"Database: {os.environ['DATABASE_URL']}, model latency {args.latency}s, {args.iterations} iterations")
+
+    results = {}
+    for scenario in scenarios:
+        # Ingest runs first even when filtered out: the LLM scenarios need documents
+        if args.only and args.only not in scenario.name and not scenario.name.startswith('ingest create_from_url'):
+            continue
+        results[scenario.name] = scenario.run(args.iterations)
+
+    print_results(results)
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"Process max RSS: {max_rss / (1024 * 1024 if sys.platform == 'darwin' else 1024):.0f} MiB; {server.completions} model calls")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            if compare(results, json.load(f), args.threshold):
+                sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
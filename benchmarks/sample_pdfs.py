@@ -0,0 +1,57 @@
+"""Generate synthetic regulation-style PDFs without any PDF library.
+
+Each page has a running header and footer (like real CMS/Medicaid manuals)
+and body lines that mention claim segments, so the output exercises the
+same extraction and prompt paths as real documents.
+"""
+
+HEADER = "State Medicaid Provider Manual - Professional Claims (837P)"
+BODY_LINES = [
+    "Section {page}.{line}: Loop 2300 CLM05-1 place of service must be 11 or 22 for office visits.",
+    "When NM1*85 billing provider is present, NM109 must contain a valid 10 digit NPI.",
+    "HI01-2 diagnosis codes must be valid ICD-10-CM codes on the date of service in DTP*472.",
+    "SV1-01 procedure code modifiers are not required when the claim frequency code is 8.",
+    "REF*G1 prior authorization number is required for durable medical equipment claims.",
+]
+
+def make_pdf(page_count, lines_per_page=40, title=HEADER):
+    """Return the bytes of a text PDF with `page_count` pages; `title` is the running header."""
+    objects = [None, None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+
+    for page in range(1, page_count + 1):
+        ops = ["BT /F1 9 Tf 11 TL 40 770 Td", f"({_escape(title)}) Tj T* T*"]
+        for line in range(lines_per_page):
+            text = BODY_LINES[line % len(BODY_LINES)].format(page=page, line=line)
+            ops.append(f"({_escape(text)}) Tj T*")
+        ops.append(f"T* (Page {page} of {page_count}) Tj ET")
+        stream = "\n".join(ops).encode('latin-1')
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append((
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {content_id} 0 R "
+            f"/Resources << /Font << /F1 3 0 R >> >> >>"
+        ).encode('latin-1'))
+        page_ids.append(len(objects))
+
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode('latin-1')
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n".encode('latin-1') + body + b"\nendobj\n"
+
+    xref_offset = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode('latin-1')
+    for offset in offsets:
+        output += f"{offset:010d} 00000 n \n".encode('latin-1')
+    output += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n"
+    ).encode('latin-1')
+    return bytes(output)
+
+def _escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
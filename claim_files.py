@@ -0,0 +1,231 @@
+"""Read claims for rule_engine from CSV, JSON Lines or X12 837 files.
+
+Field names are X12 element references, the same names the model is told to use when
+compiling rules:
+
+    CLM02, CLM05-1      element 02 of CLM; component 1 of composite element 05
+    NM1*85.NM109        NM109 of the NM1 segment whose first element is 85 (billing provider)
+    NM1*85.N403         N4 of the address that follows NM1*85
+    DTP*472.DTP03       DTP03 of the DTP segment qualified 472 (likewise REF, AMT, PRV, PER)
+    line_count          number of service lines (LX) on the claim
+
+In 837 files a claim is its CLM segment and everything up to the next CLM or HL, plus
+the billing provider, subscriber and patient levels above it. When a segment occurs more
+than once (e.g. on several service lines) its first occurrence gives the value. CSV
+headers and JSON Lines keys use these names directly; the claim id comes from a
+claim_id column, CLM01, or the record's position.
+
+read_chunks() only splits a file into batches of raw records, cheaply, in the calling
+process; build_batch() does the parsing, so it runs in the rule engine's workers.
+"""
+import csv
+import json
+from itertools import islice
+from rule_engine import ClaimBatch
+
+CLAIM_ID_FIELDS = ('claim_id', 'CLM01')
+# Segments whose first element qualifies them, giving e.g. REF*G1.REF02 besides REF02
+QUALIFIED_SEGMENTS = {'NM1', 'REF', 'DTP', 'AMT', 'PRV', 'PER'}
+# Segments that describe the entity named by the NM1 before them
+ENTITY_SEGMENTS = {'N3', 'N4', 'REF', 'PER', 'PRV', 'DMG'}
+# Hierarchical level codes of the billing provider, subscriber and patient (HL03)
+CONTEXT_LEVELS = ('20', '22', '23')
+X12_ENVELOPE_SEGMENTS = {'ISA', 'GS', 'ST', 'BHT', 'SE', 'GE', 'IEA'}
+X12_READ_SIZE = 1024 * 1024
+
+
+def detect_format(path):
+    extension = path.rsplit('.', 1)[-1].lower() if '.' in path else ''
+    if extension == 'csv':
+        return 'csv'
+    if extension in ('jsonl', 'ndjson', 'json'):
+        return 'jsonl'
+    if extension in ('837', 'x12', 'edi'):
+        return 'x12'
+    with open(path, encoding='utf-8', errors='replace') as f:
+        start = f.read(3)
+    if start == 'ISA':
+        return 'x12'
+    return 'jsonl' if start.startswith('{') else 'csv'
+
+
+def read_chunks(path, file_format=None, batch_size=50000):
+    """Yield picklable chunks of at most batch_size claims for build_batch."""
+    file_format = file_format or detect_format(path)
+    if file_format == 'csv':
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                return
+            while True:
+                rows = list(islice(reader, batch_size))
+                if not rows:
+                    break
+                yield ('csv', header, rows)
+    elif file_format == 'jsonl':
+        with open(path, encoding='utf-8') as f:
+            lines = (line for line in f if line.strip())
+            while True:
+                batch = list(islice(lines, batch_size))
+                if not batch:
+                    break
+                yield ('jsonl', None, batch)
+    elif file_format == 'x12':
+        yield from _read_x12_chunks(path, batch_size)
+    else:
+        raise ValueError(f"Unknown claims file format {file_format!r}")
+
+
+def build_batch(chunk):
+    """ClaimBatch for a chunk from read_chunks."""
+    kind, meta, data = chunk
+    if kind == 'csv':
+        return _rows_batch(meta, data)
+    if kind == 'jsonl':
+        return records_batch([json.loads(line) for line in data])
+    element_separator, component_separator, contexts, claims = meta + data
+    records = [
+        flatten_claim(contexts[context] + segments, element_separator, component_separator)
+        for context, segments in claims
+    ]
+    return records_batch(records)
+
+
+def records_batch(records):
+    """ClaimBatch over flat dicts (JSON objects or flattened 837 claims)."""
+    def load(field):
+        if not any(field in record for record in records):
+            return None
+        return [_text(record.get(field)) for record in records]
+
+    return ClaimBatch(_claim_ids(load, len(records)), load)
+
+
+def _rows_batch(header, rows):
+    positions = {name.strip(): index for index, name in enumerate(header)}
+
+    def load(field):
+        index = positions.get(field)
+        if index is None:
+            return None
+        return [row[index] if index < len(row) else '' for row in rows]
+
+    return ClaimBatch(_claim_ids(load, len(rows)), load)
+
+
+def _claim_ids(load, count):
+    for field in CLAIM_ID_FIELDS:
+        values = load(field)
+        if values is not None:
+            return values
+    return [str(position) for position in range(count)]
+
+
+def _text(value):
+    if value is None:
+        return ''
+    return value if isinstance(value, str) else str(value)
+
+
+def flatten_claim(segments, element_separator, component_separator):
+    """Flat field -> value dict of one claim's segments, named as described above."""
+    record = {}
+    entity = None
+    line_count = 0
+    for segment in segments:
+        elements = segment.split(element_separator)
+        tag = elements[0]
+        if tag == 'LX':
+            line_count += 1
+        prefixes = ['']
+        if tag in QUALIFIED_SEGMENTS and len(elements) > 1:
+            prefixes.append(f"{tag}*{elements[1]}.")
+        if tag == 'NM1' and len(elements) > 1:
+            entity = f"NM1*{elements[1]}."
+        elif tag in ENTITY_SEGMENTS and entity:
+            prefixes.append(entity)
+        else:
+            entity = None
+        for position, element in enumerate(elements[1:], start=1):
+            if not element:
+                continue
+            name = f"{tag}{position:02d}"
+            for prefix in prefixes:
+                record.setdefault(prefix + name, element)
+            if component_separator in element:
+                for number, component in enumerate(element.split(component_separator), start=1):
+                    if component:
+                        for prefix in prefixes:
+                            record.setdefault(f"{prefix}{name}-{number}", component)
+    record['line_count'] = str(line_count)
+    return record
+
+
+def _read_x12_chunks(path, batch_size):
+    with open(path, encoding='utf-8', errors='replace') as f:
+        isa = f.read(106)
+        if not isa.startswith('ISA') or len(isa) < 106:
+            raise ValueError(f"{path} does not start with an ISA segment")
+        element_separator, component_separator, terminator = isa[3], isa[104], isa[105]
+        separators = (element_separator, component_separator)
+
+        levels = {}
+        contexts = []
+        context_index = None
+        claims = []
+        claim = None
+        current = None
+        for segment in _x12_segments(f, isa, terminator):
+            tag = segment.split(element_separator, 1)[0]
+            if tag == 'CLM':
+                if len(claims) >= batch_size:
+                    yield ('x12', separators, (contexts, claims))
+                    contexts, claims, context_index = [], [], None
+                if context_index is None:
+                    # Claims under the same hierarchical levels share one context entry
+                    contexts.append([s for level in CONTEXT_LEVELS for s in levels.get(level, ())])
+                    context_index = len(contexts) - 1
+                claim = []
+                claims.append((context_index, claim))
+                claim.append(segment)
+            elif tag == 'HL':
+                elements = segment.split(element_separator)
+                level = elements[3] if len(elements) > 3 else ''
+                if level in CONTEXT_LEVELS:
+                    for deeper in CONTEXT_LEVELS[CONTEXT_LEVELS.index(level):]:
+                        levels.pop(deeper, None)
+                    levels[level] = [segment]
+                    current = levels[level]
+                else:
+                    current = None
+                claim = None
+                context_index = None
+            elif tag in X12_ENVELOPE_SEGMENTS:
+                claim = None
+                if tag == 'ST':
+                    levels = {}
+                    context_index = None
+                current = None
+            elif claim is not None:
+                claim.append(segment)
+            elif current is not None:
+                current.append(segment)
+        if claims:
+            yield ('x12', separators, (contexts, claims))
+
+
+def _x12_segments(f, head, terminator):
+    buffer = head
+    while True:
+        block = f.read(X12_READ_SIZE)
+        buffer += block
+        parts = buffer.split(terminator)
+        # The last part may be a segment cut off by the end of the block
+        buffer = parts.pop() if block else ''
+        for part in parts:
+            part = part.strip()
+            if part:
+                yield part
+        if not block:
+            return
@@ -0,0 +1,206 @@
+"""Compile the prose conditions of claim edits into rule_engine rules.
+
+Edits without a rule are sent to the model in batches together with the rule format and
+the claim field names, and every answer is checked with rule_engine.validate_rule before
+it is stored in claim_edits.rule. rule_status records the outcome:
+
+    compiled     the model's rule passed validation
+    unsupported  the model reported that the format cannot express the edit (see rule_notes)
+    invalid      the model's rule failed validation (the error is in rule_notes)
+    reviewed     a person saved the rule through POST /claim_edits/<id>/rule
+
+Regenerated edits are new rows and so are compiled again on the next run; reviewed rules
+are never overwritten, even with force=True.
+
+Usage:
+    python claim_rules.py [--force] [input_id ...]
+"""
+import os
+import json
+import argparse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import current_app
+from sqlalchemy import select, update
+from models import db, ClaimEdit, Input
+import llm_cache
+from rule_engine import validate_rule
+
+# Edits per compilation request
+RULE_BATCH_SIZE = int(os.environ.get('RULE_BATCH_SIZE', 20))
+# Maximum number of compilation requests in flight at once
+RULE_CONCURRENCY = int(os.environ.get('RULE_CONCURRENCY', 4))
+
+RULE_FORMAT = """
+A rule is a JSON object {"when": P or null, "require": P, "unless": P or null}. The edit fires
+(rejects the claim) when "when" holds, "require" does not hold and "unless" does not hold.
+"require" is what a valid claim must satisfy; "unless" holds the edit's non-conditions
+(exceptions); "when" limits which claims the edit applies to.
+
+A predicate P is one of
+  {"all": [P, ...]}, {"any": [P, ...]}, {"not": P}
+  {"field": F, "op": OP, "values": [string, ...]}
+OP is one of: in, not_in, present, absent (no values), starts_with, matches (regular
+expression over the whole value), length_in (lengths as strings), gt, ge, lt, le
+(numeric, one value). Missing fields are empty: "present" is false and "in" does not match.
+
+Field names F are X12 837 element references:
+  CLM02, CLM05-1 (component 1 of composite element CLM05), HI01-2, SV101-2
+  NM1*85.NM109 (NM109 of the NM1 whose NM101 is 85), NM1*85.N403 (N403 of that entity's address)
+  DTP*472.DTP03, REF*G1.REF02, AMT*F5.AMT02 (segments qualified by their first element)
+  line_count (number of service lines)
+Dates are CCYYMMDD strings, so gt/lt compare them correctly.
+"""
+
+
+def compile_rules(input_ids=None, force=False, progress=None):
+    """Compile the rules of edits that have none yet (force=True: all but reviewed ones).
+
+    Returns the number of edits per resulting rule_status.
+    """
+    query = select(ClaimEdit.id, ClaimEdit.edit_description, ClaimEdit.edit_conditions,
+                   ClaimEdit.edit_non_conditions).order_by(ClaimEdit.id)
+    if force:
+        query = query.where((ClaimEdit.rule_status.is_(None)) | (ClaimEdit.rule_status != 'reviewed'))
+    else:
+        query = query.where(ClaimEdit.rule_status.is_(None))
+    if input_ids:
+        query = query.where(ClaimEdit.input_id.in_(input_ids))
+    pending = [dict(row._mapping) for row in db.session.execute(query)]
+    # Don't hold the read transaction open across the model calls
+    db.session.commit()
+    if not pending:
+        return {}
+
+    batches = [pending[start:start + RULE_BATCH_SIZE] for start in range(0, len(pending), RULE_BATCH_SIZE)]
+    # Compilation threads need the app context for the LLM cache
+    app = current_app._get_current_object()
+
+    def request_batch(batch):
+        with app.app_context():
+            return request_rules(batch, force)
+
+    counts = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(RULE_CONCURRENCY, len(batches)))) as executor:
+        futures = {executor.submit(request_batch, batch): batch for batch in batches}
+        for completed, future in enumerate(as_completed(futures), start=1):
+            answers = {answer['id']: answer for answer in future.result()}
+            for edit in futures[future]:
+                status = store_rule(edit['id'], answers.get(edit['id']))
+                counts[status] = counts.get(status, 0) + 1
+            db.session.commit()
+            if progress:
+                progress(f"Compiled {completed} of {len(batches)} rule batches")
+    return counts
+
+
+def request_rules(edits, force=False):
+    payload = build_rules_payload(edits)
+    # Unchanged batches are served from the cache unless forced
+    content = llm_cache.cached_completion(payload, bypass=force, caller='compile_rules')
+    return json.loads(content)['rules']
+
+
+def store_rule(edit_id, answer):
+    """Validate one model answer and write it to the edit (caller commits); returns the status."""
+    rule, notes = None, None
+    if answer is None:
+        status, notes = 'invalid', "The model returned no rule for this edit"
+    elif not answer['supported']:
+        status, notes = 'unsupported', answer['notes']
+    else:
+        try:
+            rule = validate_rule(json.loads(answer['rule']))
+            status, notes = 'compiled', answer['notes'] or None
+        except (ValueError, TypeError) as e:
+            # json.JSONDecodeError and RuleError are both ValueErrors
+            status, notes = 'invalid', f"{e}: {answer['rule']}"
+    db.session.execute(update(ClaimEdit).where(ClaimEdit.id == edit_id).values(
+        rule=json.dumps(rule) if rule is not None else None,
+        rule_status=status,
+        rule_notes=notes,
+        rule_compiled_at=datetime.utcnow()
+    ))
+    return status
+
+
+def save_reviewed_rule(edit, rule, notes=None):
+    """Store a hand-written or corrected rule (raises RuleError if it is not valid)."""
+    validate_rule(rule)
+    edit.rule = json.dumps(rule)
+    edit.rule_status = 'reviewed'
+    edit.rule_notes = notes
+    edit.rule_compiled_at = datetime.utcnow()
+
+
+def load_rules(input_ids=None, document_type=None):
+    """(edit id, rule) pairs of every usable rule, for rule_engine.RuleSet."""
+    query = select(ClaimEdit.id, ClaimEdit.rule).where(
+        ClaimEdit.rule_status.in_(('compiled', 'reviewed'))
+    ).order_by(ClaimEdit.id)
+    if input_ids:
+        query = query.where(ClaimEdit.input_id.in_(input_ids))
+    if document_type:
+        query = query.join(Input).where(Input.document_type == document_type)
+    return [(edit_id, json.loads(rule)) for edit_id, rule in db.session.execute(query)]
+
+
+def build_rules_payload(edits):
+    edits_json = json.dumps([{
+        "id": edit['id'],
+        "description": edit['edit_description'],
+        "conditions": edit['edit_conditions'],
+        "non_conditions": edit['edit_non_conditions']
+    } for edit in edits], indent=2)
+
+    payload = {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {"role": "system", "content": "You translate health insurance claim edits into machine-checkable rules.\n" + RULE_FORMAT},
+            {"role": "user", "content": f"Translate each of these claim edits into a rule. Use only the conditions stated in the edit. If the edit depends on information that is not in the claim (history, reference tables, other claims) or cannot be expressed in the format, mark it unsupported and say why in notes.\n\n{edits_json}"}
+        ],
+        "response_format": {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "claim_rules",
+                "strict": True,
+                "schema": {
+                    "type": "object",
+                    "properties": {
+                        "rules": {
+                            "type": "array",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "id": {"type": "integer", "description": "The id of the claim edit."},
+                                    "supported": {"type": "boolean", "description": "False when the edit cannot be expressed as a rule."},
+                                    "rule": {"type": "string", "description": "The rule as a JSON object serialized to a string; empty when unsupported."},
+                                    "notes": {"type": "string", "description": "Assumptions made, or why the edit is unsupported."}
+                                },
+                                "required": ["id", "supported", "rule", "notes"],
+                                "additionalProperties": False
+                            },
+                            "description": "One rule per claim edit."
+                        }
+                    },
+                    "required": ["rules"],
+                    "additionalProperties": False
+                }
+            }
+        }
+    }
+
+    return payload
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compile claim edits into rule_engine rules.")
+    parser.add_argument('input_ids', nargs='*', type=int, help="Only the edits of these inputs")
+    parser.add_argument('--force', action='store_true', help="Recompile every rule that was not reviewed")
+    args = parser.parse_args()
+
+    from main import app
+
+    with app.app_context():
+        counts = compile_rules(args.input_ids or None, force=args.force, progress=print)
+    print(', '.join(f"{count} {status}" for status, count in counts.items()) or "No edits to compile")
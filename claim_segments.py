@@ -0,0 +1,113 @@
+import re
+import logging
+from sqlalchemy import select, delete, insert, func
+from sqlalchemy.orm import load_only
+from models import db, Input, ClaimEdit, EditSegment
+
+logger = logging.getLogger(__name__)
+
+# Segment identifiers used in X12 837 professional, institutional and dental claims
+SEGMENT_IDS = (
+    'AMT', 'BHT', 'CAS', 'CL1', 'CLM', 'CN1', 'CR1', 'CR2', 'CR3', 'CRC', 'CTP', 'DMG', 'DN1', 'DN2',
+    'DTP', 'FRM', 'HCP', 'HI', 'HL', 'K3', 'LIN', 'LQ', 'LX', 'MEA', 'MIA', 'MOA', 'N3', 'N4', 'NM1',
+    'NTE', 'OI', 'PAT', 'PER', 'PRV', 'PS1', 'PWK', 'QTY', 'REF', 'SBR', 'SV1', 'SV2', 'SV3', 'SV5',
+    'SVD', 'TOO',
+)
+
+# CLM, CLM05, CLM05-1, SV1-01, NM1*85 (the qualifier after * is not an element)
+SEGMENT_PATTERN = re.compile(
+    r'\b(?P<segment>' + '|'.join(sorted(SEGMENT_IDS, key=len, reverse=True)) + r')'
+    r'(?:-?(?P<element>\d{2}))?(?:-(?P<component>\d{1,2}))?\b'
+)
+LOOP_PATTERN = re.compile(r'\bloop\s*(?P<loop>\d{4}[A-Z]{0,2})\b', re.IGNORECASE)
+
+def extract_segment_references(text):
+    """Return the set of (segment, element) references mentioned in free text."""
+    references = set()
+    for match in SEGMENT_PATTERN.finditer(text or ''):
+        segment = match.group('segment')
+        element = None
+        if match.group('element'):
+            element = f"{segment}{match.group('element')}"
+            if match.group('component'):
+                element += f"-{match.group('component')}"
+        references.add((segment, element))
+    for match in LOOP_PATTERN.finditer(text or ''):
+        references.add((f"Loop {match.group('loop').upper()}", None))
+    return references
+
+def normalize_segment(name):
+    """Turn user input such as 'clm', 'loop 2300' or '2300' into the stored segment key."""
+    name = ' '.join(name.split())
+    match = LOOP_PATTERN.fullmatch(name) or re.fullmatch(r'(?P<loop>\d{4}[A-Za-z]{0,2})', name)
+    if match:
+        return f"Loop {match.group('loop').upper()}"
+    return name.upper()
+
+def index_claim_edits(edits):
+    """Add index rows for claim edits that already have ids (call after a flush, before commit)."""
+    return index_claim_edit_rows(
+        (edit.id, edit.edit_conditions, edit.edit_non_conditions) for edit in edits
+    )
+
+def index_claim_edit_rows(rows):
+    """Bulk insert index rows for (claim_edit_id, conditions, non_conditions) tuples."""
+    index_rows = [
+        {'claim_edit_id': claim_edit_id, 'segment': segment, 'element': element, 'source': source}
+        for claim_edit_id, conditions, non_conditions in rows
+        for source, text in (('conditions', conditions), ('non_conditions', non_conditions))
+        for segment, element in extract_segment_references(text)
+    ]
+    if index_rows:
+        db.session.execute(insert(EditSegment), index_rows)
+    return len(index_rows)
+
+def remove_index_for_input(input_id):
+    """Delete index rows of an input's claim edits (bulk deletes bypass the ORM cascade)."""
+    db.session.execute(delete(EditSegment).where(
+        EditSegment.claim_edit_id.in_(select(ClaimEdit.id).where(ClaimEdit.input_id == input_id))
+    ))
+
+def filter_by_segment(query, segment, element=None):
+    """Restrict a ClaimEdit query to edits referencing a segment (and optionally an element)."""
+    matching = select(EditSegment.claim_edit_id).where(EditSegment.segment == normalize_segment(segment))
+    if element:
+        matching = matching.where(EditSegment.element == element.upper())
+    return query.filter(ClaimEdit.id.in_(matching))
+
+def edits_by_segment(segment, element=None):
+    return filter_by_segment(ClaimEdit.query, segment, element).order_by(ClaimEdit.id).all()
+
+def inputs_by_segment(segment):
+    return Input.query.options(load_only(Input.id, Input.document_name, Input.document_type)).filter(
+        Input.id.in_(
+            select(ClaimEdit.input_id).join(EditSegment).where(EditSegment.segment == normalize_segment(segment))
+        )
+    ).order_by(Input.id).all()
+
+def segment_counts():
+    """List (segment, number of claim edits referencing it), most referenced first."""
+    edit_count = func.count(EditSegment.claim_edit_id.distinct())
+    return db.session.execute(
+        select(EditSegment.segment, edit_count).group_by(EditSegment.segment).order_by(edit_count.desc())
+    ).all()
+
+def reindex_all():
+    """Rebuild the whole index, e.g. after changing the extraction patterns."""
+    db.session.execute(delete(EditSegment))
+    total = 0
+    last_id = 0
+    while True:
+        batch = ClaimEdit.query.filter(ClaimEdit.id > last_id).order_by(ClaimEdit.id).limit(500).all()
+        if not batch:
+            break
+        total += index_claim_edits(batch)
+        last_id = batch[-1].id
+    db.session.commit()
+    return total
+
+if __name__ == '__main__':
+    from main import app
+
+    with app.app_context():
+        print(f"Indexed {reindex_all()} segment references")
@@ -1,66 +1,304 @@
 import os
 import json
-from openai import OpenAI
-from sqlalchemy import create_engine, join
-from sqlalchemy.orm import sessionmaker
-from models import ClaimEdit, Input, Base
+from datetime import datetime
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import current_app
+from sqlalchemy import select, delete, func
+from sqlalchemy.orm import selectinload
+from models import db, ClaimEdit, Input, EditConflict, EditSegment, edit_conflict_members
+import llm_cache
+from llm_streaming import stream_array_items, merge_streams
+from render_markdown import render_markdown
 
-client = OpenAI(api_key=os.environ['OPENAI_API_KEY'])
+# Edits on each side of one comparison request, keeps every payload well inside the context window
+CONFLICT_BATCH_SIZE = int(os.environ.get('CONFLICT_BATCH_SIZE', 40))
+# Maximum number of comparison requests in flight at once
+CONFLICT_CONCURRENCY = int(os.environ.get('CONFLICT_CONCURRENCY', 4))
 
-def analyze_edit_conflicts():
-    # Set up database connection
-    engine = create_engine(os.environ['DATABASE_URL'])
-    Session = sessionmaker(bind=engine)
-    session = Session()
+def analyze_edit_conflicts(force=False, progress=None):
+    """Compare new claim edits against existing ones and persist the conflicts found.
 
-    # Query all claim edits with input names
-    claim_edits_with_inputs = session.query(ClaimEdit, Input.document_name).join(Input).all()
+    Only edits that have not been analyzed yet are sent to the model, so an unchanged
+    catalog costs no model calls. force=True discards the stored results and re-analyzes
+    every edit. Returns the markdown summary of all stored conflicts.
+    """
+    # Use the app's pooled session rather than a private engine per call
+    session = db.session
 
-    # Format claim edits as JSON
-    claim_edits_json = json.dumps([{
-        # 'id': edit.id,
-        # 'input_id': edit.input_id,
-        'input_name': input_name,
-        'edit_description': edit.edit_description,
-        'edit_message': edit.edit_message,
-        'edit_conditions': edit.edit_conditions,
-        'edit_non_conditions': edit.edit_non_conditions
-    } for edit, input_name in claim_edits_with_inputs], indent=2)
+    try:
+        pending, comparisons = _start_analysis(session, force)
+        if pending:
+            found = _run_comparisons(comparisons, force, progress)
+            store_conflicts(session, found, {edit.id for edit, _ in pending})
+            _mark_analyzed(pending)
+
+        session.commit()
+        return conflicts_markdown(load_conflicts(session))
+    except Exception:
+        session.rollback()
+        raise
+
+def stream_edit_conflicts(force=False):
+    """Streaming variant of analyze_edit_conflicts: yields each new EditConflict as soon as it is stored.
+
+    Comparison responses are streamed and parsed incrementally. Pending edits are only
+    marked as analyzed once every comparison has finished.
+    """
+    session = db.session
+
+    try:
+        pending, comparisons = _start_analysis(session, force)
+        if pending:
+            pending_ids = {edit.id for edit, _ in pending}
+            known = known_conflict_sets(session)
+            # Payloads are built here so worker threads never touch this session's objects
+            streams = [
+                partial(stream_array_items, build_conflicts_payload(new_batch, other_batch), 'conflicts', 'analyze_edit_conflicts', force)
+                for new_batch, other_batch in comparisons
+            ]
+            valid_ids = [{edit.id for edit, _ in new_batch + other_batch} for new_batch, other_batch in comparisons]
+            for index, conflict in merge_streams(streams, CONFLICT_CONCURRENCY):
+                stored = store_conflict(session, conflict, valid_ids[index], pending_ids, known)
+                if stored is not None:
+                    session.commit()
+                    yield stored
+            _mark_analyzed(pending)
+
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+def _start_analysis(session, force):
+    """Reset or prune stored results and return (pending edits, planned comparisons)."""
+    if force:
+        session.execute(delete(edit_conflict_members))
+        session.execute(delete(EditConflict))
+        session.query(ClaimEdit).update({ClaimEdit.conflicts_analyzed_at: None})
+    else:
+        prune_stale_conflicts(session)
+    # Don't hold a write transaction open across the model calls
+    session.commit()
+
+    # Claim edits that were added or regenerated since the last analysis
+    pending = session.query(ClaimEdit, Input.document_name).join(Input).filter(
+        ClaimEdit.conflicts_analyzed_at.is_(None)
+    ).order_by(ClaimEdit.id).all()
+    if not pending:
+        return pending, []
+
+    candidates, rest, unindexed_ids = find_candidate_edits(session, [edit for edit, _ in pending])
+    unindexed = [row for row in pending if row[0].id in unindexed_ids]
+    return pending, plan_comparisons(pending, candidates, unindexed, rest)
+
+def _mark_analyzed(pending):
+    analyzed_at = datetime.utcnow()
+    for edit, _ in pending:
+        edit.conflicts_analyzed_at = analyzed_at
+
+def find_candidate_edits(session, pending_edits):
+    """Previously analyzed edits that the pending edits need to be compared against.
+
+    Conflicts are about shared claim data segments, so the candidates are the edits referencing a
+    segment that a pending edit references. Pending edits without any indexed segment reference
+    cannot be narrowed down; only they are also compared against the rest of the analyzed edits.
+    Returns (candidates, rest, ids of the unindexed pending edits); rest is empty when every
+    pending edit is indexed.
+    """
+    analyzed = session.query(ClaimEdit, Input.document_name).join(Input).filter(
+        ClaimEdit.conflicts_analyzed_at.isnot(None)
+    )
+
+    pending_ids = [edit.id for edit in pending_edits]
+    pending_segments = select(EditSegment.segment).where(EditSegment.claim_edit_id.in_(pending_ids))
+    sharing_ids = select(EditSegment.claim_edit_id).where(EditSegment.segment.in_(pending_segments))
+    candidates = analyzed.filter(ClaimEdit.id.in_(sharing_ids)).order_by(ClaimEdit.id).all()
+
+    indexed_ids = set(session.scalars(
+        select(EditSegment.claim_edit_id).where(EditSegment.claim_edit_id.in_(pending_ids)).distinct()
+    ))
+    unindexed_ids = set(pending_ids) - indexed_ids
+    if not unindexed_ids:
+        return candidates, [], unindexed_ids
+    rest = analyzed.filter(ClaimEdit.id.not_in(sharing_ids)).order_by(ClaimEdit.id).all()
+    return candidates, rest, unindexed_ids
+
+def plan_comparisons(pending, candidates, unindexed=(), rest=()):
+    """Split the work into (new edits, existing edits) batches of at most CONFLICT_BATCH_SIZE each.
+
+    Every pending batch is compared with the pending batches after it and with all candidates,
+    and the unindexed pending edits also with the rest of the analyzed edits, so each pair that
+    can conflict is seen at least once.
+    """
+    pending_batches = _batches(pending, CONFLICT_BATCH_SIZE)
+    comparisons = []
+    for index, new_batch in enumerate(pending_batches):
+        others = [row for batch in pending_batches[index + 1:] for row in batch] + list(candidates)
+        other_batches = _batches(others, CONFLICT_BATCH_SIZE) or [[]]
+        comparisons.extend((new_batch, other_batch) for other_batch in other_batches)
+    rest_batches = _batches(list(rest), CONFLICT_BATCH_SIZE)
+    for new_batch in _batches(list(unindexed), CONFLICT_BATCH_SIZE):
+        comparisons.extend((new_batch, other_batch) for other_batch in rest_batches)
+    return comparisons
+
+def compare_edits(new_edits, existing_edits, force=False):
+    """Ask the model for conflicts involving at least one of new_edits; returns a list of conflict dicts."""
+    return request_conflicts(build_conflicts_payload(new_edits, existing_edits), force)
+
+def request_conflicts(payload, force=False):
+    # Send request to ChatGPT API (an unchanged comparison is served from the cache unless forced)
+    content = llm_cache.cached_completion(payload, bypass=force, caller='analyze_edit_conflicts')
+
+    # Extract the conflicts from the response
+    return json.loads(content)['conflicts']
+
+def build_conflicts_payload(new_edits, existing_edits):
+    new_edits_json = _edits_json(new_edits)
+    existing_edits_json = _edits_json(existing_edits)
 
     # Prepare the ChatGPT API request
     payload = {
         "model": "gpt-4o-mini",  # or whichever model you prefer
         "messages": [
             {"role": "system", "content": "You are a helpful assistant that analyzes claim edits and identifies conflicting logic."},
-            {"role": "user", "content": f"Here is the JSON data of all claim edits, including input names:\n\n{claim_edits_json}\n\nPlease analyze this data and provide a summary of conflicting logic between claim edits. This should specifically highlight where there is conflicting logic refrencing the same Claim Data Segments. For example if one edit discusses specific formats of a segment, and then another edit says to ignore this segment if certain criteria is met. This is what should be highlighted."}
+            {"role": "user", "content": f"Here is the JSON data of newly added claim edits, including input names:\n\n{new_edits_json}\n\nHere is the JSON data of existing claim edits they must be checked against:\n\n{existing_edits_json}\n\nPlease analyze this data and identify conflicting logic between claim edits. Only report conflicts that involve at least one of the newly added claim edits; they may conflict with each other or with existing claim edits. This should specifically highlight where there is conflicting logic refrencing the same Claim Data Segments. For example if one edit discusses specific formats of a segment, and then another edit says to ignore this segment if certain criteria is met. This is what should be highlighted."}
         ],
         "response_format": {
             "type": "json_schema",
             "json_schema": {
-                "name": "document_summary",
+                "name": "edit_conflicts",
                 "strict": True,
                 "schema": {
                     "type": "object",
                     "properties": {
-                        "summary": {
-                            "type": "string",
-                            "description": "Detailed list of conflicting claim edits based on the provided data. Use Markdown headers for each of the conflicts with bullet points below to give details of the segments in the claim that would conflict, and a recommendation of if this logic needs to be changed. The bullet points below each header should always be formatted using asterisks such as * First item * Second item * Third item. Start each bullet point with a bolded title, followed by a colon, then a one sentence detailed description free of filler words. For each conflicting edit, make sure to include a bullet point that highlights the specific Claim Data Segment and the data in that segment being validated by each edit. Make sure to highlight specific logic to ignore claim data segment validations if those directons to ignore edits are found in one edit, but the validations are required in another edit."
+                        "conflicts": {
+                            "type": "array",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "title": {
+                                        "type": "string",
+                                        "description": "Short header naming the conflict and the Claim Data Segment involved."
+                                    },
+                                    "edit_ids": {
+                                        "type": "array",
+                                        "items": {"type": "integer"},
+                                        "description": "The id values of every claim edit involved in this conflict."
+                                    },
+                                    "details": {
+                                        "type": "string",
+                                        "description": "Bullet points giving details of the segments in the claim that would conflict, and a recommendation of if this logic needs to be changed. The bullet points should always be formatted using asterisks such as * First item * Second item * Third item. Start each bullet point with a bolded title, followed by a colon, then a one sentence detailed description free of filler words. Make sure to include a bullet point that highlights the specific Claim Data Segment and the data in that segment being validated by each edit. Make sure to highlight specific logic to ignore claim data segment validations if those directons to ignore edits are found in one edit, but the validations are required in another edit."
+                                    }
+                                },
+                                "required": ["title", "edit_ids", "details"],
+                                "additionalProperties": False
+                            },
+                            "description": "List of conflicts between claim edits. Empty when no conflicts are found."
                         }
                     },
-                    "required": ["summary"],
+                    "required": ["conflicts"],
                     "additionalProperties": False
                 }
             }
         }
     }
 
-    # Send request to ChatGPT API
-    response = client.chat.completions.create(**payload)
+    return payload
+
+def store_conflicts(session, found, pending_ids):
+    """Persist conflicts from comparison results, skipping ones already stored for the same edits."""
+    known = known_conflict_sets(session)
+    for valid_ids, conflicts in found:
+        for conflict in conflicts:
+            store_conflict(session, conflict, valid_ids, pending_ids, known)
+
+def known_conflict_sets(session):
+    return {
+        frozenset(edit.id for edit in conflict.claim_edits)
+        for conflict in session.query(EditConflict).options(selectinload(EditConflict.claim_edits))
+    }
+
+def store_conflict(session, conflict, valid_ids, pending_ids, known):
+    """Add one conflict from a model response; returns the new EditConflict or None if it was skipped."""
+    edit_ids = frozenset(edit_id for edit_id in conflict['edit_ids'] if edit_id in valid_ids)
+    # A conflict needs two edits, and anything not touching a new edit was already stored earlier
+    if len(edit_ids) < 2 or not edit_ids & pending_ids or edit_ids in known:
+        return None
+    known.add(edit_ids)
+    stored = EditConflict(
+        title=conflict['title'],
+        details=conflict['details'],
+        details_html=str(render_markdown(conflict['details'])),
+        member_count=len(edit_ids),
+        claim_edits=session.query(ClaimEdit).filter(ClaimEdit.id.in_(edit_ids)).all()
+    )
+    session.add(stored)
+    return stored
+
+def prune_stale_conflicts(session):
+    """Drop stored conflicts that lost an edit (deleted or regenerated) since they were found."""
+    # SQLite does not enforce the ON DELETE CASCADE, so clear member rows of deleted edits first
+    session.execute(delete(edit_conflict_members).where(
+        edit_conflict_members.c.claim_edit_id.not_in(select(ClaimEdit.id))
+    ))
+    member_counts = select(
+        edit_conflict_members.c.conflict_id, func.count().label('members')
+    ).group_by(edit_conflict_members.c.conflict_id).subquery()
+    complete = select(member_counts.c.conflict_id).join(
+        EditConflict, EditConflict.id == member_counts.c.conflict_id
+    ).where(member_counts.c.members >= EditConflict.member_count)
+    session.execute(delete(EditConflict).where(EditConflict.id.not_in(complete)))
+    session.execute(delete(edit_conflict_members).where(
+        edit_conflict_members.c.conflict_id.not_in(select(EditConflict.id))
+    ))
 
-    # Extract the summary from the response
-    result = json.loads(response.choices[0].message.content)
+def load_conflicts(session):
+    return session.query(EditConflict).options(
+        selectinload(EditConflict.claim_edits).joinedload(ClaimEdit.input)
+    ).order_by(EditConflict.id).all()
 
-    # Close the database session
-    session.close()
+def conflicts_markdown(conflicts):
+    if not conflicts:
+        return "No conflicting claim edits found."
+    sections = []
+    for conflict in conflicts:
+        edits = ', '.join(f"#{edit.id} ({edit.input.document_name})" for edit in conflict.claim_edits)
+        sections.append(f"## {conflict.title}\n* **Claim Edits:** {edits}\n{conflict.details}")
+    return '\n\n'.join(sections)
+
+def _run_comparisons(comparisons, force, progress):
+    # Comparison threads need the app context for the LLM cache
+    app = current_app._get_current_object()
+
+    def run(valid_ids, payload):
+        with app.app_context():
+            return valid_ids, request_conflicts(payload, force)
+
+    # Payloads are built here so worker threads never touch this session's objects
+    work = [
+        ({edit.id for edit, _ in new_batch + other_batch}, build_conflicts_payload(new_batch, other_batch))
+        for new_batch, other_batch in comparisons
+    ]
+    found = []
+    with ThreadPoolExecutor(max_workers=max(1, min(CONFLICT_CONCURRENCY, len(comparisons)))) as executor:
+        futures = [executor.submit(run, valid_ids, payload) for valid_ids, payload in work]
+        for completed, future in enumerate(as_completed(futures), start=1):
+            found.append(future.result())
+            if progress:
+                progress(f"Compared {completed} of {len(comparisons)} claim edit batches")
+    return found
+
+def _edits_json(edits_with_inputs):
+    # Format claim edits as JSON
+    return json.dumps([{
+        'id': edit.id,
+        'input_name': input_name,
+        'edit_description': edit.edit_description,
+        'edit_message': edit.edit_message,
+        'edit_conditions': edit.edit_conditions,
+        'edit_non_conditions': edit.edit_non_conditions
+    } for edit, input_name in edits_with_inputs], indent=2)
 
-    return result['summary']
\ No newline at end of file
+def _batches(items, size):
+    return [items[start:start + size] for start in range(0, len(items), size)]
@@ -0,0 +1,171 @@
+"""Re-fetch an input's source document and regenerate only the claim edits of changed pages.
+
+Every input stores a hash per extracted page (document_pages) and every claim edit records
+the page window it was generated from (page_start..page_end). A refresh diffs the old and
+new page hashes: edits whose window lies entirely in unchanged pages keep their rows and
+ids (renumbered when pages were inserted or removed before them), and only the windows
+around changed pages are sent to the model again, so the cost of an update follows the
+size of the change rather than the size of the document.
+
+Edits without a page range (generated before page tracking, or through the Batch API)
+count as covering the whole document and are regenerated on the first change. Inputs
+without claim edits only get their text and page hashes updated; nothing is generated.
+
+Usage:
+    python document_refresh.py <input_id> [...]
+"""
+import sys
+import logging
+from difflib import SequenceMatcher
+from collections import namedtuple
+from sqlalchemy import select, update
+from models import db, ClaimEdit, DocumentBlob
+from extract_contents import fetch_document, is_pdf, extract_text_from_pdf, decode_text, page_hashes, split_into_pages
+from prompt_compaction import compact_for_prompt
+from generate_claim_edits import (
+    get_input, chunk_pages, request_chunks, insert_claim_edits, delete_claim_edits, _edit_key
+)
+
+logger = logging.getLogger(__name__)
+
+# moved maps kept edit ids whose pages were renumbered to (page_start, page_end); regenerate holds new page numbers
+RefreshPlan = namedtuple('RefreshPlan', ['keep', 'moved', 'drop', 'regenerate', 'changed_pages'])
+RefreshResult = namedtuple('RefreshResult', [
+    'input_id', 'changed', 'pages', 'changed_pages', 'kept', 'removed', 'added', 'requests'
+])
+
+
+def diff_pages(old_hashes, new_hashes):
+    """Map unchanged old page numbers to their new numbers; returns (page_map, changed new pages)."""
+    page_map = {}
+    changed = set()
+    matcher = SequenceMatcher(None, old_hashes, new_hashes, autojunk=False)
+    for tag, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+        if tag == 'equal':
+            for offset in range(old_end - old_start):
+                page_map[old_start + offset + 1] = new_start + offset + 1
+        else:
+            changed.update(range(new_start + 1, new_end + 1))
+    return page_map, changed
+
+
+def plan_refresh(old_hashes, new_hashes, edits):
+    """Decide which (id, page_start, page_end) edits survive and which new pages need the model."""
+    page_map, changed = diff_pages(old_hashes, new_hashes)
+    keep = []
+    moved = {}
+    drop = []
+    # Without edits there is nothing to bring up to date (edits are generated on request)
+    regenerate = set(changed) if edits else set()
+    for edit_id, page_start, page_end in edits:
+        if page_start is None or page_end is None:
+            page_start, page_end = 1, len(old_hashes)
+        pages = range(page_start, page_end + 1)
+        intact = all(page in page_map for page in pages)
+        if intact and page_map[page_end] - page_map[page_start] == page_end - page_start:
+            if (page_map[page_start], page_map[page_end]) != (page_start, page_end):
+                moved[edit_id] = (page_map[page_start], page_map[page_end])
+            keep.append(edit_id)
+        else:
+            # The unchanged pages of a dropped window lose their edits too, so they are asked again
+            drop.append(edit_id)
+            regenerate.update(page_map[page] for page in pages if page in page_map)
+    return RefreshPlan(keep, moved, drop, regenerate, changed)
+
+
+def page_runs(pages):
+    """Contiguous (first, last) runs of a set of page numbers."""
+    runs = []
+    for page in sorted(pages):
+        if runs and page == runs[-1][1] + 1:
+            runs[-1][1] = page
+        else:
+            runs.append([page, page])
+    return [tuple(run) for run in runs]
+
+
+def refresh_input(input_id, progress=None, force=False, http=None, pdf_workers=None):
+    """Re-check an input's source URL and update its text and claim edits; returns a RefreshResult.
+
+    The request is conditional on the validators of the previous download, so an unchanged
+    document costs a 304 response. force=True bypasses the LLM response cache for the regenerated windows.
+    pdf_workers is passed on to extract_text_from_pdf (callers refreshing inputs concurrently pass 1).
+    """
+    input_doc = get_input(input_id)
+    if not input_doc.has_http_source:
+        raise ValueError(f"Input {input_id} has no http(s) source URL to refresh from")
+    if progress:
+        progress("Fetching document")
+    download = fetch_document(input_doc.document_url, http, input_doc.http_etag, input_doc.http_last_modified)
+    if download.not_modified or download.content_hash == input_doc.content_hash:
+        input_doc.remember_download(download)
+        pages = len(input_doc.pages)
+        db.session.commit()
+        return RefreshResult(input_id, False, pages, 0, 0, 0, 0, 0)
+
+    if is_pdf(download):
+        new_contents = extract_text_from_pdf(download.content, workers=pdf_workers)
+    else:
+        new_contents = decode_text(download.content)
+    # Inputs stored before page hashes existed are hashed from their current text
+    old_hashes = [page.content_hash for page in input_doc.pages] or page_hashes(input_doc.document_contents)
+    new_hashes = page_hashes(new_contents)
+    edits = db.session.execute(
+        select(ClaimEdit.id, ClaimEdit.page_start, ClaimEdit.page_end).where(ClaimEdit.input_id == input_id)
+    ).all()
+    plan = plan_refresh(old_hashes, new_hashes, edits)
+    document_summary = input_doc.document_summary
+    kept_keys = {
+        _edit_key({'edit_description': description, 'edit_conditions': conditions})
+        for description, conditions in db.session.execute(
+            select(ClaimEdit.edit_description, ClaimEdit.edit_conditions).where(ClaimEdit.id.in_(plan.keep))
+        )
+    } if plan.keep else set()
+
+    # End the read transaction while the model answers
+    db.session.commit()
+    logger.info(f"Input {input_id}: {len(plan.changed_pages)} of {len(new_hashes)} pages changed, "
+                f"keeping {len(plan.keep)} edits, regenerating {len(plan.regenerate)} pages")
+
+    chunks = []
+    if plan.regenerate:
+        # Compaction keeps one marker per page, so page numbers survive it
+        pages = split_into_pages(compact_for_prompt(new_contents, 'refresh_input'))
+        for first, last in page_runs(plan.regenerate):
+            chunks.extend(chunk_pages(''.join(pages[first - 1:last]), first_page=first))
+    if progress:
+        progress(f"Regenerating claim edits for {len(chunks)} page windows")
+    new_edits = request_chunks(document_summary, chunks, progress, force) if chunks else []
+    # Windows overlap their unchanged neighbours, whose edits are still in place
+    new_edits = [edit_data for edit_data in new_edits if _edit_key(edit_data) not in kept_keys]
+
+    try:
+        input_doc = get_input(input_id)
+        input_doc.document_contents = new_contents
+        input_doc.content_hash = download.content_hash
+        input_doc.remember_download(download)
+        delete_claim_edits(plan.drop)
+        if plan.moved:
+            db.session.execute(update(ClaimEdit), [
+                {'id': edit_id, 'page_start': page_start, 'page_end': page_end}
+                for edit_id, (page_start, page_end) in plan.moved.items()
+            ])
+        insert_claim_edits(input_id, new_edits)
+        db.session.flush()
+        DocumentBlob.delete_unreferenced()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return RefreshResult(input_id, True, len(new_hashes), len(plan.changed_pages), len(plan.keep),
+                         len(plan.drop), len(new_edits), len(chunks))
+
+
+if __name__ == '__main__':
+    from main import app
+
+    with app.app_context():
+        for input_id in map(int, sys.argv[1:]):
+            result = refresh_input(input_id, progress=print)
+            print(dict(result._asdict()))
@@ -0,0 +1,330 @@
+"""Near-duplicate claim edits, found locally with MinHash signatures and LSH banding.
+
+Each edit's description and conditions are normalized and cut into character shingles.
+Their MinHash signature estimates the Jaccard similarity between any two edits. The
+signature is split into LSH bands, and edits sharing a band bucket become candidate
+pairs, so only likely duplicates are ever compared. Candidates at or above
+DUPLICATE_THRESHOLD are grouped into DuplicateCluster rows.
+
+generate_claim_edits.py indexes new edits as they are written (index_new_edits) and prunes
+clusters left with a single member after deletes. Clusters are only ever merged
+incrementally; a rebuild also splits clusters whose bridging edit was deleted.
+
+Usage (rebuild every signature and cluster):
+    python edit_duplicates.py
+"""
+import os
+import time
+import logging
+from datetime import datetime
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from sqlalchemy import select, delete, insert, update, func
+from models import db, Input, ClaimEdit, DuplicateCluster, EditMinHash, EditLSHBucket
+
+logger = logging.getLogger(__name__)
+
+# Estimated Jaccard similarity of two edits' shingle sets at which they count as duplicates
+DUPLICATE_THRESHOLD = float(os.environ.get('DUPLICATE_THRESHOLD', 0.7))
+SHINGLE_SIZE = 5  # Characters; short enough for one or two word rephrasings to keep most shingles
+NUM_PERMUTATIONS = 128
+# Probability that a pair exactly at DUPLICATE_THRESHOLD shares at least one band bucket
+LSH_RECALL = 0.99
+# Edits hashed per batch; bounds the temporary arrays to a few MB
+SIGNATURE_BATCH_SIZE = 1000
+WRITE_BATCH_SIZE = 5000
+
+
+def lsh_shape(threshold, permutations=NUM_PERMUTATIONS, recall=LSH_RECALL):
+    """(bands, rows per band) with the longest bands that still make pairs at threshold candidates with the
+    given probability, 1 - (1 - threshold ** rows) ** bands; longer bands mean fewer dissimilar candidates."""
+    for rows in range(permutations, 0, -1):
+        if permutations % rows == 0 and 1 - (1 - threshold ** rows) ** (permutations // rows) >= recall:
+            return permutations // rows, rows
+    return permutations, 1
+
+
+# 32 bands of 4 rows at the default threshold (0.9998 at 0.7, 0.87 at 0.5). The buckets stored in
+# edit_lsh_buckets depend on this, so changing DUPLICATE_THRESHOLD calls for a rebuild
+LSH_BANDS, ROWS_PER_BAND = lsh_shape(DUPLICATE_THRESHOLD)
+
+# Each permutation is x -> a * x + b (odd a) in wrapping uint32 arithmetic followed by an
+# xor-shift: a bijection on 32-bit shingle hashes that needs no modulo and no 64-bit temporaries
+_random = np.random.default_rng(837)
+PERMUTATION_A = _random.integers(0, 1 << 32, NUM_PERMUTATIONS, dtype=np.uint64).astype(np.uint32) | np.uint32(1)
+PERMUTATION_B = _random.integers(0, 1 << 32, NUM_PERMUTATIONS, dtype=np.uint64).astype(np.uint32)
+SHINGLE_MIX = np.uint64(0x9E3779B97F4A7C15)
+BAND_COEFFICIENTS = _random.integers(1, 1 << 62, (LSH_BANDS, ROWS_PER_BAND), dtype=np.uint64) | np.uint64(1)
+BAND_OFFSETS = _random.integers(1, 1 << 62, LSH_BANDS, dtype=np.uint64)
+SHINGLE_POWERS = np.uint64(257) ** np.arange(SHINGLE_SIZE - 1, -1, -1, dtype=np.uint64)
+
+
+def edit_text(description, conditions):
+    """The text compared between edits: description and conditions, case and spacing normalized."""
+    return ' '.join(f"{description or ''} {conditions or ''}".lower().split())
+
+
+def minhash_signatures(texts):
+    """(len(texts), NUM_PERMUTATIONS) uint32 MinHash signatures of the texts' character shingles."""
+    signatures = np.empty((len(texts), NUM_PERMUTATIONS), dtype=np.uint32)
+    for start in range(0, len(texts), SIGNATURE_BATCH_SIZE):
+        signatures[start:start + SIGNATURE_BATCH_SIZE] = _signature_batch(texts[start:start + SIGNATURE_BATCH_SIZE])
+    return signatures
+
+
+def _signature_batch(texts):
+    # Texts shorter than a shingle are padded so every edit has at least one
+    encoded = [text.encode('utf-8').ljust(SHINGLE_SIZE) for text in texts]
+    lengths = np.fromiter((len(data) for data in encoded), dtype=np.int64, count=len(encoded))
+    codes = np.frombuffer(b''.join(encoded), dtype=np.uint8).astype(np.uint64)
+
+    # Hash every window of the concatenated text, then keep the windows inside a single edit
+    window_hashes = sliding_window_view(codes, SHINGLE_SIZE) @ SHINGLE_POWERS
+    counts = lengths - SHINGLE_SIZE + 1
+    text_starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    segment_starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    offsets = np.arange(counts.sum()) - np.repeat(segment_starts, counts)
+    # Keep 32 well-mixed bits per shingle
+    shingles = ((window_hashes[np.repeat(text_starts, counts) + offsets] * SHINGLE_MIX) >> np.uint64(32)).astype(np.uint32)
+
+    signatures = np.empty((len(texts), NUM_PERMUTATIONS), dtype=np.uint32)
+    hashed = np.empty_like(shingles)
+    shifted = np.empty_like(shingles)
+    for permutation in range(NUM_PERMUTATIONS):
+        # In place, one permutation at a time, so the working arrays stay in cache
+        np.multiply(shingles, PERMUTATION_A[permutation], out=hashed)
+        hashed += PERMUTATION_B[permutation]
+        np.right_shift(hashed, 16, out=shifted)
+        hashed ^= shifted
+        signatures[:, permutation] = np.minimum.reduceat(hashed, segment_starts)
+    return signatures
+
+
+def band_buckets(signatures):
+    """(n, LSH_BANDS) int64 bucket keys; the band number is mixed in so bands never share keys."""
+    bands = signatures.reshape(len(signatures), LSH_BANDS, ROWS_PER_BAND).astype(np.uint64)
+    # uint64 arithmetic wraps around, which is all a hash needs
+    keys = (bands * BAND_COEFFICIENTS).sum(axis=2, dtype=np.uint64) + BAND_OFFSETS
+    return keys.view(np.int64)
+
+
+def similarity(signature, others):
+    """Estimated Jaccard similarity of one signature to each row of others."""
+    return (others == signature).mean(axis=1)
+
+
+class _DisjointSet:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        root = self.parent.setdefault(item, item)
+        while self.parent[root] != root:
+            root = self.parent[root]
+        # Path compression keeps later lookups flat
+        while item != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    def groups(self):
+        groups = {}
+        for item in self.parent:
+            groups.setdefault(self.find(item), []).append(item)
+        return [members for members in groups.values() if len(members) > 1]
+
+
+def _link_candidates(ids, signatures, buckets, links, only=None):
+    """Union every verified pair of rows sharing a bucket; `only` limits pairs to those touching these rows."""
+    for band in range(LSH_BANDS):
+        order = np.argsort(buckets[:, band], kind='stable')
+        boundaries = np.concatenate(([0], np.flatnonzero(np.diff(buckets[order, band])) + 1, [len(order)]))
+        # Most buckets hold a single edit; only shared ones are visited in Python
+        shared = np.flatnonzero(np.diff(boundaries) > 1)
+        for start, end in zip(boundaries[shared], boundaries[shared + 1]):
+            group = order[start:end]
+            for position, row in enumerate(group[:-1]):
+                others = group[position + 1:]
+                if only is not None:
+                    if not only[row]:
+                        others = others[only[others]]
+                    if not len(others):
+                        continue
+                similar = others[similarity(signatures[row], signatures[others]) >= DUPLICATE_THRESHOLD]
+                for other in similar:
+                    links.union(ids[row], ids[other])
+
+
+def _signature_rows(ids, signatures, buckets):
+    minhashes = [{'claim_edit_id': edit_id, 'signature': signature.astype('<u4').tobytes()}
+                 for edit_id, signature in zip(ids, signatures)]
+    bucket_rows = [{'claim_edit_id': edit_id, 'bucket': bucket}
+                   for edit_id, edit_buckets in zip(ids, buckets.tolist()) for bucket in edit_buckets]
+    return minhashes, bucket_rows
+
+
+def _insert_batched(table, rows):
+    for start in range(0, len(rows), WRITE_BATCH_SIZE):
+        db.session.execute(insert(table.__table__), rows[start:start + WRITE_BATCH_SIZE])
+
+
+def index_new_edits(rows):
+    """Sign new edits and merge them into duplicate clusters (caller commits).
+
+    rows are (claim_edit_id, description, conditions) tuples of edits that were just
+    inserted. Returns the number of new edits that joined a cluster.
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+    new_ids = [row[0] for row in rows]
+    signatures = minhash_signatures([edit_text(description, conditions) for _, description, conditions in rows])
+    buckets = band_buckets(signatures)
+    minhashes, bucket_rows = _signature_rows(new_ids, signatures, buckets)
+    _insert_batched(EditMinHash, minhashes)
+    _insert_batched(EditLSHBucket, bucket_rows)
+
+    # Stored edits sharing at least one bucket with a new edit
+    candidate_ids = set()
+    keys = list({bucket for bucket in buckets.ravel().tolist()})
+    for start in range(0, len(keys), WRITE_BATCH_SIZE):
+        candidate_ids.update(db.session.scalars(
+            select(EditLSHBucket.claim_edit_id).where(
+                EditLSHBucket.bucket.in_(keys[start:start + WRITE_BATCH_SIZE]),
+                EditLSHBucket.claim_edit_id.not_in(new_ids)
+            ).distinct()
+        ))
+    candidates = db.session.execute(
+        select(EditMinHash.claim_edit_id, EditMinHash.signature).where(EditMinHash.claim_edit_id.in_(candidate_ids))
+    ).all() if candidate_ids else []
+
+    ids = new_ids + [edit_id for edit_id, _ in candidates]
+    if candidates:
+        stored = np.frombuffer(b''.join(signature for _, signature in candidates), dtype='<u4')
+        signatures = np.vstack([signatures, stored.reshape(len(candidates), NUM_PERMUTATIONS)])
+        buckets = band_buckets(signatures)
+    is_new = np.zeros(len(ids), dtype=bool)
+    is_new[:len(new_ids)] = True
+
+    links = _DisjointSet()
+    _link_candidates(ids, signatures, buckets, links, only=is_new)
+    clustered = 0
+    for members in links.groups():
+        _assign_cluster(members)
+        clustered += len(set(members).intersection(new_ids))
+    return clustered
+
+
+def _assign_cluster(member_ids):
+    """Put edits into one cluster, merging the clusters some of them already belong to."""
+    existing = sorted(set(db.session.scalars(
+        select(ClaimEdit.duplicate_cluster_id).where(
+            ClaimEdit.id.in_(member_ids), ClaimEdit.duplicate_cluster_id.isnot(None)
+        )
+    )))
+    if existing:
+        cluster_id = existing[0]
+        if len(existing) > 1:
+            db.session.execute(update(ClaimEdit).where(ClaimEdit.duplicate_cluster_id.in_(existing[1:]))
+                               .values(duplicate_cluster_id=cluster_id))
+            db.session.execute(delete(DuplicateCluster).where(DuplicateCluster.id.in_(existing[1:])))
+    else:
+        cluster_id = db.session.scalar(
+            insert(DuplicateCluster).values(created_at=datetime.utcnow()).returning(DuplicateCluster.id)
+        )
+    db.session.execute(update(ClaimEdit).where(ClaimEdit.id.in_(member_ids)).values(duplicate_cluster_id=cluster_id))
+
+
+def remove_edits(claim_edit_ids=None, input_id=None):
+    """Delete signatures and buckets of edits about to be bulk deleted (caller commits)."""
+    if input_id is not None:
+        edit_ids = select(ClaimEdit.id).where(ClaimEdit.input_id == input_id)
+    elif claim_edit_ids:
+        edit_ids = claim_edit_ids
+    else:
+        return
+    db.session.execute(delete(EditLSHBucket).where(EditLSHBucket.claim_edit_id.in_(edit_ids)))
+    db.session.execute(delete(EditMinHash).where(EditMinHash.claim_edit_id.in_(edit_ids)))
+
+
+def prune_clusters():
+    """Dissolve clusters left with fewer than two edits after deletes."""
+    sizes = select(ClaimEdit.duplicate_cluster_id).where(ClaimEdit.duplicate_cluster_id.isnot(None)).group_by(
+        ClaimEdit.duplicate_cluster_id
+    ).having(func.count() > 1)
+    db.session.execute(update(ClaimEdit).where(
+        ClaimEdit.duplicate_cluster_id.isnot(None), ClaimEdit.duplicate_cluster_id.not_in(sizes)
+    ).values(duplicate_cluster_id=None))
+    db.session.execute(delete(DuplicateCluster).where(DuplicateCluster.id.not_in(sizes)))
+
+
+def rebuild(progress=None):
+    """Recompute every signature and cluster; returns (edits, clusters)."""
+    started = time.perf_counter()
+    rows = db.session.execute(
+        select(ClaimEdit.id, ClaimEdit.edit_description, ClaimEdit.edit_conditions).order_by(ClaimEdit.id)
+    ).all()
+    ids = [row[0] for row in rows]
+    signatures = minhash_signatures([edit_text(description, conditions) for _, description, conditions in rows])
+    buckets = band_buckets(signatures)
+    if progress:
+        progress(f"Signed {len(ids)} claim edits in {time.perf_counter() - started:.1f}s")
+
+    links = _DisjointSet()
+    _link_candidates(ids, signatures, buckets, links)
+    groups = links.groups()
+
+    db.session.execute(delete(EditLSHBucket))
+    db.session.execute(delete(EditMinHash))
+    db.session.execute(update(ClaimEdit).where(ClaimEdit.duplicate_cluster_id.isnot(None)).values(duplicate_cluster_id=None))
+    db.session.execute(delete(DuplicateCluster))
+    minhashes, bucket_rows = _signature_rows(ids, signatures, buckets)
+    _insert_batched(EditMinHash, minhashes)
+    _insert_batched(EditLSHBucket, bucket_rows)
+
+    if groups:
+        cluster_ids = db.session.scalars(
+            insert(DuplicateCluster).returning(DuplicateCluster.id, sort_by_parameter_order=True),
+            [{'created_at': datetime.utcnow()} for _ in groups]
+        ).all()
+        assignments = [{'id': edit_id, 'duplicate_cluster_id': cluster_id}
+                       for cluster_id, members in zip(cluster_ids, groups) for edit_id in members]
+        for start in range(0, len(assignments), WRITE_BATCH_SIZE):
+            # ORM bulk UPDATE by primary key
+            db.session.execute(update(ClaimEdit), assignments[start:start + WRITE_BATCH_SIZE])
+    db.session.commit()
+    logger.info(f"Rebuilt duplicate clusters for {len(ids)} claim edits in {time.perf_counter() - started:.1f}s")
+    return len(ids), len(groups)
+
+
+def list_clusters():
+    """Clusters as dicts with their member edits, largest first."""
+    rows = db.session.execute(
+        select(ClaimEdit.duplicate_cluster_id, ClaimEdit.id, ClaimEdit.input_id, Input.document_name,
+               ClaimEdit.edit_description)
+        .join(Input, Input.id == ClaimEdit.input_id)
+        .where(ClaimEdit.duplicate_cluster_id.isnot(None))
+        .order_by(ClaimEdit.duplicate_cluster_id, ClaimEdit.id)
+    ).all()
+    clusters = {}
+    for cluster_id, edit_id, input_id, input_name, description in rows:
+        clusters.setdefault(cluster_id, []).append({
+            'id': edit_id, 'input_id': input_id, 'input_name': input_name, 'edit_description': description
+        })
+    return sorted(
+        ({'id': cluster_id, 'input_count': len({edit['input_id'] for edit in edits}), 'claim_edits': edits}
+         for cluster_id, edits in clusters.items()),
+        key=lambda cluster: (-len(cluster['claim_edits']), cluster['id'])
+    )
+
+
+if __name__ == '__main__':
+    from main import app
+
+    with app.app_context():
+        edits, clusters = rebuild(progress=print)
+        print(f"{clusters} duplicate clusters among {edits} claim edits")
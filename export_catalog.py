@@ -0,0 +1,222 @@
+"""Stream the claim edit and input catalogs as CSV, JSON Lines or Parquet.
+
+Rows are read through a server-side cursor (yield_per) and written out one batch at a time,
+so memory use does not grow with the catalog and the first bytes (the CSV header, the
+Parquet magic) go out before the query has returned anything. Parquet needs pyarrow,
+which is optional; every batch becomes one row group.
+
+Both catalogs can be filtered by input ids, document type and claim data segment (inputs:
+those with at least one edit referencing the segment).
+
+Usage:
+    python export_catalog.py claim_edits|inputs [--format csv|jsonl|parquet] [--input-id ID ...]
+        [--document-type TYPE] [--segment SEGMENT] [--output PATH]
+"""
+import io
+import os
+import csv
+import sys
+import json
+import argparse
+from sqlalchemy import select, func
+from models import db, Input, ClaimEdit, EditSegment
+from claim_segments import filter_by_segment, normalize_segment
+
+# Rows fetched from the cursor and written per batch (one Parquet row group)
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+
+# Format -> (content type, file extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+# Every other exported column is text
+INTEGER_COLUMNS = {'id', 'input_id', 'page_start', 'page_end', 'claim_edit_count'}
+
+
+class ExportError(ValueError):
+    pass
+
+
+def claim_edits_query(input_ids=None, document_type=None, segment=None):
+    query = select(
+        ClaimEdit.id,
+        ClaimEdit.input_id,
+        Input.document_name.label('input_name'),
+        Input.document_type,
+        ClaimEdit.edit_description,
+        ClaimEdit.edit_message,
+        ClaimEdit.edit_conditions,
+        ClaimEdit.edit_non_conditions,
+        ClaimEdit.page_start,
+        ClaimEdit.page_end,
+        ClaimEdit.rule_status,
+        ClaimEdit.rule
+    ).join(Input, ClaimEdit.input_id == Input.id).order_by(ClaimEdit.id)
+    if input_ids:
+        query = query.where(ClaimEdit.input_id.in_(input_ids))
+    if document_type:
+        query = query.where(Input.document_type == document_type)
+    if segment:
+        query = filter_by_segment(query, segment)
+    return query
+
+
+def inputs_query(input_ids=None, document_type=None, segment=None):
+    claim_edit_count = select(func.count(ClaimEdit.id)).where(
+        ClaimEdit.input_id == Input.id
+    ).correlate(Input).scalar_subquery()
+    query = select(
+        Input.id,
+        Input.document_name,
+        Input.document_url,
+        Input.document_type,
+        Input.document_summary,
+        Input.content_hash,
+        claim_edit_count.label('claim_edit_count')
+    ).order_by(Input.id)
+    if input_ids:
+        query = query.where(Input.id.in_(input_ids))
+    if document_type:
+        query = query.where(Input.document_type == document_type)
+    if segment:
+        query = query.where(Input.id.in_(
+            select(ClaimEdit.input_id).join(EditSegment).where(EditSegment.segment == normalize_segment(segment))
+        ))
+    return query
+
+
+EXPORT_QUERIES = {
+    'claim_edits': claim_edits_query,
+    'inputs': inputs_query,
+}
+
+
+def export_catalog(catalog, file_format='csv', input_ids=None, document_type=None, segment=None):
+    """Return a generator of byte chunks of the export (raises ExportError for bad arguments)."""
+    if catalog not in EXPORT_QUERIES:
+        raise ExportError(f"Unknown catalog {catalog!r}, expected one of {', '.join(EXPORT_QUERIES)}")
+    if file_format not in EXPORT_FORMATS:
+        raise ExportError(f"Unknown format {file_format!r}, expected one of {', '.join(EXPORT_FORMATS)}")
+    if file_format == 'parquet':
+        # Fail before the response starts rather than in the middle of it
+        _pyarrow()
+    query = EXPORT_QUERIES[catalog](input_ids, document_type, segment)
+    columns = [column.name for column in query.selected_columns]
+    return WRITERS[file_format](columns, _batches(query))
+
+
+def _batches(query):
+    # Executed on the first next(), so writers can send their header before the query runs
+    result = db.session.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    try:
+        yield from result.partitions()
+    finally:
+        result.close()
+
+
+def _write_csv(columns, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield _drain(buffer)
+    for rows in batches:
+        writer.writerows(rows)
+        yield _drain(buffer)
+
+
+def _drain(buffer):
+    data = buffer.getvalue().encode('utf-8')
+    buffer.seek(0)
+    buffer.truncate()
+    return data
+
+
+def _write_jsonl(columns, batches):
+    for rows in batches:
+        yield ''.join(
+            json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n' for row in rows
+        ).encode('utf-8')
+
+
+def _write_parquet(columns, batches):
+    pa, pq = _pyarrow()
+    schema = pa.schema([(name, pa.int64() if name in INTEGER_COLUMNS else pa.string()) for name in columns])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    yield sink.drain()
+    for rows in batches:
+        arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        yield sink.drain()
+    # The footer with the row group index is only written on close
+    writer.close()
+    yield sink.drain()
+
+
+WRITERS = {
+    'csv': _write_csv,
+    'jsonl': _write_jsonl,
+    'parquet': _write_parquet,
+}
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands out what was written since the last drain()."""
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportError("Parquet export needs pyarrow (pip install pyarrow)")
+    return pa, pq
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export the claim edit or input catalog.")
+    parser.add_argument('catalog', choices=sorted(EXPORT_QUERIES))
+    parser.add_argument('--format', dest='file_format', choices=sorted(EXPORT_FORMATS), default='csv')
+    parser.add_argument('--input-id', dest='input_ids', type=int, action='append', help="Only these inputs (repeatable)")
+    parser.add_argument('--document-type', help="Only inputs of this document type")
+    parser.add_argument('--segment', help="Only edits referencing this claim data segment, e.g. CLM or 'Loop 2300'")
+    parser.add_argument('--output', '-o', help="File to write (default: standard output)")
+    args = parser.parse_args()
+
+    from main import app
+
+    with app.app_context():
+        try:
+            chunks = export_catalog(args.catalog, args.file_format, args.input_ids, args.document_type, args.segment)
+        except ExportError as e:
+            parser.error(str(e))
+        output = open(args.output, 'wb') if args.output else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+        finally:
+            if args.output:
+                output.close()
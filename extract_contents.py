@@ -1,13 +1,181 @@
+import os
+import re
+import time
+import hashlib
+import logging
+import tempfile
 import requests
+import multiprocessing
+from collections import namedtuple
 from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
 from pdfplumber import open as open_pdf
+import metrics
 
-def extract_text_from_pdf(url: str) -> str:
-    response = requests.get(url)
-    with open_pdf(BytesIO(response.content)) as pdf:
-        all_text = ""
-        for i, page in enumerate(pdf.pages, start=1):
-            extracted_text = page.extract_text()
-            cleaned_text = '\n'.join([line.strip() for line in extracted_text.split('\n') if line.strip()])
-            all_text += f"🅿️ Start of Page {i}\n{cleaned_text}\n"
-    return all_text
\ No newline at end of file
+# Worker processes used for large PDFs; 1 keeps extraction in the calling process
+PDF_EXTRACT_WORKERS = int(os.environ.get('PDF_EXTRACT_WORKERS', os.cpu_count() or 1))
+# Below this many pages the process pool start-up costs more than it saves
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get('PDF_PARALLEL_MIN_PAGES', 40))
+# Each worker receives several smaller page ranges so uneven pages balance out
+RANGES_PER_WORKER = 4
+
+PAGE_MARKER = "🅿️ Start of Page {}"
+PAGE_START_PATTERN = re.compile('^' + re.escape(PAGE_MARKER).replace(re.escape('{}'), r'\d+') + '$', re.MULTILINE)
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+TEXT_ENCODINGS = ['utf-8', 'latin-1', 'iso-8859-1', 'windows-1252']
+
+# etag and last_modified are the response's validators; not_modified downloads (HTTP 304) have no content
+Download = namedtuple(
+    'Download', ['url', 'content', 'content_type', 'content_hash', 'etag', 'last_modified', 'not_modified'],
+    defaults=(None, None, False)
+)
+
+def fetch_document(url, http=None, etag=None, last_modified=None):
+    """Download url exactly once, hashing it with SHA-256 as it streams in.
+
+    http may be a requests.Session so callers fetching many URLs share its connection pool.
+    Passing the etag / last_modified of an earlier download makes the request conditional;
+    if the server answers 304 Not Modified the Download has not_modified=True and no content.
+    """
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    try:
+        response = (http or requests).get(url, stream=True, headers=headers)
+        if response.status_code == 304:
+            response.close()
+            metrics.document_downloads.inc(outcome='not_modified')
+            return Download(url, None, None, None, response.headers.get('ETag', etag),
+                            response.headers.get('Last-Modified', last_modified), True)
+        response.raise_for_status()
+        hasher = hashlib.sha256()
+        buffer = BytesIO()
+        for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+            hasher.update(chunk)
+            buffer.write(chunk)
+            metrics.document_download_bytes.inc(len(chunk))
+    except Exception:
+        metrics.document_downloads.inc(outcome='error')
+        raise
+    metrics.document_downloads.inc(outcome='success')
+    content_type = response.headers.get('Content-Type', '').lower()
+    return Download(url, buffer.getvalue(), content_type, hasher.hexdigest(),
+                    response.headers.get('ETag'), response.headers.get('Last-Modified'))
+
+def is_pdf(download):
+    return 'application/pdf' in download.content_type
+
+def decode_text(content):
+    """Decode a non-PDF document, trying common encodings before dropping undecodable bytes."""
+    for encoding in TEXT_ENCODINGS:
+        try:
+            document_contents = content.decode(encoding)
+            logging.info(f"Successfully decoded content with {encoding}")
+            return document_contents
+        except UnicodeDecodeError:
+            logging.warning(f"Failed to decode with {encoding}")
+
+    logging.warning("All decoding attempts failed, using 'utf-8' with 'ignore'")
+    return content.decode('utf-8', errors='ignore')
+
+def extract_text_from_pdf(source, workers=None) -> str:
+    """Extract the text of a PDF given as raw bytes, a binary file object or a URL.
+
+    PDFs with at least PDF_PARALLEL_MIN_PAGES pages are split into page ranges
+    that are extracted by a pool of `workers` processes (PDF_EXTRACT_WORKERS by default).
+    """
+    data = _read_source(source)
+    workers = PDF_EXTRACT_WORKERS if workers is None else workers
+    started = time.perf_counter()
+
+    with open_pdf(BytesIO(data)) as pdf:
+        page_count = len(pdf.pages)
+        if workers <= 1 or page_count < PDF_PARALLEL_MIN_PAGES:
+            text = format_pages(_extract_page(page) for page in pdf.pages)
+        else:
+            text = None
+
+    if text is None:
+        text = format_pages(extract_pages_parallel(data, page_count, workers))
+    # Pages per second is rate(pdf_pages_extracted_total) / rate(pdf_extraction_duration_seconds_sum)
+    metrics.pdf_pages_extracted.inc(page_count)
+    metrics.pdf_extraction_duration.observe(time.perf_counter() - started)
+    return text
+
+def extract_pages_parallel(data, page_count, workers):
+    """Extract cleaned text for every page, in page order, using a process pool."""
+    ranges = split_page_ranges(page_count, workers * RANGES_PER_WORKER)
+
+    # Workers open the PDF from a shared temp file instead of receiving the bytes per task
+    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp:
+        tmp.write(data)
+        pdf_path = tmp.name
+    try:
+        # spawn avoids forking a multi-threaded gunicorn/job worker
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=min(workers, len(ranges)), mp_context=context) as executor:
+            chunks = executor.map(
+                _extract_page_range,
+                [pdf_path] * len(ranges),
+                [start for start, _ in ranges],
+                [stop for _, stop in ranges]
+            )
+            return [text for chunk in chunks for text in chunk]
+    finally:
+        os.remove(pdf_path)
+
+def split_page_ranges(page_count, parts):
+    """Split page indexes 0..page_count into at most `parts` contiguous (start, stop) ranges."""
+    parts = max(1, min(parts, page_count))
+    size, remainder = divmod(page_count, parts)
+    ranges = []
+    start = 0
+    for part in range(parts):
+        stop = start + size + (1 if part < remainder else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+def format_pages(page_texts, first_page=1):
+    """Join cleaned page texts into a single document with page markers."""
+    return ''.join(
+        f"{PAGE_MARKER.format(i)}\n{text}\n" for i, text in enumerate(page_texts, start=first_page)
+    )
+
+def split_into_pages(document_contents):
+    """Split extracted text on the page markers; text without markers is a single page."""
+    starts = [match.start() for match in PAGE_START_PATTERN.finditer(document_contents)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    return [document_contents[start:end] for start, end in zip(starts, starts[1:] + [len(document_contents)])]
+
+def page_hashes(document_contents):
+    """SHA-256 of each page's text without its marker, whitespace-normalized, in page order."""
+    hashes = []
+    for page in split_into_pages(document_contents or ''):
+        marker = PAGE_START_PATTERN.match(page)
+        body = page[marker.end():] if marker else page
+        hashes.append(hashlib.sha256(' '.join(body.split()).encode('utf-8')).hexdigest())
+    return hashes
+
+def _extract_page_range(pdf_path, start, stop):
+    with open_pdf(pdf_path) as pdf:
+        return [_extract_page(pdf.pages[i]) for i in range(start, stop)]
+
+def _extract_page(page):
+    extracted_text = page.extract_text() or ''
+    # Drop pdfplumber's cached layout objects so memory stays flat on long documents
+    page.close()
+    return '\n'.join([line.strip() for line in extracted_text.split('\n') if line.strip()])
+
+def _read_source(source):
+    if isinstance(source, str):
+        response = requests.get(source)
+        response.raise_for_status()
+        return response.content
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    return source.read()
@@ -1,31 +1,208 @@
 import os
 import json
-from openai import OpenAI
-from models import db, Input, ClaimEdit
+from collections import namedtuple
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import current_app
+from sqlalchemy import select, insert, delete
+from models import db, Input, ClaimEdit, EditSegment
+import llm_cache
+from claim_segments import index_claim_edit_rows, remove_index_for_input
+import search_index
+import edit_duplicates
+from llm_streaming import stream_array_items, merge_streams
+from extract_contents import split_into_pages
+from prompt_compaction import compact_for_prompt, enforce_budget, count_tokens
 
-client = OpenAI(api_key=os.environ['OPENAI_API_KEY'])
+# Documents estimated above this many tokens are split into page windows (chunked mode)
+CHUNK_TOKEN_BUDGET = int(os.environ.get('CLAIM_EDIT_CHUNK_TOKENS', 24000))
+# Pages repeated at the start of the next window so requirements spanning a page break are not lost
+CHUNK_OVERLAP_PAGES = int(os.environ.get('CLAIM_EDIT_CHUNK_OVERLAP_PAGES', 1))
+# Maximum number of chunk requests in flight at once for a single document
+CHUNK_CONCURRENCY = int(os.environ.get('CLAIM_EDIT_CONCURRENCY', 4))
 
-def get_input_contents(input_id):
-    input_doc = Input.query.get(input_id)
-    if not input_doc:
-        raise ValueError(f"No input found with id {input_id}")
-    return input_doc.document_contents
+# A page window of the document; first_page and last_page are 1-based and inclusive
+Chunk = namedtuple('Chunk', ['text', 'first_page', 'last_page'])
 
-def get_input_summary(input_id):
-    input_doc = Input.query.get(input_id)
+def get_input(input_id):
+    input_doc = db.session.get(Input, input_id)
     if not input_doc:
         raise ValueError(f"No input found with id {input_id}")
-    return input_doc.document_summary
+    return input_doc
+
+def generate_claim_edits(input_id, chunked=None, progress=None, force=False):
+    """Replace the claim edits of an input with freshly generated ones.
 
-def generate_claim_edits(input_id):
-    # Get the input document contents
-    document_contents = get_input_contents(input_id)
-    document_summary = get_input_summary(input_id)
+    chunked=None picks chunked mode automatically when the document is larger than
+    CHUNK_TOKEN_BUDGET; progress is an optional callable receiving status messages;
+    force=True bypasses the LLM response cache.
+    """
+    # Get the input document contents (one query for the row, one for its text)
+    input_doc = get_input(input_id)
+    document_contents = compact_for_prompt(input_doc.document_contents, 'generate_claim_edits')
+    document_summary = input_doc.document_summary
 
-    # Delete existing claim edits for this input_id
-    ClaimEdit.query.filter_by(input_id=input_id).delete()
+    # End the read transaction; the old edits are only replaced once the model has answered
     db.session.commit()
 
+    page_count = len(split_into_pages(document_contents))
+    if chunked is None:
+        chunked = should_chunk(document_contents)
+    if not chunked:
+        document_contents, _ = enforce_budget(document_contents)
+
+    if chunked:
+        claim_edits_data = generate_chunked_claim_edits(document_summary, document_contents, progress, force)
+    else:
+        claim_edits_data = with_page_range(
+            request_claim_edits(document_summary, document_contents, force), 1, page_count
+        )
+
+    replace_claim_edits(input_id, claim_edits_data)
+
+    return f"Generated {len(claim_edits_data)} claim edits for input {input_id}"
+
+def replace_claim_edits(input_id, claim_edits_data):
+    """Swap the claim edits of an input for a new set in a single transaction.
+
+    Rows are written with one executemany INSERT ... RETURNING (batched into multi-row
+    VALUES on PostgreSQL and SQLite) instead of one ORM object per edit. If anything
+    fails the old edits are left untouched.
+    """
+    try:
+        remove_index_for_input(input_id)
+        search_index.remove_claim_edits(input_id=input_id)
+        edit_duplicates.remove_edits(input_id=input_id)
+        db.session.execute(delete(ClaimEdit).where(ClaimEdit.input_id == input_id))
+        insert_claim_edits(input_id, claim_edits_data)
+        edit_duplicates.prune_clusters()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+def insert_claim_edits(input_id, claim_edits_data):
+    """Bulk insert claim edits and their segment index rows; returns the new ids (caller commits)."""
+    rows = [{
+        'input_id': input_id,
+        'edit_description': edit_data['edit_description'],
+        'edit_message': edit_data['edit_message'],
+        'edit_conditions': edit_data['edit_conditions'],
+        'edit_non_conditions': edit_data['edit_non_conditions'],
+        'page_start': edit_data.get('page_start'),
+        'page_end': edit_data.get('page_end')
+    } for edit_data in claim_edits_data]
+    if not rows:
+        return []
+
+    new_ids = db.session.scalars(
+        insert(ClaimEdit).returning(ClaimEdit.id, sort_by_parameter_order=True), rows
+    ).all()
+    # Index the claim data segments the new edits reference
+    index_claim_edit_rows(
+        (edit_id, row['edit_conditions'], row['edit_non_conditions']) for edit_id, row in zip(new_ids, rows)
+    )
+    search_index.index_claim_edit_rows(
+        (edit_id, input_id, row['edit_description'], row['edit_message'], row['edit_conditions'], row['edit_non_conditions'])
+        for edit_id, row in zip(new_ids, rows)
+    )
+    edit_duplicates.index_new_edits(
+        (edit_id, row['edit_description'], row['edit_conditions']) for edit_id, row in zip(new_ids, rows)
+    )
+    return new_ids
+
+def delete_claim_edits(edit_ids):
+    """Delete claim edits by id together with their segment index rows (caller commits)."""
+    if edit_ids:
+        db.session.execute(delete(EditSegment).where(EditSegment.claim_edit_id.in_(edit_ids)))
+        search_index.remove_claim_edits(edit_ids)
+        edit_duplicates.remove_edits(edit_ids)
+        db.session.execute(delete(ClaimEdit).where(ClaimEdit.id.in_(edit_ids)))
+        edit_duplicates.prune_clusters()
+
+def stream_claim_edits(input_id, chunked=None, force=False):
+    """Generate claim edits with streamed completions, yielding each one as soon as it is stored.
+
+    New edits are committed as they arrive. The previous edits are removed once generation
+    has succeeded; if it fails or the consumer stops early, the partial new set is removed
+    instead and the previous edits stay in place.
+    """
+    input_doc = get_input(input_id)
+    document_contents = compact_for_prompt(input_doc.document_contents, 'generate_claim_edits')
+    document_summary = input_doc.document_summary
+    previous_ids = list(db.session.scalars(select(ClaimEdit.id).where(ClaimEdit.input_id == input_id)))
+    db.session.commit()
+
+    chunks = claim_edit_chunks(document_contents, chunked)
+    streams = [
+        partial(stream_array_items, build_claim_edits_payload(document_summary, chunk.text), 'claim_edits', 'generate_claim_edits', force)
+        for chunk in chunks
+    ]
+
+    new_ids = []
+    seen = set()
+    succeeded = False
+    try:
+        for index, edit_data in merge_streams(streams, CHUNK_CONCURRENCY):
+            # Overlapping page windows repeat edits, as in merge_claim_edits
+            key = _edit_key(edit_data)
+            if key in seen:
+                continue
+            seen.add(key)
+            with_page_range([edit_data], chunks[index].first_page, chunks[index].last_page)
+            edit_id = insert_claim_edits(input_id, [edit_data])[0]
+            db.session.commit()
+            new_ids.append(edit_id)
+            yield {'id': edit_id, 'input_id': input_id, **edit_data}
+
+        delete_claim_edits(previous_ids)
+        db.session.commit()
+        succeeded = True
+    finally:
+        if not succeeded:
+            db.session.rollback()
+            delete_claim_edits(new_ids)
+            db.session.commit()
+
+def generate_chunked_claim_edits(document_summary, document_contents, progress=None, force=False):
+    """Map-reduce generation: extract edits from each page window concurrently, then merge."""
+    return request_chunks(document_summary, chunk_pages(document_contents), progress, force)
+
+def request_chunks(document_summary, chunks, progress=None, force=False):
+    """Request the edits of each Chunk concurrently; returns them merged and tagged with their pages."""
+    results = [None] * len(chunks)
+
+    # Chunk threads need the app context for the LLM cache
+    app = current_app._get_current_object()
+
+    def request_chunk(chunk):
+        with app.app_context():
+            edits = request_claim_edits(document_summary, chunk.text, force)
+            return with_page_range(edits, chunk.first_page, chunk.last_page)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(CHUNK_CONCURRENCY, len(chunks)))) as executor:
+        futures = {
+            executor.submit(request_chunk, chunk): index
+            for index, chunk in enumerate(chunks)
+        }
+        for completed, future in enumerate(as_completed(futures), start=1):
+            results[futures[future]] = future.result()
+            if progress:
+                progress(f"Processed {completed} of {len(chunks)} document chunks")
+
+    return merge_claim_edits(results)
+
+def request_claim_edits(document_summary, document_contents, force=False):
+    """Send one extraction request and return the list of claim edit dicts."""
+    payload = build_claim_edits_payload(document_summary, document_contents)
+
+    # Send request to ChatGPT API (unchanged chunks are served from the cache unless forced)
+    content = llm_cache.cached_completion(payload, bypass=force, caller='generate_claim_edits')
+
+    # Extract the claim edits from the response
+    return json.loads(content)['claim_edits']
+
+def build_claim_edits_payload(document_summary, document_contents):
     # Prepare the ChatGPT API request
     payload = {
         "model": "gpt-4o-mini",
@@ -102,24 +279,95 @@ def generate_claim_edits(input_id):
         }
     }
 
-    # Send request to ChatGPT API
-    response = client.chat.completions.create(**payload)
+    return payload
 
-    # Extract the claim edits from the response
-    claim_edits_data = json.loads(
-        response.choices[0].message.content)['claim_edits']
+def claim_edit_chunks(document_contents, chunked=None):
+    """The Chunks to request edits for: page windows, or the whole document cut to the token budget."""
+    page_count = len(split_into_pages(document_contents))
+    if chunked is None:
+        chunked = should_chunk(document_contents)
+    if chunked:
+        return chunk_pages(document_contents)
+    document_contents, _ = enforce_budget(document_contents)
+    return [Chunk(document_contents, 1, page_count)]
 
-    # Update the database with new claim edits
-    input_doc = Input.query.get(input_id)
+def should_chunk(document_contents):
+    return estimate_tokens(document_contents) > CHUNK_TOKEN_BUDGET
+
+def estimate_tokens(text):
+    return count_tokens(text) + 1
+
+def chunk_document(document_contents, token_budget=None, overlap_pages=None):
+    """Group pages into windows of at most token_budget tokens, overlapping by overlap_pages pages."""
+    return [chunk.text for chunk in chunk_pages(document_contents, token_budget, overlap_pages)]
+
+def chunk_pages(document_contents, token_budget=None, overlap_pages=None, first_page=1):
+    """chunk_document windows as Chunks that know their page range (numbered from first_page)."""
+    token_budget = token_budget or CHUNK_TOKEN_BUDGET
+    overlap_pages = CHUNK_OVERLAP_PAGES if overlap_pages is None else overlap_pages
+
+    pages = []
+    numbers = []
+    for number, page in enumerate(split_into_pages(document_contents), start=first_page):
+        pieces = _split_oversized(page, token_budget)
+        pages.extend(pieces)
+        numbers.extend([number] * len(pieces))
+
+    windows = []
+    start = 0
+    while start < len(pages):
+        end = start
+        tokens = 0
+        while end < len(pages) and (end == start or tokens + estimate_tokens(pages[end]) <= token_budget):
+            tokens += estimate_tokens(pages[end])
+            end += 1
+        windows.append(Chunk(''.join(pages[start:end]), numbers[start], numbers[end - 1]))
+        if end >= len(pages):
+            break
+        start = max(end - overlap_pages, start + 1)
+    return windows
+
+def merge_claim_edits(chunk_results):
+    """Flatten per-chunk edit lists, dropping edits repeated by overlapping windows."""
+    merged = []
+    seen = set()
+    for chunk_edits in chunk_results:
+        for edit_data in chunk_edits:
+            key = _edit_key(edit_data)
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(edit_data)
+    return merged
+
+def with_page_range(claim_edits_data, first_page, last_page):
+    """Record the pages edits were generated from (in place) and return them."""
     for edit_data in claim_edits_data:
-        new_edit = ClaimEdit(
-            input_id=input_id,
-            edit_description=edit_data['edit_description'],
-            edit_message=edit_data['edit_message'],
-            edit_conditions=edit_data['edit_conditions'],
-            edit_non_conditions=edit_data['edit_non_conditions'])
-        db.session.add(new_edit)
+        edit_data['page_start'] = first_page
+        edit_data['page_end'] = last_page
+    return claim_edits_data
 
-    db.session.commit()
+def _edit_key(edit_data):
+    return _normalize(edit_data['edit_description']), _normalize(edit_data['edit_conditions'])
 
-    return f"Generated {len(claim_edits_data)} claim edits for input {input_id}"
+def _normalize(text):
+    return ' '.join((text or '').lower().split())
+
+def _split_oversized(page, token_budget):
+    # A single page (or marker-less document) larger than the budget is cut on line boundaries
+    if estimate_tokens(page) <= token_budget:
+        return [page]
+    pieces = []
+    current = []
+    current_tokens = 0
+    for line in page.splitlines(keepends=True):
+        line_tokens = estimate_tokens(line)
+        if current and current_tokens + line_tokens > token_budget:
+            pieces.append(''.join(current))
+            current = []
+            current_tokens = 0
+        current.append(line)
+        current_tokens += line_tokens
+    if current:
+        pieces.append(''.join(current))
+    return pieces
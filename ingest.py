@@ -0,0 +1,252 @@
+import os
+import sys
+import logging
+import argparse
+import multiprocessing
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from models import db, Input
+from extract_contents import fetch_document, is_pdf, decode_text, extract_text_from_pdf
+
+logger = logging.getLogger(__name__)
+
+# Concurrent downloads; also the size of the shared HTTP connection pool
+INGEST_FETCH_WORKERS = int(os.environ.get('INGEST_FETCH_WORKERS', 8))
+# Processes extracting different PDFs at the same time
+INGEST_EXTRACT_WORKERS = int(os.environ.get('INGEST_EXTRACT_WORKERS', os.cpu_count() or 1))
+# Largest batch accepted by the bulk endpoint
+INGEST_MAX_URLS = int(os.environ.get('INGEST_MAX_URLS', 500))
+# URLs fetched, extracted and stored together; bounds the downloads held in memory at once
+INGEST_GROUP_SIZE = int(os.environ.get('INGEST_GROUP_SIZE', INGEST_FETCH_WORKERS * 4))
+
+
+def http_session(pool_size=INGEST_FETCH_WORKERS):
+    """requests.Session whose keep-alive pool is large enough for pool_size concurrent downloads."""
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=('GET',))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def ingest_urls(urls, queue_summary=None, progress=None):
+    """Fetch, extract and store many document URLs at once; returns one report entry per URL.
+
+    URLs are processed in groups of INGEST_GROUP_SIZE, so only one group's downloads are held
+    in memory at a time. Within a group, downloads run concurrently over a shared connection
+    pool, PDFs are extracted in parallel processes and the new inputs are inserted in a single
+    transaction, after which queue_summary(input_id) is called for every input that still
+    needs a summary.
+
+    Statuses: 'created' (new content), 'reused' (content already stored under another URL,
+    its text and summary are shared), 'duplicate' (same content as an earlier URL in this
+    batch, no extra input is created) and 'failed'.
+    """
+    urls = list(dict.fromkeys(url.strip() for url in urls if url and url.strip()))
+    report = {url: {"url": url, "status": None, "input_id": None} for url in urls}
+    # URL of the first download of each content hash in the batch, and the URLs that repeat one
+    first_urls = {}
+    duplicate_of = {}
+
+    for start in range(0, len(urls), INGEST_GROUP_SIZE):
+        group = urls[start:start + INGEST_GROUP_SIZE]
+        _progress(progress, f"Fetching documents {start + 1}-{start + len(group)} of {len(urls)}")
+        created = _ingest_group(group, report, first_urls, duplicate_of, progress)
+        if queue_summary:
+            for new_input in created:
+                report[new_input.document_url]["job_id"] = queue_summary(new_input.id).id
+
+    for url, first_url in duplicate_of.items():
+        first = report[first_url]
+        report[url]["input_id"] = first["input_id"]
+        if first["status"] == 'failed':
+            report[url].update(status='failed', error=first["error"])
+
+    return list(report.values())
+
+
+def _ingest_group(urls, report, first_urls, duplicate_of, progress):
+    """Fetch, extract and store one group of URLs; returns the inputs created with new content."""
+    fetched = []
+    downloads = fetch_all(urls)
+    for url in urls:
+        download = downloads.pop(url)
+        if isinstance(download, Exception):
+            _fail(report[url], download)
+        elif download.content_hash in first_urls:
+            # Not kept, so its bytes are released right away
+            _mark_duplicate(report, duplicate_of, url, first_urls[download.content_hash])
+        else:
+            fetched.append(download)
+
+    existing = {}
+    if fetched:
+        hashes = {download.content_hash for download in fetched}
+        for input_item in Input.query.filter(Input.content_hash.in_(hashes)).order_by(Input.id):
+            existing.setdefault(input_item.content_hash, input_item)
+
+    # Content stored before this batch is reused by every URL; new content is only stored once
+    new = []
+    for download in fetched:
+        if download.content_hash in existing:
+            new.append(download)
+        elif download.content_hash in first_urls:
+            _mark_duplicate(report, duplicate_of, download.url, first_urls[download.content_hash])
+        else:
+            first_urls[download.content_hash] = download.url
+            new.append(download)
+
+    to_extract = [download for download in new if download.content_hash not in existing]
+    _progress(progress, f"Extracting {len(to_extract)} new documents")
+    texts = extract_all(to_extract)
+
+    created = []
+    try:
+        for download in new:
+            entry = report[download.url]
+            content_hash = download.content_hash
+            if content_hash in existing:
+                new_input = Input.copy_of(existing[content_hash], download.url, content_hash)
+                entry["status"] = 'reused'
+            elif isinstance(texts[content_hash], Exception):
+                _fail(entry, texts[content_hash])
+                continue
+            else:
+                new_input = Input(
+                    document_name=download.url,
+                    document_url=download.url,
+                    document_contents=texts[content_hash],
+                    content_hash=content_hash
+                )
+                created.append(new_input)
+                entry["status"] = 'created'
+            new_input.remember_download(download)
+            db.session.add(new_input)
+            entry["input"] = new_input
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    for download in new:
+        new_input = report[download.url].pop("input", None)
+        if new_input is not None:
+            report[download.url]["input_id"] = new_input.id
+    return created
+
+
+def fetch_all(urls, workers=INGEST_FETCH_WORKERS):
+    """Download urls concurrently; maps each url to its Download, or to the exception it raised."""
+    results = {}
+    if not urls:
+        return results
+    with http_session(workers) as session, ThreadPoolExecutor(max_workers=min(workers, len(urls))) as executor:
+        futures = {executor.submit(fetch_document, url, session): url for url in urls}
+        for future in as_completed(futures):
+            url = futures[future]
+            try:
+                results[url] = future.result()
+            except Exception as e:
+                logger.error(f"Error fetching {url}: {str(e)}")
+                results[url] = e
+    return results
+
+
+def extract_all(downloads, workers=INGEST_EXTRACT_WORKERS):
+    """Text of each download keyed by content hash, or the exception extraction raised."""
+    texts = {}
+    pdfs = []
+    for download in downloads:
+        if is_pdf(download):
+            pdfs.append(download)
+        else:
+            texts[download.content_hash] = decode_text(download.content)
+
+    if len(pdfs) == 1 or workers <= 1:
+        # A lone PDF can still use the page-level process pool inside extract_text_from_pdf
+        for download in pdfs:
+            texts[download.content_hash] = _extract_or_error(download)
+        return texts
+
+    if pdfs:
+        # One process per document; each extracts its pages serially to avoid nested pools
+        extract = partial(extract_text_from_pdf, workers=1)
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=min(workers, len(pdfs)), mp_context=context) as executor:
+            futures = {executor.submit(extract, download.content): download for download in pdfs}
+            for future in as_completed(futures):
+                download = futures[future]
+                try:
+                    texts[download.content_hash] = future.result()
+                except Exception as e:
+                    logger.error(f"Error extracting {download.url}: {str(e)}")
+                    texts[download.content_hash] = e
+    return texts
+
+
+def summarize_report(report):
+    counts = {}
+    for entry in report:
+        counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+    return counts
+
+
+def _extract_or_error(download):
+    try:
+        return extract_text_from_pdf(download.content)
+    except Exception as e:
+        logger.error(f"Error extracting {download.url}: {str(e)}")
+        return e
+
+
+def _mark_duplicate(report, duplicate_of, url, first_url):
+    report[url]["status"] = 'duplicate'
+    duplicate_of[url] = first_url
+
+
+def _fail(entry, error):
+    entry["status"] = 'failed'
+    entry["error"] = str(error)
+
+
+def _progress(progress, message):
+    if progress:
+        progress(message)
+
+
+def _read_urls(sources):
+    urls = []
+    for source in sources:
+        if source == '-':
+            urls.extend(sys.stdin.read().split())
+        elif os.path.isfile(source):
+            with open(source) as f:
+                urls.extend(line.strip() for line in f if line.strip() and not line.startswith('#'))
+        else:
+            urls.append(source)
+    return urls
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Ingest many document URLs at once.")
+    parser.add_argument('sources', nargs='+', help="URLs, files with one URL per line, or - for stdin")
+    parser.add_argument('--no-summaries', action='store_true', help="Don't queue summaries for new inputs")
+    args = parser.parse_args()
+
+    from main import app, queue_summary
+    import jobs
+
+    with app.app_context():
+        report = ingest_urls(_read_urls(args.sources), queue_summary=None if args.no_summaries else queue_summary)
+    for entry in report:
+        detail = entry.get("error") or (f"input {entry['input_id']}" if entry["input_id"] else '')
+        print(f"{entry['status']:<10} {entry['url']} {detail}")
+    print(', '.join(f"{count} {status}" for status, count in summarize_report(report).items()))
+
+    if not args.no_summaries and any("job_id" in entry for entry in report):
+        print("Waiting for queued summaries to finish...")
+        jobs.shutdown()
@@ -1,12 +1,9 @@
 import os
 from flask import Flask
-from models import db, Input
+from models import db, Input, configure_database
 
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['DATABASE_URL']
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-db.init_app(app)
+configure_database(app)
 
 with app.app_context():
     db.create_all()
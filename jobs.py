@@ -0,0 +1,181 @@
+import os
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from sqlalchemy.exc import SQLAlchemyError
+from models import db, Job
+import query_stats
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Number of background threads that run jobs in each app process
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 4))
+# Queued/running jobs that have not reported anything for this long are treated as dead
+# (for example after a gunicorn restart) and no longer block new identical jobs
+JOB_STALE_SECONDS = int(os.environ.get('JOB_STALE_SECONDS', 900))
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+_app = None
+_executor = None
+_enqueue_lock = threading.Lock()
+_current = threading.local()
+
+
+def init_app(app):
+    global _app, _executor
+    _app = app
+    _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='job')
+    with app.app_context():
+        try:
+            fail_stale_jobs()
+        except SQLAlchemyError as e:
+            # The jobs table may not exist yet (before the first migration)
+            db.session.rollback()
+            logger.warning(f"Could not check for interrupted jobs: {getattr(e, 'orig', e)}")
+
+
+def enqueue(kind, func, *args, input_id=None, dedupe_key=None):
+    """Queue func(*args) to run in the background and return its Job row.
+
+    If an identical job (same dedupe key, by default kind + input id) is already
+    queued or running, that job is returned instead of starting a new one.
+    """
+    if _executor is None:
+        raise RuntimeError("jobs.init_app(app) has not been called")
+
+    job, created = _claim(kind, input_id, dedupe_key, 'queued')
+    if not created:
+        return job
+
+    metrics.job_queue_depth.inc()
+    _executor.submit(_run, job.id, func, args)
+    return job
+
+
+def start_inline(kind, input_id=None, dedupe_key=None):
+    """Record work done in the calling thread (a streamed response) as a running Job.
+
+    It is deduplicated against queued jobs like enqueue: returns (job, started), where started is
+    False and job is the in-flight one if an identical job is already queued or running.
+    The caller ends it with finish_inline.
+    """
+    return _claim(kind, input_id, dedupe_key, 'running')
+
+
+def finish_inline(job_id, result=None, error=None):
+    """Mark a job started with start_inline as succeeded (with result) or failed; only the first call counts."""
+    now = datetime.utcnow()
+    values = {'status': 'failed', 'error': error} if error is not None else {
+        'status': 'succeeded', 'result': json.dumps(result)
+    }
+    # On its own connection, as the caller's session may be mid-rollback
+    with db.engine.begin() as connection:
+        connection.execute(
+            update(Job).where(Job.id == job_id, Job.status == 'running').values(finished_at=now, updated_at=now, **values)
+        )
+
+
+def _claim(kind, input_id, dedupe_key, status):
+    dedupe_key = dedupe_key or f"{kind}:{input_id}"
+    stale_cutoff = datetime.utcnow() - timedelta(seconds=JOB_STALE_SECONDS)
+
+    with _enqueue_lock:
+        existing = Job.query.filter(
+            Job.dedupe_key == dedupe_key,
+            Job.status.in_(ACTIVE_STATUSES),
+            Job.updated_at >= stale_cutoff
+        ).order_by(Job.id.desc()).first()
+        if existing:
+            logger.info(f"Reusing in-flight job {existing.id} for {dedupe_key}")
+            return existing, False
+
+        job = Job(kind=kind, input_id=input_id, dedupe_key=dedupe_key, status=status)
+        if status == 'running':
+            job.started_at = datetime.utcnow()
+        db.session.add(job)
+        db.session.commit()
+    return job, True
+
+
+def fail_stale_jobs(job_ids=None):
+    """Mark queued/running jobs that stopped reporting JOB_STALE_SECONDS ago as failed; returns how many."""
+    now = datetime.utcnow()
+    query = update(Job).where(
+        Job.status.in_(ACTIVE_STATUSES),
+        Job.updated_at < now - timedelta(seconds=JOB_STALE_SECONDS)
+    )
+    if job_ids is not None:
+        query = query.where(Job.id.in_(job_ids))
+    count = db.session.execute(query.values(
+        status='failed', error="Interrupted (no progress reported, the app was probably restarted)",
+        finished_at=now, updated_at=now
+    )).rowcount
+    db.session.commit()
+    if count:
+        logger.warning(f"Marked {count} interrupted jobs as failed")
+    return count
+
+
+def shutdown(wait=True):
+    """Stop accepting jobs; with wait=True block until queued and running jobs have finished."""
+    if _executor is not None:
+        _executor.shutdown(wait=wait)
+
+
+def set_progress(message, job_id=None):
+    """Record a progress message for the job running on this thread, or for job_id (no-op outside jobs)."""
+    job_id = job_id or getattr(_current, 'job_id', None)
+    if job_id is None:
+        return
+    # Written on its own connection so the job's unfinished work is not committed with it
+    with db.engine.begin() as connection:
+        connection.execute(
+            update(Job).where(Job.id == job_id).values(progress=message, updated_at=datetime.utcnow())
+        )
+
+
+def _run(job_id, func, args):
+    metrics.job_queue_depth.dec()
+    metrics.jobs_running.inc()
+    try:
+        _run_job(job_id, func, args)
+    finally:
+        metrics.jobs_running.dec()
+
+
+def _run_job(job_id, func, args):
+    with _app.app_context():
+        job = db.session.get(Job, job_id)
+        job.status = 'running'
+        job.started_at = datetime.utcnow()
+        db.session.commit()
+
+        _current.job_id = job_id
+        query_stats.start()
+        try:
+            # Serialized here so a result that is not JSON fails the job instead of the thread
+            result = json.dumps(func(*args))
+        except Exception as e:
+            logger.error(f"Job {job_id} ({job.kind}) failed: {str(e)}", exc_info=True)
+            db.session.rollback()
+            job = db.session.get(Job, job_id)
+            job.status = 'failed'
+            job.error = str(e)
+        else:
+            job = db.session.get(Job, job_id)
+            job.status = 'succeeded'
+            job.result = result
+        finally:
+            _current.job_id = None
+            stats = query_stats.finish()
+            if stats is not None:
+                stats.report(f"Job {job_id} ({job.kind})")
+
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        metrics.job_duration.observe((job.finished_at - job.started_at).total_seconds(), kind=job.kind, status=job.status)
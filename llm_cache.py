@@ -0,0 +1,147 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import select, insert, update, delete, func
+from sqlalchemy.exc import IntegrityError
+from models import db, LLMCacheEntry
+import llm_gateway
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_ENABLED = os.environ.get('LLM_CACHE_ENABLED', '1') != '0'
+# Entries not used for this many days are evicted
+LLM_CACHE_MAX_AGE_DAYS = int(os.environ.get('LLM_CACHE_MAX_AGE_DAYS', 30))
+# Least recently used entries beyond this count are evicted
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get('LLM_CACHE_MAX_ENTRIES', 5000))
+# Run eviction after this many stores rather than on every write
+EVICT_EVERY = 50
+
+_stats = {'hits': 0, 'misses': 0, 'bypassed': 0, 'stores': 0, 'evicted': 0}
+_stats_lock = threading.Lock()
+
+
+def cache_key(payload):
+    """Hash the parts of a chat completion request that determine its output."""
+    material = json.dumps({
+        'model': payload.get('model'),
+        'messages': payload.get('messages'),
+        'response_format': payload.get('response_format'),
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def cached_completion(payload, bypass=False, caller=None):
+    """Return the message content for payload, calling the model only on a cache miss.
+
+    bypass=True always calls the model ("force regenerate") and replaces the cached entry.
+    Cache reads and writes use their own connection so they never commit the caller's session.
+    """
+    if not LLM_CACHE_ENABLED:
+        return _complete(payload, caller)
+
+    key = cache_key(payload)
+    if bypass:
+        _count('bypassed')
+    else:
+        content = _lookup(key)
+        if content is not None:
+            _count('hits')
+            return content
+        _count('misses')
+
+    content = _complete(payload, caller)
+    _store(key, payload.get('model'), content)
+    return content
+
+
+def cached_response(payload, bypass=False):
+    """Cached content for payload, or None; for callers that call the model themselves (e.g. streaming)."""
+    if not LLM_CACHE_ENABLED:
+        return None
+    if bypass:
+        _count('bypassed')
+        return None
+    content = _lookup(cache_key(payload))
+    _count('hits' if content is not None else 'misses')
+    return content
+
+
+def store_completion(payload, content):
+    """Seed the cache with a response obtained outside cached_completion (e.g. from a batch run)."""
+    if LLM_CACHE_ENABLED:
+        _store(cache_key(payload), payload.get('model'), content)
+
+
+def get_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / lookups if lookups else None
+    stats['entries'] = db.session.scalar(select(func.count()).select_from(LLMCacheEntry))
+    return stats
+
+
+def evict():
+    """Delete entries older than LLM_CACHE_MAX_AGE_DAYS and trim to LLM_CACHE_MAX_ENTRIES."""
+    cutoff = datetime.utcnow() - timedelta(days=LLM_CACHE_MAX_AGE_DAYS)
+    overflow = select(LLMCacheEntry.key).order_by(LLMCacheEntry.last_used_at.desc()).offset(LLM_CACHE_MAX_ENTRIES)
+    with db.engine.begin() as connection:
+        removed = connection.execute(delete(LLMCacheEntry).where(LLMCacheEntry.last_used_at < cutoff)).rowcount
+        removed += connection.execute(
+            delete(LLMCacheEntry).where(LLMCacheEntry.key.in_(overflow.scalar_subquery()))
+        ).rowcount
+    _count('evicted', removed)
+    return removed
+
+
+def _complete(payload, caller):
+    response = llm_gateway.chat_completion(payload, caller=caller)
+    return response.choices[0].message.content
+
+
+def _lookup(key):
+    try:
+        with db.engine.begin() as connection:
+            content = connection.scalar(select(LLMCacheEntry.response).where(LLMCacheEntry.key == key))
+            if content is not None:
+                connection.execute(
+                    update(LLMCacheEntry)
+                    .where(LLMCacheEntry.key == key)
+                    .values(hit_count=LLMCacheEntry.hit_count + 1, last_used_at=datetime.utcnow())
+                )
+        return content
+    except Exception as e:
+        logger.warning(f"LLM cache lookup failed, calling the model: {str(e)}")
+        return None
+
+
+def _store(key, model, content):
+    now = datetime.utcnow()
+    try:
+        with db.engine.begin() as connection:
+            connection.execute(delete(LLMCacheEntry).where(LLMCacheEntry.key == key))
+            connection.execute(insert(LLMCacheEntry).values(
+                key=key, model=model, response=content, hit_count=0, created_at=now, last_used_at=now
+            ))
+    except IntegrityError:
+        # Another worker stored the same response concurrently
+        return
+    except Exception as e:
+        # A cache failure must never fail the model call it wraps
+        logger.warning(f"Could not store LLM cache entry: {str(e)}")
+        return
+
+    if _count('stores') % EVICT_EVERY == 0:
+        try:
+            evict()
+        except Exception as e:
+            logger.warning(f"LLM cache eviction failed: {str(e)}")
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+        return _stats[name]
@@ -0,0 +1,188 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+import openai
+from openai import OpenAI, AsyncOpenAI
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Requests in flight at once across every thread (and event loop) of this process
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', 8))
+# Provider budgets; keep them a little under the account's limits
+LLM_REQUESTS_PER_MINUTE = int(os.environ.get('LLM_REQUESTS_PER_MINUTE', 500))
+LLM_TOKENS_PER_MINUTE = int(os.environ.get('LLM_TOKENS_PER_MINUTE', 200000))
+LLM_MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', 5))
+LLM_BACKOFF_BASE = float(os.environ.get('LLM_BACKOFF_BASE', 1.0))
+LLM_BACKOFF_MAX = float(os.environ.get('LLM_BACKOFF_MAX', 60.0))
+LLM_TIMEOUT = float(os.environ.get('LLM_TIMEOUT', 300))
+# Completion tokens reserved against the TPM budget when a request sets no max_tokens
+DEFAULT_COMPLETION_TOKENS = 2000
+
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError)
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at rate_per_minute.
+
+    reserve() never blocks: it takes the tokens (the balance may go negative) and returns how
+    long the caller has to wait, so the same bucket serves threads and asyncio tasks.
+    """
+
+    def __init__(self, rate_per_minute):
+        self.capacity = rate_per_minute
+        self.rate_per_second = rate_per_minute / 60.0
+        self.tokens = float(rate_per_minute)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, amount):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate_per_second)
+            self.updated = now
+            self.tokens -= min(amount, self.capacity)
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate_per_second
+
+
+_slots = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+_request_bucket = TokenBucket(LLM_REQUESTS_PER_MINUTE)
+_token_bucket = TokenBucket(LLM_TOKENS_PER_MINUTE)
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Process-wide OpenAI client, so every call reuses the same HTTP connection pool."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            # Retries are handled here so they respect the shared rate budget
+            _client = OpenAI(api_key=os.environ['OPENAI_API_KEY'], max_retries=0, timeout=LLM_TIMEOUT)
+        return _client
+
+
+def get_async_client():
+    global _async_client
+    with _client_lock:
+        if _async_client is None:
+            _async_client = AsyncOpenAI(api_key=os.environ['OPENAI_API_KEY'], max_retries=0, timeout=LLM_TIMEOUT)
+        return _async_client
+
+
+def chat_completion(payload, caller=None):
+    """Rate-limited, concurrency-capped chat completion with retries on 429, 5xx and timeouts."""
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        time.sleep(_reserve_budget(payload))
+        with _slots:
+            started = time.perf_counter()
+            try:
+                response = get_client().chat.completions.create(**payload)
+            except RETRYABLE_ERRORS as e:
+                delay = _retry_delay(e, attempt, caller)
+            except Exception as e:
+                metrics.observe_llm_error(e, caller, retrying=False)
+                raise
+            else:
+                metrics.observe_llm_response(response, caller, payload.get('model'), time.perf_counter() - started)
+                return response
+        time.sleep(delay)
+
+
+def stream_chat_completion(payload, caller=None):
+    """Yield the content deltas of a streamed chat completion under the same limits as chat_completion.
+
+    Failures are retried only until the first delta has arrived; after that they propagate,
+    since the caller has already consumed part of the response.
+    """
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        time.sleep(_reserve_budget(payload))
+        started = False
+        with _slots:
+            request_started = time.perf_counter()
+            usage_chunk = None
+            try:
+                # include_usage adds a final chunk without choices that carries the token counts
+                with get_client().chat.completions.create(**payload, stream=True, stream_options={"include_usage": True}) as stream:
+                    for chunk in stream:
+                        if getattr(chunk, 'usage', None) is not None:
+                            usage_chunk = chunk
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            started = True
+                            yield chunk.choices[0].delta.content
+            except RETRYABLE_ERRORS as e:
+                if started:
+                    metrics.observe_llm_error(e, caller, retrying=False)
+                    raise
+                delay = _retry_delay(e, attempt, caller)
+            except Exception as e:
+                metrics.observe_llm_error(e, caller, retrying=False)
+                raise
+            else:
+                metrics.observe_llm_response(usage_chunk, caller, payload.get('model'), time.perf_counter() - request_started)
+                return
+        time.sleep(delay)
+
+
+async def achat_completion(payload, caller=None):
+    """asyncio version of chat_completion sharing the same concurrency cap and budgets."""
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        await asyncio.sleep(_reserve_budget(payload))
+        while not _slots.acquire(blocking=False):
+            await asyncio.sleep(0.05)
+        started = time.perf_counter()
+        try:
+            response = await get_async_client().chat.completions.create(**payload)
+        except RETRYABLE_ERRORS as e:
+            delay = _retry_delay(e, attempt, caller)
+        except Exception as e:
+            metrics.observe_llm_error(e, caller, retrying=False)
+            raise
+        else:
+            metrics.observe_llm_response(response, caller, payload.get('model'), time.perf_counter() - started)
+            return response
+        finally:
+            _slots.release()
+        await asyncio.sleep(delay)
+
+
+def estimate_request_tokens(payload):
+    # Roughly four characters per token, plus the completion we may get back
+    prompt_characters = sum(len(str(message.get('content', ''))) for message in payload.get('messages', []))
+    return prompt_characters // 4 + payload.get('max_tokens', DEFAULT_COMPLETION_TOKENS)
+
+
+def _reserve_budget(payload):
+    return max(_request_bucket.reserve(1), _token_bucket.reserve(estimate_request_tokens(payload)))
+
+
+def _retry_delay(error, attempt, caller):
+    metrics.observe_llm_error(error, caller, retrying=attempt < LLM_MAX_RETRIES)
+    if attempt >= LLM_MAX_RETRIES:
+        raise error
+    # Full jitter keeps many workers from retrying in lockstep
+    delay = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+    retry_after = _retry_after_seconds(error)
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    logger.warning(
+        f"LLM call{f' from {caller}' if caller else ''} failed ({type(error).__name__}), "
+        f"retry {attempt + 1}/{LLM_MAX_RETRIES} in {delay:.1f}s"
+    )
+    return delay
+
+
+def _retry_after_seconds(error):
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,135 @@
+import json
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+import llm_cache
+import llm_gateway
+
+
+class JSONArrayStream:
+    """Incremental parser yielding the elements of one top-level array as soon as each is complete.
+
+    Structured outputs arrive as {"claim_edits": [{...}, {...}]}; feed() takes the raw text
+    deltas of a streamed completion and returns the elements of the array under `key` that
+    were closed by that delta.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.string_chars = []
+        self.last_key = None
+        self.in_array = False
+        self.element = None
+
+    def feed(self, text):
+        completed = []
+        for char in text:
+            if self.element is not None:
+                self.element.append(char)
+
+            if self.in_string:
+                if self.depth == 1:
+                    self.string_chars.append(char)
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                    if self.depth == 1:
+                        # Strings directly inside the outer object are its keys (or plain values)
+                        self.last_key = json.loads('"' + ''.join(self.string_chars[:-1]) + '"')
+                continue
+
+            if char == '"':
+                self.in_string = True
+                self.string_chars = []
+            elif char in '{[':
+                if self.depth == 1 and char == '[' and self.last_key == self.key:
+                    self.in_array = True
+                elif self.in_array and self.depth == 2:
+                    self.element = [char]
+                self.depth += 1
+            elif char in '}]':
+                self.depth -= 1
+                if self.in_array and self.depth == 2 and self.element is not None:
+                    completed.append(json.loads(''.join(self.element)))
+                    self.element = None
+                elif self.in_array and self.depth == 1:
+                    self.in_array = False
+        return completed
+
+
+def stream_array_items(payload, key, caller=None, force=False):
+    """Yield the elements of the response array `key` for payload as soon as each one is complete.
+
+    A cached response is replayed immediately (unless force=True); a streamed response is
+    stored in the LLM cache once it has finished.
+    """
+    cached = llm_cache.cached_response(payload, bypass=force)
+    if cached is not None:
+        yield from json.loads(cached)[key]
+        return
+
+    parser = JSONArrayStream(key)
+    parts = []
+    for delta in llm_gateway.stream_chat_completion(payload, caller=caller):
+        parts.append(delta)
+        yield from parser.feed(delta)
+    llm_cache.store_completion(payload, ''.join(parts))
+
+
+def merge_streams(streams, concurrency):
+    """Run item generators concurrently and yield (stream index, item) in arrival order.
+
+    streams are zero-argument callables returning generators; they run on worker threads
+    with the app context. The first error is re-raised here, and closing this generator
+    (e.g. a disconnected client) stops the workers at their next item.
+    """
+    if len(streams) == 1:
+        for item in streams[0]():
+            yield 0, item
+        return
+
+    app = current_app._get_current_object()
+    items = queue.Queue()
+    stop = threading.Event()
+    finished = object()
+
+    def run(index, stream):
+        with app.app_context():
+            try:
+                for item in stream():
+                    if stop.is_set():
+                        return
+                    items.put((index, item, None))
+            except Exception as e:
+                items.put((index, None, e))
+            finally:
+                items.put((index, finished, None))
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(streams))))
+    try:
+        for index, stream in enumerate(streams):
+            executor.submit(run, index, stream)
+        remaining = len(streams)
+        while remaining:
+            index, item, error = items.get()
+            if error is not None:
+                raise error
+            if item is finished:
+                remaining -= 1
+                continue
+            yield index, item
+    finally:
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def sse_event(event, data):
+    """Format one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
@@ -1,13 +1,33 @@
 import os
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+import json
+import hashlib
+import tempfile
+from datetime import timedelta
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.exc import IntegrityError
-from models import db, Input, ClaimEdit
-from conflicts_gpt import analyze_edit_conflicts
+from sqlalchemy.orm import selectinload, joinedload, load_only
+from models import db, Input, ClaimEdit, Job, EditConflict, DocumentBlob, configure_database
+import jobs
+import query_stats
+import metrics
+import llm_cache
+from conflicts_gpt import analyze_edit_conflicts, stream_edit_conflicts
 import logging
 from sqlalchemy.exc import SQLAlchemyError
 from summarize_input import summarize_input as generate_summary
-from generate_claim_edits import generate_claim_edits
+from generate_claim_edits import generate_claim_edits, stream_claim_edits
+from document_refresh import refresh_input
+from refresh_sources import refresh_sources
+from llm_streaming import sse_event
+from ingest import ingest_urls, summarize_report, INGEST_MAX_URLS
+import search_index
+import page_cache
+import edit_duplicates
+from claim_rules import compile_rules, save_reviewed_rule, load_rules
+from export_catalog import export_catalog, ExportError, EXPORT_FORMATS
+from rule_engine import evaluate_file, RuleError
+from claim_segments import edits_by_segment, inputs_by_segment, segment_counts, normalize_segment, filter_by_segment
 
 app = Flask(__name__)
 
@@ -16,22 +36,90 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['DATABASE_URL']
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
+configure_database(app)
+query_stats.init_app(app)
+metrics.init_app(app, lambda: db.engine)
+jobs.init_app(app)
+
+# Rows per page in the inputs and claim edits listings
+LISTING_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+def _force_requested():
+    # ?force=1 skips the LLM response cache ("force regenerate")
+    return request.values.get('force', '').lower() in ('1', 'true', 'yes')
 
 @app.route('/')
+@page_cache.cached_page
 def index():
     try:
-        inputs = Input.query.all()
+        inputs, next_cursor = list_inputs()
     except Exception as e:
         app.logger.error(f"Database error: {str(e)}")
-        inputs = []  # Set inputs to an empty list if there's an error
+        # Returned with a status so the error page is not cached
         error_message = "Database connection error. Please try again later."
-    else:
-        error_message = None
+        return render_template('inputs.html', inputs=[], next_cursor=None, error_message=error_message), 503
+
+    return render_template('inputs.html', inputs=inputs, next_cursor=next_cursor, error_message=None)
+
+@app.route('/api/inputs')
+def api_inputs():
+    inputs, next_cursor = list_inputs(request.args.get('after', type=int), _page_size())
+    return jsonify(success=True, items=[input_item.to_listing_dict() for input_item in inputs], next_cursor=next_cursor)
+
+def list_inputs(after=None, limit=LISTING_PAGE_SIZE):
+    # document_contents is deferred on the model, so listing rows stay small
+    query = Input.query.options(
+        load_only(Input.id, Input.document_name, Input.document_summary, Input.document_summary_html, Input.document_type)
+    )
+    return _keyset_page(query, Input.id, after, limit)
 
-    return render_template('inputs.html', inputs=inputs, error_message=error_message)
+def list_claim_edits(after=None, limit=LISTING_PAGE_SIZE, segment=None):
+    query = ClaimEdit.query.options(joinedload(ClaimEdit.input).load_only(Input.id, Input.document_name))
+    if segment:
+        query = filter_by_segment(query, segment)
+    return _keyset_page(query, ClaimEdit.id, after, limit)
+
+def _keyset_page(query, key_column, after, limit):
+    """Return one page of rows ordered by key_column after the cursor, and the next cursor (or None)."""
+    if after is not None:
+        query = query.filter(key_column > after)
+    rows = query.order_by(key_column).limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, getattr(rows[-1], key_column.key)
+    return rows, None
+
+def _page_size():
+    return max(1, min(request.args.get('limit', LISTING_PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+
+def _sse_response(events):
+    response = Response(stream_with_context(events), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Keep nginx and similar proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def _job_sse_response(kind, events, input_id=None, dedupe_key=None):
+    """Stream events(job_id) while recording the work as a running job, deduplicated like jobs.enqueue.
+
+    Streams hold a request thread until the model is done, which is why the app runs gunicorn's
+    threaded worker (see .replit). If an identical job is already queued or running, the stream
+    only sends a 'job' event naming it, for the client to poll instead.
+    """
+    job, started = jobs.start_inline(kind, input_id=input_id, dedupe_key=dedupe_key)
+    if not started:
+        return _sse_response(iter([sse_event('job', {"job_id": job.id})]))
+    job_id = job.id
+
+    def tracked():
+        try:
+            yield from events(job_id)
+        finally:
+            # No-op when events() finished the job; otherwise the client went away mid-stream
+            jobs.finish_inline(job_id, error="The stream was closed before it finished")
+
+    return _sse_response(tracked())
 
 @app.route('/add_input', methods=['POST'])
 def add_input():
@@ -41,37 +129,92 @@ def add_input():
         return jsonify({"success": False, "error": "No URL provided"}), 400
 
     try:
-        new_input = Input.create_from_url(document_url)
-        if new_input:
-            db.session.add(new_input)
-            db.session.commit()
+        job = jobs.enqueue('add_input', _add_input_job, document_url, dedupe_key=f"add_input:{document_url}")
+        return jsonify({"success": True, "message": "Input queued", "job_id": job.id}), 202
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"success": False, "error": str(e)}), 500
+
+def _add_input_job(document_url):
+    jobs.set_progress("Fetching document")
+    new_input = Input.create_from_url(document_url)
+    if not new_input:
+        raise ValueError("Failed to create input from URL")
+    db.session.add(new_input)
+    db.session.commit()
+
+    # Now that we have committed the new input, we can access its ID
+    new_input_id = new_input.id
+
+    if new_input.document_summary:
+        # Identical content was already ingested and summarized under another URL
+        return {
+            "input_id": new_input_id,
+            "message": "Input added, reusing the summary of an identical document",
+            "summary": new_input.document_summary,
+            "generated_name": new_input.document_name
+        }
+
+    # Call the summarize_input function
+    try:
+        jobs.set_progress("Summarizing document")
+        summary, generated_name = generate_summary(new_input_id)
+        return {
+            "input_id": new_input_id,
+            "message": "Input added and summarized successfully",
+            "summary": summary,
+            "generated_name": generated_name
+        }
+    except Exception as summarize_error:
+        # If summarization fails, we still return success for adding the input
+        logger.error(f"Error summarizing input: {str(summarize_error)}")
+        db.session.rollback()
+        return {
+            "input_id": new_input_id,
+            "message": "Input added successfully, but summarization failed",
+            "summarize_error": str(summarize_error)
+        }
 
-            # Now that we have committed the new input, we can access its ID
-            new_input_id = new_input.id
-
-            # Call the summarize_input function
-            try:
-                summary, generated_name = generate_summary(new_input_id)
-                return jsonify({
-                    "success": True, 
-                    "message": "Input added and summarized successfully",
-                    "summary": summary,
-                    "generated_name": generated_name
-                }), 200
-            except Exception as summarize_error:
-                # If summarization fails, we still return success for adding the input
-                logger.error(f"Error summarizing input: {str(summarize_error)}")
-                return jsonify({
-                    "success": True, 
-                    "message": "Input added successfully, but summarization failed",
-                    "summarize_error": str(summarize_error)
-                }), 200
-        else:
-            return jsonify({"success": False, "error": "Failed to create input from URL"}), 400
+@app.route('/add_inputs_bulk', methods=['POST'])
+def add_inputs_bulk():
+    # JSON {"urls": [...]} or a form field with one URL per line
+    if request.is_json:
+        document_urls = (request.get_json(silent=True) or {}).get('urls') or []
+    else:
+        document_urls = request.form.get('document_urls', '').split()
+    document_urls = list(dict.fromkeys(url.strip() for url in document_urls if url.strip()))
+
+    if not document_urls:
+        return jsonify({"success": False, "error": "No URLs provided"}), 400
+    if len(document_urls) > INGEST_MAX_URLS:
+        return jsonify({"success": False, "error": f"At most {INGEST_MAX_URLS} URLs per request"}), 400
+
+    try:
+        dedupe_key = "add_inputs_bulk:" + hashlib.sha256('\n'.join(document_urls).encode('utf-8')).hexdigest()
+        job = jobs.enqueue('add_inputs_bulk', _add_inputs_bulk_job, document_urls, dedupe_key=dedupe_key)
+        return jsonify({"success": True, "message": f"{len(document_urls)} URLs queued", "job_id": job.id}), 202
     except Exception as e:
         db.session.rollback()
         return jsonify({"success": False, "error": str(e)}), 500
 
+def _add_inputs_bulk_job(document_urls):
+    report = ingest_urls(document_urls, queue_summary=queue_summary, progress=jobs.set_progress)
+    counts = summarize_report(report)
+    return {
+        "message": "Inputs processed: " + ', '.join(f"{count} {status}" for status, count in counts.items()),
+        "counts": counts,
+        "inputs": report
+    }
+
+def queue_summary(input_id, force=False):
+    return jobs.enqueue('summarize', _summarize_job, input_id, force, input_id=input_id)
+
+def _summarize_job(input_id, force=False):
+    jobs.set_progress("Summarizing document")
+    summary, generated_name = generate_summary(input_id, force=force)
+    summary_html = db.session.get(Input, input_id).document_summary_html
+    return {"summary": summary, "summary_html": summary_html, "generated_name": generated_name}
+
 @app.route('/add_input_legacy', methods=['POST'])
 def add_input_legacy():
     legacy_code = request.form.get('legacy_code')
@@ -80,35 +223,35 @@ def add_input_legacy():
         return jsonify({"success": False, "error": "No legacy code provided"}), 400
 
     try:
+        content_hash = hashlib.sha256(legacy_code.encode('utf-8')).hexdigest()
+        existing = Input.find_by_content_hash(content_hash)
         new_input = Input(
-            document_name="Legacy Code",
+            document_name=existing.document_name if existing else "Legacy Code",
             document_url="🚫 Not Applicable",
             document_contents=legacy_code,
-            document_type="Legacy Code"
+            document_summary=existing.document_summary if existing else '',
+            document_summary_html=existing.document_summary_html if existing else None,
+            document_type=existing.document_type if existing else "Legacy Code",
+            content_hash=content_hash
         )
         db.session.add(new_input)
         db.session.commit()
 
-        # Now that we have committed the new input, we can access its ID
-        new_input_id = new_input.id
-
-        # Call the summarize_input function
-        try:
-            summary, generated_name = generate_summary(new_input_id)
-            return jsonify({
-                "success": True, 
-                "message": "Legacy code added and summarized successfully",
-                "summary": summary,
-                "generated_name": generated_name
-            }), 200
-        except Exception as summarize_error:
-            # If summarization fails, we still return success for adding the input
-            logger.error(f"Error summarizing legacy code: {str(summarize_error)}")
+        if new_input.document_summary:
             return jsonify({
-                "success": True, 
-                "message": "Legacy code added successfully, but summarization failed",
-                "summarize_error": str(summarize_error)
+                "success": True,
+                "message": "Legacy code added, reusing the summary of identical code",
+                "input_id": new_input.id
             }), 200
+
+        # Now that we have committed the new input, we can summarize it in the background
+        job = queue_summary(new_input.id)
+        return jsonify({
+            "success": True,
+            "message": "Legacy code added, summary queued",
+            "input_id": new_input.id,
+            "job_id": job.id
+        }), 202
     except Exception as e:
         db.session.rollback()
         return jsonify({"success": False, "error": str(e)}), 500
@@ -119,33 +262,30 @@ def update_input(input_id):
     data = request.json
 
     if 'document_summary' in data:
-        input_item.document_summary = data['document_summary']
+        input_item.set_summary(data['document_summary'])
     elif 'document_name' in data:
         input_item.document_name = data['document_name']
 
     try:
         db.session.commit()
-        return jsonify(success=True)
+        return jsonify(success=True, document_summary_html=input_item.document_summary_html)
     except Exception as e:
         db.session.rollback()
         return jsonify(success=False, error=str(e))
 
 @app.route('/input/<int:input_id>/summarize', methods=['POST'])
 def summarize_input(input_id):
-    input_item = Input.query.get_or_404(input_id)
+    Input.query.get_or_404(input_id)
 
     try:
-        summary, generated_name = generate_summary(input_id)
-
-        # The generate_summary function already updates the database,
-        # so we don't need to set input_item.document_summary or commit here
-
-        return jsonify(success=True, summary=summary, generated_name=generated_name)
+        job = queue_summary(input_id, _force_requested())
+        return jsonify(success=True, job_id=job.id), 202
     except Exception as e:
         db.session.rollback()
         return jsonify(success=False, error=str(e)), 500
 
 @app.route('/input/<int:input_id>')
+@page_cache.cached_page
 def input_contents(input_id):
     input_item = Input.query.get_or_404(input_id)
     claim_edits = ClaimEdit.query.filter_by(input_id=input_id).all()
@@ -156,23 +296,57 @@ def input_contents(input_id):
     )
 
 @app.route('/conflicts')
+@page_cache.cached_page
 def conflicts():
-    return render_template('conflicts.html')
+    # Serve the stored analysis; the model is only called when new edits are analyzed
+    stored_conflicts = EditConflict.query.options(
+        selectinload(EditConflict.claim_edits).joinedload(ClaimEdit.input)
+    ).order_by(EditConflict.id).all()
+    pending_count = ClaimEdit.query.filter(ClaimEdit.conflicts_analyzed_at.is_(None)).count()
+    return render_template('conflicts.html', conflicts=stored_conflicts, pending_count=pending_count)
 
 @app.route('/analyze_conflicts', methods=['GET'])
 def analyze_conflicts():
     try:
-        summary = analyze_edit_conflicts()
-        return jsonify(success=True, summary=summary)
+        job = jobs.enqueue('analyze_conflicts', _analyze_conflicts_job, _force_requested(), dedupe_key='analyze_conflicts')
+        return jsonify(success=True, job_id=job.id), 202
     except Exception as e:
         logger.error(f"Error in analyze_conflicts: {str(e)}")
         return jsonify(success=False, error=str(e))
 
+@app.route('/analyze_conflicts/stream')
+def analyze_conflicts_stream():
+    force = _force_requested()
+
+    def events(job_id):
+        count = 0
+        try:
+            for conflict in stream_edit_conflicts(force=force):
+                count += 1
+                jobs.set_progress(f"Found {count} new conflicts", job_id=job_id)
+                yield sse_event('conflict', conflict.to_dict())
+            message = f"Found {count} new conflicts"
+            jobs.finish_inline(job_id, result={"summary": message})
+            yield sse_event('done', {"message": message})
+        except Exception as e:
+            logger.error(f"Error streaming conflict analysis: {str(e)}")
+            jobs.finish_inline(job_id, error=str(e))
+            yield sse_event('failed', {"error": str(e)})
+
+    return _job_sse_response('analyze_conflicts', events, dedupe_key='analyze_conflicts')
+
+def _analyze_conflicts_job(force):
+    jobs.set_progress("Analyzing claim edits")
+    return {"summary": analyze_edit_conflicts(force=force, progress=jobs.set_progress)}
+
 @app.route('/input/<int:input_id>/delete', methods=['POST'])
 def delete_input(input_id):
     input_doc = Input.query.get_or_404(input_id)
     try:
         db.session.delete(input_doc)
+        db.session.flush()
+        DocumentBlob.delete_unreferenced()
+        edit_duplicates.prune_clusters()
         db.session.commit()
         return jsonify({"success": True})
     except Exception as e:
@@ -181,19 +355,244 @@ def delete_input(input_id):
 
 @app.route('/input/<int:input_id>/generate_edits', methods=['POST'])
 def generate_edits(input_id):
+    Input.query.get_or_404(input_id)
+
+    # mode=chunked / mode=single overrides the automatic choice based on document size
+    mode = request.values.get('mode')
+    chunked = {'chunked': True, 'single': False}.get(mode)
+
+    try:
+        job = jobs.enqueue('generate_edits', _generate_edits_job, input_id, chunked, _force_requested(), input_id=input_id)
+        return jsonify(success=True, job_id=job.id), 202
+    except Exception as e:
+        logger.error(f"Error queueing edit generation: {str(e)}")
+        return jsonify(success=False, error=str(e)), 500
+
+@app.route('/input/<int:input_id>/generate_edits/stream')
+def generate_edits_stream(input_id):
+    Input.query.get_or_404(input_id)
+    chunked = {'chunked': True, 'single': False}.get(request.values.get('mode'))
+    force = _force_requested()
+
+    def events(job_id):
+        count = 0
+        try:
+            for edit in stream_claim_edits(input_id, chunked=chunked, force=force):
+                count += 1
+                jobs.set_progress(f"Stored {count} claim edits", job_id=job_id)
+                yield sse_event('edit', edit)
+            message = f"Generated {count} claim edits for input {input_id}"
+            jobs.finish_inline(job_id, result={"message": message})
+            yield sse_event('done', {"message": message})
+        except Exception as e:
+            logger.error(f"Error streaming claim edits: {str(e)}")
+            jobs.finish_inline(job_id, error=str(e))
+            yield sse_event('failed', {"error": str(e)})
+
+    return _job_sse_response('generate_edits', events, input_id=input_id)
+
+def _generate_edits_job(input_id, chunked, force):
+    jobs.set_progress("Generating claim edits")
+    return {"message": generate_claim_edits(input_id, chunked=chunked, progress=jobs.set_progress, force=force)}
+
+@app.route('/input/<int:input_id>/refresh', methods=['POST'])
+def refresh_input_route(input_id):
+    input_doc = Input.query.get_or_404(input_id)
+    if not input_doc.has_http_source:
+        return jsonify(success=False, error="Input has no http(s) source URL"), 400
+
     try:
-        # Generate the edits
-        result_message = generate_claim_edits(input_id)
-        
-        return jsonify(success=True, message=result_message)
+        job = jobs.enqueue('refresh_input', _refresh_input_job, input_id, _force_requested(), input_id=input_id)
+        return jsonify(success=True, job_id=job.id), 202
     except Exception as e:
-        print(f"Error generating edits: {str(e)}")  # For debugging
+        logger.error(f"Error queueing input refresh: {str(e)}")
         return jsonify(success=False, error=str(e)), 500
 
+def _refresh_input_job(input_id, force):
+    result = refresh_input(input_id, progress=jobs.set_progress, force=force)
+    if not result.changed:
+        message = "Source document is unchanged"
+    else:
+        message = (f"{result.changed_pages} of {result.pages} pages changed: kept {result.kept} claim edits, "
+                   f"replaced {result.removed} with {result.added} from {result.requests} requests")
+    return {"message": message, **result._asdict()}
+
+@app.route('/refresh_sources', methods=['POST'])
+def refresh_sources_route():
+    # older_than_hours skips sources checked recently, e.g. when a scheduler retries
+    older_than = request.values.get('older_than_hours', type=float)
+
+    try:
+        job = jobs.enqueue('refresh_sources', _refresh_sources_job, older_than, _force_requested(),
+                           dedupe_key='refresh_sources')
+        return jsonify(success=True, job_id=job.id), 202
+    except Exception as e:
+        logger.error(f"Error queueing source refresh: {str(e)}")
+        return jsonify(success=False, error=str(e)), 500
+
+def _refresh_sources_job(older_than_hours, force):
+    jobs.set_progress("Checking sources")
+    older_than = timedelta(hours=older_than_hours) if older_than_hours is not None else None
+    report = refresh_sources(older_than=older_than, progress=jobs.set_progress, force=force)
+    return {"summary": summarize_report(report), "inputs": report}
+
+@app.route('/llm_cache/stats')
+def llm_cache_stats():
+    return jsonify(success=True, stats=llm_cache.get_stats())
+
+@app.route('/jobs/<int:job_id>')
+def job_status(job_id):
+    job = Job.query.get_or_404(job_id)
+    if job.status in jobs.ACTIVE_STATUSES and jobs.fail_stale_jobs([job_id]):
+        db.session.refresh(job)
+    return jsonify(success=True, job=job.to_dict())
+
 @app.route('/claim_edits')
+@page_cache.cached_page
 def claim_edits():
-    claim_edits = ClaimEdit.query.all()
-    return render_template('claim_edits.html', claim_edits=claim_edits)
+    segment = request.args.get('segment')
+    claim_edits, next_cursor = list_claim_edits(segment=segment)
+    return render_template('claim_edits.html', claim_edits=claim_edits, next_cursor=next_cursor, segment=segment)
+
+@app.route('/api/claim_edits')
+def api_claim_edits():
+    claim_edits, next_cursor = list_claim_edits(
+        request.args.get('after', type=int), _page_size(), request.args.get('segment')
+    )
+    return jsonify(success=True, items=[edit.to_dict() for edit in claim_edits], next_cursor=next_cursor)
+
+@app.route('/claim_edits/export')
+def export_claim_edits():
+    return _export_response('claim_edits')
+
+@app.route('/inputs/export')
+def export_inputs():
+    return _export_response('inputs')
+
+def _export_response(catalog):
+    file_format = request.args.get('format', 'csv')
+    try:
+        chunks = export_catalog(
+            catalog, file_format, request.args.getlist('input_id', type=int),
+            request.args.get('document_type'), request.args.get('segment')
+        )
+    except ExportError as e:
+        return jsonify(success=False, error=str(e)), 400
+    content_type, extension = EXPORT_FORMATS[file_format]
+    # Streamed batch by batch from a server-side cursor
+    response = Response(stream_with_context(chunks), mimetype=content_type)
+    response.headers['Content-Disposition'] = f'attachment; filename={catalog}.{extension}'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/claim_edits/compile_rules', methods=['POST'])
+def compile_claim_rules():
+    try:
+        job = jobs.enqueue('compile_rules', _compile_rules_job, _force_requested(), dedupe_key='compile_rules')
+        return jsonify(success=True, job_id=job.id), 202
+    except Exception as e:
+        logger.error(f"Error queueing rule compilation: {str(e)}")
+        return jsonify(success=False, error=str(e)), 500
+
+def _compile_rules_job(force):
+    jobs.set_progress("Compiling claim edit rules")
+    return {"counts": compile_rules(force=force, progress=jobs.set_progress)}
+
+@app.route('/claim_edits/<int:edit_id>/rule', methods=['GET', 'POST'])
+def claim_edit_rule(edit_id):
+    edit = ClaimEdit.query.get_or_404(edit_id)
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            save_reviewed_rule(edit, data.get('rule'), data.get('notes'))
+            db.session.commit()
+        except RuleError as e:
+            return jsonify(success=False, error=str(e)), 400
+    return jsonify(success=True, claim_edit_id=edit.id, rule=json.loads(edit.rule) if edit.rule else None,
+                   rule_status=edit.rule_status, rule_notes=edit.rule_notes)
+
+@app.route('/validate_claims', methods=['POST'])
+def validate_claims():
+    # Upload a CSV, JSON Lines or 837 file as 'claims'; large files are better served by rule_engine.py
+    upload = request.files.get('claims')
+    if not upload:
+        return jsonify(success=False, error="No claims file provided"), 400
+    rules = load_rules(request.values.getlist('input_id', type=int) or None, request.values.get('document_type'))
+    if not rules:
+        return jsonify(success=False, error="No compiled rules"), 400
+
+    suffix = os.path.splitext(upload.filename or '')[1]
+    with tempfile.NamedTemporaryFile(suffix=suffix) as claims_file:
+        upload.save(claims_file.name)
+        try:
+            claims = 0
+            results = []
+            for batch_claims, fired in evaluate_file(claims_file.name, rules, request.values.get('format'), workers=1):
+                claims += batch_claims
+                results.extend({"claim_id": claim_id, "edit_ids": edit_ids} for claim_id, edit_ids in fired)
+        except (ValueError, UnicodeDecodeError) as e:
+            return jsonify(success=False, error=f"Could not read claims: {str(e)}"), 400
+    return jsonify(success=True, claims=claims, rules=len(rules), flagged=len(results), results=results)
+
+@app.route('/search')
+def search():
+    query, kind, page = _search_args()
+    results, has_more = search_index.search(query, kind, page, _page_size())
+    return render_template(
+        'search.html', query=query, kind=kind, kinds=search_index.SEARCH_KINDS, results=results, page=page, has_more=has_more
+    )
+
+@app.route('/api/search')
+def api_search():
+    query, kind, page = _search_args()
+    results, has_more = search_index.search(query, kind, page, _page_size())
+    return jsonify(success=True, items=[
+        {**result._asdict(), 'snippet': str(result.snippet)} for result in results
+    ], next_page=page + 1 if has_more else None)
+
+def _search_args():
+    kind = request.args.get('kind')
+    if kind not in search_index.SEARCH_KINDS:
+        kind = None
+    return request.args.get('q', '').strip(), kind, max(1, request.args.get('page', 1, type=int))
+
+@app.route('/duplicates')
+def duplicates():
+    return jsonify(success=True, clusters=edit_duplicates.list_clusters())
+
+@app.route('/duplicates/rebuild', methods=['POST'])
+def rebuild_duplicates():
+    try:
+        job = jobs.enqueue('rebuild_duplicates', _rebuild_duplicates_job, dedupe_key='rebuild_duplicates')
+        return jsonify(success=True, job_id=job.id), 202
+    except Exception as e:
+        logger.error(f"Error in rebuild_duplicates: {str(e)}")
+        return jsonify(success=False, error=str(e))
+
+def _rebuild_duplicates_job():
+    edits, clusters = edit_duplicates.rebuild(progress=jobs.set_progress)
+    return {"claim_edits": edits, "clusters": clusters}
+
+@app.route('/segments')
+def segments():
+    return jsonify(success=True, segments=[
+        {"segment": segment, "claim_edit_count": count} for segment, count in segment_counts()
+    ])
+
+@app.route('/segments/<segment>/claim_edits')
+def claim_edits_by_segment(segment):
+    element = request.args.get('element')
+    return jsonify(success=True, segment=normalize_segment(segment), claim_edits=[
+        edit.to_dict() for edit in edits_by_segment(segment, element)
+    ])
+
+@app.route('/segments/<segment>/inputs')
+def inputs_by_segment_route(segment):
+    return jsonify(success=True, segment=normalize_segment(segment), inputs=[{
+        "id": input_item.id,
+        "document_name": input_item.document_name,
+        "document_type": input_item.document_type
+    } for input_item in inputs_by_segment(segment)])
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=81)
\ No newline at end of file
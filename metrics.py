@@ -0,0 +1,214 @@
+"""In-process metrics rendered in the Prometheus text exposition format at /metrics.
+
+Updating a metric is a dict lookup and a few additions under a per-metric lock, so the
+instrumentation stays on in production. Each gunicorn worker keeps its own values;
+scrape every worker (or run a single worker) for complete numbers.
+"""
+import time
+import bisect
+import threading
+from flask import Response, g, request
+
+# Seconds; spans fast listing requests up to multi-minute LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_registry = []
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values = {}
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(label, '')) for label in self.labelnames)
+
+    def _format_labels(self, key, extra=None):
+        pairs = list(zip(self.labelnames, key))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{label}="{_escape(value)}"' for label, value in pairs) + '}'
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            samples = list(self._samples())
+        lines.extend(samples)
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def _samples(self):
+        for key, value in self.values.items():
+            yield f"{self.name}{self._format_labels(key)} {value}"
+
+
+class Gauge(_Metric):
+    """Gauge set directly, or computed at scrape time by `collect` returning {labels tuple: value}."""
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), collect=None):
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self):
+        if self.collect:
+            try:
+                collected = self.collect()
+            except Exception:
+                # A failing collector must not break the whole scrape
+                collected = {}
+            with self.lock:
+                self.values = dict(collected)
+        return super().render()
+
+    def _samples(self):
+        for key, value in self.values.items():
+            yield f"{self.name}{self._format_labels(key)} {value}"
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self):
+        for key, (bucket_counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), bucket_counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                yield f"{self.name}_bucket{self._format_labels(key, ('le', le))} {cumulative}"
+            yield f"{self.name}_sum{self._format_labels(key)} {total}"
+            yield f"{self.name}_count{self._format_labels(key)} {count}"
+
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+# HTTP
+http_request_duration = Histogram(
+    'http_request_duration_seconds', "Time to produce a response, by route template.", ('method', 'route', 'status')
+)
+
+# LLM gateway
+llm_request_duration = Histogram(
+    'llm_request_duration_seconds', "Duration of successful model calls.", ('caller', 'model')
+)
+llm_requests = Counter('llm_requests_total', "Model call attempts by outcome.", ('caller', 'outcome'))
+llm_errors = Counter('llm_errors_total', "Failed model call attempts by error type.", ('caller', 'error'))
+llm_prompt_tokens = Counter('llm_prompt_tokens_total', "Prompt tokens reported by the API.", ('caller', 'model'))
+llm_completion_tokens = Counter('llm_completion_tokens_total', "Completion tokens reported by the API.", ('caller', 'model'))
+
+# Documents
+document_download_bytes = Counter('document_download_bytes_total', "Bytes of source documents downloaded.")
+document_downloads = Counter('document_downloads_total', "Source document downloads by outcome.", ('outcome',))
+pdf_pages_extracted = Counter('pdf_pages_extracted_total', "PDF pages whose text was extracted.")
+pdf_extraction_duration = Histogram('pdf_extraction_duration_seconds', "Time to extract the text of one PDF.")
+
+# Prompt compaction
+prompt_tokens_saved = Counter('prompt_tokens_saved_total', "Document tokens removed from prompts by compaction.", ('caller',))
+prompt_truncations = Counter('prompt_truncations_total', "Prompts cut to fit the token budget.", ('caller',))
+
+# Background jobs
+job_queue_depth = Gauge('job_queue_depth', "Jobs queued in this process and not started yet.")
+jobs_running = Gauge('jobs_running', "Jobs currently running in this process.")
+job_duration = Histogram('job_duration_seconds', "Background job run time.", ('kind', 'status'))
+
+
+def observe_llm_response(response, caller, model, seconds):
+    """Record a successful model call; response may be None for streams without usage."""
+    caller = caller or 'unknown'
+    llm_request_duration.observe(seconds, caller=caller, model=model)
+    llm_requests.inc(caller=caller, outcome='success')
+    usage = getattr(response, 'usage', None)
+    if usage is not None:
+        llm_prompt_tokens.inc(usage.prompt_tokens or 0, caller=caller, model=model)
+        llm_completion_tokens.inc(usage.completion_tokens or 0, caller=caller, model=model)
+
+
+def observe_llm_error(error, caller, retrying):
+    caller = caller or 'unknown'
+    llm_requests.inc(caller=caller, outcome='retry' if retrying else 'error')
+    llm_errors.inc(caller=caller, error=type(error).__name__)
+
+
+def init_app(app, engine_getter):
+    """Time every request and expose /metrics; engine_getter returns the SQLAlchemy engine for pool stats."""
+
+    def pool_stats():
+        pool = engine_getter().pool
+        stats = {}
+        for state, method in (('size', 'size'), ('checked_out', 'checkedout'), ('checked_in', 'checkedin'), ('overflow', 'overflow')):
+            # SQLite pools do not implement every counter
+            if hasattr(pool, method):
+                stats[(state,)] = getattr(pool, method)()
+        return stats
+
+    Gauge('db_pool_connections', "Connection pool state (size, checked_out, checked_in, overflow).", ('state',), collect=pool_stats)
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def observe_request(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else '<unmatched>'
+            http_request_duration.observe(
+                time.perf_counter() - started, method=request.method, route=route, status=response.status_code
+            )
+        return response
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        return Response(render(), mimetype='text/plain; version=0.0.4')
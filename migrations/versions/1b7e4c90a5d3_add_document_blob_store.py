@@ -0,0 +1,100 @@
+"""Add compressed document blob store
+
+Revision ID: 1b7e4c90a5d3
+Revises: f2a8d61b03c9
+Create Date: 2026-10-18 15:08:44.635019
+
+"""
+import zlib
+import hashlib
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1b7e4c90a5d3'
+down_revision = 'f2a8d61b03c9'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 50
+
+inputs = sa.table('inputs',
+    sa.column('id', sa.Integer),
+    sa.column('document_contents', sa.Text),
+    sa.column('document_blob_hash', sa.Text)
+)
+document_blobs = sa.table('document_blobs',
+    sa.column('hash', sa.Text),
+    sa.column('compression', sa.Text),
+    sa.column('size', sa.Integer),
+    sa.column('compressed_size', sa.Integer),
+    sa.column('data', sa.LargeBinary),
+    sa.column('created_at', sa.DateTime)
+)
+
+
+def upgrade():
+    op.create_table('document_blobs',
+    sa.Column('hash', sa.Text(), nullable=False),
+    sa.Column('compression', sa.Text(), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('compressed_size', sa.Integer(), nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('hash')
+    )
+    with op.batch_alter_table('inputs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('document_blob_hash', sa.Text(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_inputs_document_blob_hash'), ['document_blob_hash'], unique=False)
+        batch_op.create_foreign_key('fk_inputs_document_blob_hash', 'document_blobs', ['document_blob_hash'], ['hash'])
+
+    # Move existing inline text into the blob store, a few rows at a time
+    connection = op.get_bind()
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(inputs.c.id, inputs.c.document_contents)
+            .where(inputs.c.id > last_id, inputs.c.document_contents.isnot(None))
+            .order_by(inputs.c.id).limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        for input_id, text in rows:
+            raw = text.encode('utf-8')
+            content_hash = hashlib.sha256(raw).hexdigest()
+            exists = connection.execute(
+                sa.select(document_blobs.c.hash).where(document_blobs.c.hash == content_hash)
+            ).first()
+            if not exists:
+                data = zlib.compress(raw, 6)
+                connection.execute(document_blobs.insert().values(
+                    hash=content_hash, compression='zlib', size=len(raw), compressed_size=len(data),
+                    data=data, created_at=datetime.utcnow()
+                ))
+            connection.execute(
+                inputs.update().where(inputs.c.id == input_id)
+                .values(document_blob_hash=content_hash, document_contents=None)
+            )
+        last_id = rows[-1][0]
+
+
+def downgrade():
+    connection = op.get_bind()
+    rows = connection.execute(
+        sa.select(inputs.c.id, document_blobs.c.data)
+        .select_from(inputs.join(document_blobs, inputs.c.document_blob_hash == document_blobs.c.hash))
+    ).all()
+    for input_id, data in rows:
+        connection.execute(
+            inputs.update().where(inputs.c.id == input_id)
+            .values(document_contents=zlib.decompress(data).decode('utf-8'))
+        )
+
+    with op.batch_alter_table('inputs', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_inputs_document_blob_hash', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_inputs_document_blob_hash'))
+        batch_op.drop_column('document_blob_hash')
+
+    op.drop_table('document_blobs')
@@ -0,0 +1,46 @@
+"""Add per-page hashes and claim edit page ranges
+
+Revision ID: 4d8b1f6a2e93
+Revises: 9a4d2c7e5b16
+Create Date: 2026-10-18 20:12:48.315702
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d8b1f6a2e93'
+down_revision = '9a4d2c7e5b16'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('document_pages',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('input_id', sa.Integer(), nullable=False),
+    sa.Column('page_number', sa.Integer(), nullable=False),
+    sa.Column('content_hash', sa.Text(), nullable=False),
+    sa.ForeignKeyConstraint(['input_id'], ['inputs.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('document_pages', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_document_pages_input_id'), ['input_id'], unique=False)
+
+    with op.batch_alter_table('claim_edits', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('page_start', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('page_end', sa.Integer(), nullable=True))
+
+    # Existing inputs are hashed from their stored text on their first refresh
+
+
+def downgrade():
+    with op.batch_alter_table('claim_edits', schema=None) as batch_op:
+        batch_op.drop_column('page_end')
+        batch_op.drop_column('page_start')
+
+    with op.batch_alter_table('document_pages', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_document_pages_input_id'))
+
+    op.drop_table('document_pages')
@@ -0,0 +1,75 @@
+"""Add search_entries full-text index
+
+Revision ID: 6e0f3b8a1c52
+Revises: 1b7e4c90a5d3
+Create Date: 2026-10-18 17:42:10.318205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6e0f3b8a1c52'
+down_revision = '1b7e4c90a5d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('search_entries',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.Text(), nullable=False),
+    sa.Column('input_id', sa.Integer(), nullable=False),
+    sa.Column('claim_edit_id', sa.Integer(), nullable=True),
+    sa.Column('page', sa.Integer(), nullable=True),
+    sa.Column('title', sa.Text(), nullable=True),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.ForeignKeyConstraint(['claim_edit_id'], ['claim_edits.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['input_id'], ['inputs.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('search_entries', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_search_entries_claim_edit_id'), ['claim_edit_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_search_entries_input_id'), ['input_id'], unique=False)
+
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(
+            "ALTER TABLE search_entries ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('english', content), 'B')) STORED"
+        )
+        op.execute("CREATE INDEX ix_search_entries_search_vector ON search_entries USING gin (search_vector)")
+    else:
+        op.execute(
+            "CREATE VIRTUAL TABLE search_entries_fts USING fts5("
+            "title, content, content='search_entries', content_rowid='id', tokenize='porter unicode61')"
+        )
+        op.execute(
+            "CREATE TRIGGER search_entries_ai AFTER INSERT ON search_entries BEGIN "
+            "INSERT INTO search_entries_fts(rowid, title, content) VALUES (new.id, new.title, new.content); END"
+        )
+        op.execute(
+            "CREATE TRIGGER search_entries_ad AFTER DELETE ON search_entries BEGIN "
+            "INSERT INTO search_entries_fts(search_entries_fts, rowid, title, content) "
+            "VALUES ('delete', old.id, old.title, old.content); END"
+        )
+        op.execute(
+            "CREATE TRIGGER search_entries_au AFTER UPDATE ON search_entries BEGIN "
+            "INSERT INTO search_entries_fts(search_entries_fts, rowid, title, content) "
+            "VALUES ('delete', old.id, old.title, old.content); "
+            "INSERT INTO search_entries_fts(rowid, title, content) VALUES (new.id, new.title, new.content); END"
+        )
+
+    # Existing inputs and claim edits are indexed by running `python search_index.py`
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        op.execute("DROP TABLE IF EXISTS search_entries_fts")
+
+    with op.batch_alter_table('search_entries', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_search_entries_input_id'))
+        batch_op.drop_index(batch_op.f('ix_search_entries_claim_edit_id'))
+
+    op.drop_table('search_entries')
@@ -0,0 +1,34 @@
+"""Add rendered HTML of summaries and conflict details
+
+Revision ID: 7c2e4a9b0d35
+Revises: e3a7c5d91b46
+Create Date: 2026-10-18 23:41:07.302518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2e4a9b0d35'
+down_revision = 'e3a7c5d91b46'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('inputs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('document_summary_html', sa.Text(), nullable=True))
+
+    with op.batch_alter_table('edit_conflicts', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('details_html', sa.Text(), nullable=True))
+
+    # Existing summaries and conflict details are rendered by running `python render_markdown.py`
+
+
+def downgrade():
+    with op.batch_alter_table('edit_conflicts', schema=None) as batch_op:
+        batch_op.drop_column('details_html')
+
+    with op.batch_alter_table('inputs', schema=None) as batch_op:
+        batch_op.drop_column('document_summary_html')
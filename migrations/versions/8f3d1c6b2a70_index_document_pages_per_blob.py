@@ -0,0 +1,75 @@
+"""Index document pages once per blob
+
+Revision ID: 8f3d1c6b2a70
+Revises: 7c2e4a9b0d35
+Create Date: 2026-10-19 10:12:44.518306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8f3d1c6b2a70'
+down_revision = '7c2e4a9b0d35'
+branch_labels = None
+depends_on = None
+
+SQLITE_TRIGGERS = (
+    "CREATE TRIGGER search_entries_ai AFTER INSERT ON search_entries BEGIN "
+    "INSERT INTO search_entries_fts(rowid, title, content) VALUES (new.id, new.title, new.content); END",
+    "CREATE TRIGGER search_entries_ad AFTER DELETE ON search_entries BEGIN "
+    "INSERT INTO search_entries_fts(search_entries_fts, rowid, title, content) "
+    "VALUES ('delete', old.id, old.title, old.content); END",
+    "CREATE TRIGGER search_entries_au AFTER UPDATE ON search_entries BEGIN "
+    "INSERT INTO search_entries_fts(search_entries_fts, rowid, title, content) "
+    "VALUES ('delete', old.id, old.title, old.content); "
+    "INSERT INTO search_entries_fts(rowid, title, content) VALUES (new.id, new.title, new.content); END",
+)
+
+
+def upgrade():
+    # Deleted while the SQLite triggers still keep search_entries_fts in step
+    op.execute("DELETE FROM search_entries WHERE kind = 'page'")
+    sqlite = op.get_bind().dialect.name != 'postgresql'
+    if sqlite:
+        # The batch table rebuild below would drop them
+        _drop_triggers()
+
+    with op.batch_alter_table('search_entries', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('blob_hash', sa.Text(), nullable=True))
+        batch_op.alter_column('input_id', existing_type=sa.Integer(), nullable=True)
+        batch_op.create_foreign_key('fk_search_entries_blob_hash', 'document_blobs', ['blob_hash'], ['hash'],
+                                    ondelete='CASCADE')
+        batch_op.create_index(batch_op.f('ix_search_entries_blob_hash'), ['blob_hash'], unique=False)
+
+    if sqlite:
+        _create_triggers()
+
+    # Pages are indexed again, once per blob, by running `python search_index.py`
+
+
+def downgrade():
+    op.execute("DELETE FROM search_entries WHERE input_id IS NULL")
+    sqlite = op.get_bind().dialect.name != 'postgresql'
+    if sqlite:
+        _drop_triggers()
+
+    with op.batch_alter_table('search_entries', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_search_entries_blob_hash'))
+        batch_op.drop_constraint('fk_search_entries_blob_hash', type_='foreignkey')
+        batch_op.alter_column('input_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.drop_column('blob_hash')
+
+    if sqlite:
+        _create_triggers()
+
+
+def _drop_triggers():
+    for name in ('search_entries_ai', 'search_entries_ad', 'search_entries_au'):
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def _create_triggers():
+    for statement in SQLITE_TRIGGERS:
+        op.execute(statement)
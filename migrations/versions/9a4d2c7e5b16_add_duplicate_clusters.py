@@ -0,0 +1,63 @@
+"""Add near-duplicate claim edit clusters
+
+Revision ID: 9a4d2c7e5b16
+Revises: 6e0f3b8a1c52
+Create Date: 2026-10-18 19:05:37.902144
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4d2c7e5b16'
+down_revision = '6e0f3b8a1c52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('duplicate_clusters',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('edit_minhashes',
+    sa.Column('claim_edit_id', sa.Integer(), nullable=False),
+    sa.Column('signature', sa.LargeBinary(), nullable=False),
+    sa.ForeignKeyConstraint(['claim_edit_id'], ['claim_edits.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('claim_edit_id')
+    )
+    op.create_table('edit_lsh_buckets',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('claim_edit_id', sa.Integer(), nullable=False),
+    sa.Column('bucket', sa.BigInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['claim_edit_id'], ['claim_edits.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('edit_lsh_buckets', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_edit_lsh_buckets_bucket'), ['bucket'], unique=False)
+        batch_op.create_index(batch_op.f('ix_edit_lsh_buckets_claim_edit_id'), ['claim_edit_id'], unique=False)
+
+    with op.batch_alter_table('claim_edits', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('duplicate_cluster_id', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_claim_edits_duplicate_cluster_id'), ['duplicate_cluster_id'], unique=False)
+        batch_op.create_foreign_key('fk_claim_edits_duplicate_cluster_id', 'duplicate_clusters',
+                                    ['duplicate_cluster_id'], ['id'], ondelete='SET NULL')
+
+    # Existing edits are signed and clustered by running `python edit_duplicates.py`
+
+
+def downgrade():
+    with op.batch_alter_table('claim_edits', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_claim_edits_duplicate_cluster_id', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_claim_edits_duplicate_cluster_id'))
+        batch_op.drop_column('duplicate_cluster_id')
+
+    with op.batch_alter_table('edit_lsh_buckets', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_edit_lsh_buckets_claim_edit_id'))
+        batch_op.drop_index(batch_op.f('ix_edit_lsh_buckets_bucket'))
+
+    op.drop_table('edit_lsh_buckets')
+    op.drop_table('edit_minhashes')
+    op.drop_table('duplicate_clusters')
@@ -0,0 +1,28 @@
+"""Add content_hash column to inputs table
+
+Revision ID: a3e9c47f1d20
+Revises: 5c1f0a7d2b34
+Create Date: 2026-10-18 10:03:17.264410
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3e9c47f1d20'
+down_revision = '5c1f0a7d2b34'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('inputs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.Text(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_inputs_content_hash'), ['content_hash'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('inputs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_inputs_content_hash'))
+        batch_op.drop_column('content_hash')
@@ -0,0 +1,36 @@
+"""Add HTTP validators and last check time to inputs
+
+Revision ID: b6c3e9a14f28
+Revises: 4d8b1f6a2e93
+Create Date: 2026-10-18 21:03:11.574920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6c3e9a14f28'
+down_revision = '4d8b1f6a2e93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('inputs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('http_etag', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('http_last_modified', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('content_length', sa.BigInteger(), nullable=True))
+        batch_op.add_column(sa.Column('source_checked_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_inputs_source_checked_at'), ['source_checked_at'], unique=False)
+
+    # Existing inputs get their validators from the first `python refresh_sources.py` run
+
+
+def downgrade():
+    with op.batch_alter_table('inputs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_inputs_source_checked_at'))
+        batch_op.drop_column('source_checked_at')
+        batch_op.drop_column('content_length')
+        batch_op.drop_column('http_last_modified')
+        batch_op.drop_column('http_etag')
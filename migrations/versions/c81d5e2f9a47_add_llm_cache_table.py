@@ -0,0 +1,37 @@
+"""Add llm_cache table
+
+Revision ID: c81d5e2f9a47
+Revises: a3e9c47f1d20
+Create Date: 2026-10-18 11:20:05.913382
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c81d5e2f9a47'
+down_revision = 'a3e9c47f1d20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('llm_cache',
+    sa.Column('key', sa.Text(), nullable=False),
+    sa.Column('model', sa.Text(), nullable=False),
+    sa.Column('response', sa.Text(), nullable=False),
+    sa.Column('hit_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('last_used_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+    with op.batch_alter_table('llm_cache', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_llm_cache_last_used_at'), ['last_used_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('llm_cache', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_llm_cache_last_used_at'))
+
+    op.drop_table('llm_cache')
@@ -0,0 +1,50 @@
+"""Add persisted edit conflicts
+
+Revision ID: d47b2e8c6f15
+Revises: c81d5e2f9a47
+Create Date: 2026-10-18 12:41:52.172904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd47b2e8c6f15'
+down_revision = 'c81d5e2f9a47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('edit_conflicts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.Text(), nullable=False),
+    sa.Column('details', sa.Text(), nullable=False),
+    sa.Column('member_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('edit_conflict_members',
+    sa.Column('conflict_id', sa.Integer(), nullable=False),
+    sa.Column('claim_edit_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['claim_edit_id'], ['claim_edits.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['conflict_id'], ['edit_conflicts.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('conflict_id', 'claim_edit_id')
+    )
+    with op.batch_alter_table('edit_conflict_members', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_edit_conflict_members_claim_edit_id'), ['claim_edit_id'], unique=False)
+
+    with op.batch_alter_table('claim_edits', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('conflicts_analyzed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('claim_edits', schema=None) as batch_op:
+        batch_op.drop_column('conflicts_analyzed_at')
+
+    with op.batch_alter_table('edit_conflict_members', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_edit_conflict_members_claim_edit_id'))
+
+    op.drop_table('edit_conflict_members')
+    op.drop_table('edit_conflicts')
@@ -0,0 +1,36 @@
+"""Add compiled rules to claim edits
+
+Revision ID: e3a7c5d91b46
+Revises: b6c3e9a14f28
+Create Date: 2026-10-18 22:26:40.118263
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3a7c5d91b46'
+down_revision = 'b6c3e9a14f28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('claim_edits', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('rule', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('rule_status', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('rule_notes', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('rule_compiled_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_claim_edits_rule_status'), ['rule_status'], unique=False)
+
+    # Existing edits are compiled by running `python claim_rules.py`
+
+
+def downgrade():
+    with op.batch_alter_table('claim_edits', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_claim_edits_rule_status'))
+        batch_op.drop_column('rule_compiled_at')
+        batch_op.drop_column('rule_notes')
+        batch_op.drop_column('rule_status')
+        batch_op.drop_column('rule')
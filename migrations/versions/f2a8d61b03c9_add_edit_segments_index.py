@@ -0,0 +1,41 @@
+"""Add edit_segments index table
+
+Revision ID: f2a8d61b03c9
+Revises: d47b2e8c6f15
+Create Date: 2026-10-18 13:55:20.448127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a8d61b03c9'
+down_revision = 'd47b2e8c6f15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('edit_segments',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('claim_edit_id', sa.Integer(), nullable=False),
+    sa.Column('segment', sa.Text(), nullable=False),
+    sa.Column('element', sa.Text(), nullable=True),
+    sa.Column('source', sa.Text(), nullable=False),
+    sa.ForeignKeyConstraint(['claim_edit_id'], ['claim_edits.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('edit_segments', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_edit_segments_claim_edit_id'), ['claim_edit_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_edit_segments_segment'), ['segment'], unique=False)
+
+    # Existing edits are indexed by running `python claim_segments.py`
+
+
+def downgrade():
+    with op.batch_alter_table('edit_segments', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_edit_segments_segment'))
+        batch_op.drop_index(batch_op.f('ix_edit_segments_claim_edit_id'))
+
+    op.drop_table('edit_segments')
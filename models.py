@@ -1,9 +1,16 @@
 import os
+import json
+import zlib
+import codecs
+import hashlib
+from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.orm import DeclarativeBase
-import requests
+from sqlalchemy import select, delete, event, DDL
+from sqlalchemy.orm import DeclarativeBase, deferred
+from markupsafe import Markup
 from bs4 import BeautifulSoup
-from extract_contents import extract_text_from_pdf
+from extract_contents import extract_text_from_pdf, fetch_document, is_pdf, decode_text, page_hashes
+from render_markdown import render_markdown
 import logging
 
 class Base(DeclarativeBase):
@@ -11,65 +18,226 @@ class Base(DeclarativeBase):
 
 db = SQLAlchemy(model_class=Base)
 
+BLOB_COMPRESSION_LEVEL = 6
+BLOB_READ_CHUNK_SIZE = 256 * 1024
+# Source URLs that can be fetched again; legacy rows store placeholders such as "🚫 Not Applicable"
+SOURCE_URL_PREFIXES = ('http://', 'https://')
+
 class Input(db.Model):
     __tablename__ = 'inputs'
     id = db.Column(db.Integer, primary_key=True)
     document_name = db.Column(db.Text, nullable=True)  # Change this line to allow null values
     document_url = db.Column(db.Text, nullable=True)
-    document_contents = db.Column(db.Text, nullable=True)
+    # Inline text of rows created before the blob store; new text lives in document_blobs
+    _document_contents = deferred(db.Column('document_contents', db.Text, nullable=True))
+    document_blob_hash = db.Column(db.Text, db.ForeignKey('document_blobs.hash'), nullable=True, index=True)
     document_summary = db.Column(db.Text, nullable=True, default='')
+    document_summary_html = db.Column(db.Text, nullable=True)  # Sanitized HTML of the summary, rendered on write
     document_type = db.Column(db.Text, nullable=False, default='unknown')  # Set default value
+    content_hash = db.Column(db.Text, nullable=True, index=True)  # SHA-256 of the downloaded bytes or pasted code
+    # Validators of the last download, sent back as If-None-Match / If-Modified-Since on refresh
+    http_etag = db.Column(db.Text, nullable=True)
+    http_last_modified = db.Column(db.Text, nullable=True)
+    content_length = db.Column(db.BigInteger, nullable=True)  # Bytes of the last full download
+    source_checked_at = db.Column(db.DateTime, nullable=True, index=True)  # Last time the source URL was fetched
 
     # ... rest of the model ...
 
     # Add relationship to ClaimEdits
     claim_edits = db.relationship('ClaimEdit', back_populates='input', cascade='all, delete-orphan')
+    document_blob = db.relationship('DocumentBlob')
+    pages = db.relationship('DocumentPage', order_by='DocumentPage.page_number', cascade='all, delete-orphan')
 
     def __repr__(self):
         return f'<Input {self.document_name}>'
 
+    @property
+    def document_contents(self):
+        """Full extracted text, decompressed from the blob store on access."""
+        if self.document_blob is not None:
+            return self.document_blob.read_text()
+        return self._document_contents
+
+    @document_contents.setter
+    def document_contents(self, text):
+        self._document_contents = None
+        self.document_blob = DocumentBlob.store(text) if text is not None else None
+        self.pages = DocumentPage.for_text(text)
+
+    def iter_document_contents(self):
+        """Yield the text in pieces without materializing the whole document at once."""
+        if self.document_blob is not None:
+            yield from self.document_blob.iter_text()
+        elif self._document_contents:
+            yield self._document_contents
+
+    def share_contents_with(self, other):
+        """Reference another input's stored text without decompressing and recompressing it."""
+        if other.document_blob is not None:
+            self._document_contents = None
+            self.document_blob = other.document_blob
+            self.pages = [DocumentPage(page_number=page.page_number, content_hash=page.content_hash) for page in other.pages]
+        else:
+            self.document_contents = other.document_contents
+
+    def remember_download(self, download):
+        """Keep the HTTP validators of a download so the next check can be a conditional request."""
+        self.http_etag = download.etag
+        self.http_last_modified = download.last_modified
+        if download.content is not None:
+            self.content_length = len(download.content)
+        self.source_checked_at = datetime.utcnow()
+
+    @property
+    def has_http_source(self):
+        return (self.document_url or '').startswith(SOURCE_URL_PREFIXES)
+
+    @property
+    def rendered_summary(self):
+        """Summary HTML for pages; rows summarized before the HTML column existed are rendered here."""
+        if self.document_summary_html is None:
+            return render_markdown(self.document_summary)
+        return Markup(self.document_summary_html)
+
+    def set_summary(self, summary):
+        self.document_summary = summary
+        self.document_summary_html = str(render_markdown(summary))
+
+    def to_listing_dict(self):
+        return {
+            'id': self.id,
+            'document_name': self.document_name,
+            'document_summary': self.document_summary,
+            'document_summary_html': str(self.rendered_summary),
+            'document_type': self.document_type,
+        }
+
     @classmethod
-    def create_from_url(cls, url):
+    def find_by_content_hash(cls, content_hash):
+        return cls.query.filter_by(content_hash=content_hash).order_by(cls.id).first()
+
+    @classmethod
+    def create_from_url(cls, url, http=None):
         logging.info(f"Attempting to create Input from URL: {url}")
         try:
-            response = requests.get(url)
-            response.raise_for_status()
-            logging.info(f"Successfully fetched URL: {url}")
+            # Download the document exactly once, hashing it as it streams in
+            download = fetch_document(url, http)
+            logging.info(f"Successfully fetched URL: {url} ({len(download.content)} bytes, sha256 {download.content_hash})")
+            logging.info(f"Content-Type: {download.content_type}")
 
-            content_type = response.headers.get('Content-Type', '').lower()
-            logging.info(f"Content-Type: {content_type}")
+            # The same document is often published under several mirror URLs
+            existing = cls.find_by_content_hash(download.content_hash)
+            if existing:
+                logging.info(f"Content already stored as Input {existing.id}, reusing its text and summary")
+                new_input = cls.copy_of(existing, url, download.content_hash)
+                new_input.remember_download(download)
+                return new_input
 
-            if 'application/pdf' in content_type:
-                document_contents = extract_text_from_pdf(url)
-                document_type = "PDF"
+            if is_pdf(download):
+                document_contents = extract_text_from_pdf(download.content)
                 logging.info("Extracted text from PDF")
             else:
-                encodings = ['utf-8', 'latin-1', 'iso-8859-1', 'windows-1252']
-                document_contents = None
-
-                for encoding in encodings:
-                    try:
-                        document_contents = response.content.decode(encoding)
-                        logging.info(f"Successfully decoded content with {encoding}")
-                        break
-                    except UnicodeDecodeError:
-                        logging.warning(f"Failed to decode with {encoding}")
-
-                if document_contents is None:
-                    logging.warning("All decoding attempts failed, using 'utf-8' with 'ignore'")
-                    document_contents = response.content.decode('utf-8', errors='ignore')
+                document_contents = decode_text(download.content)
 
             new_input = cls(
                 document_name=url,  # Use URL as document name
                 document_url=url,
-                document_contents=document_contents
+                document_contents=document_contents,
+                content_hash=download.content_hash
             )
+            new_input.remember_download(download)
             logging.info("Successfully created new Input object")
             return new_input
         except Exception as e:
             logging.error(f"Error creating Input from URL: {str(e)}", exc_info=True)
             return None
 
+    @classmethod
+    def copy_of(cls, existing, url, content_hash):
+        """New input for url that reuses the text, name and summary of an input with identical content."""
+        new_input = cls(
+            document_name=existing.document_name,
+            document_url=url,
+            document_summary=existing.document_summary,
+            document_summary_html=existing.document_summary_html,
+            document_type=existing.document_type,
+            content_hash=content_hash
+        )
+        new_input.share_contents_with(existing)
+        return new_input
+
+class DocumentBlob(db.Model):
+    """Compressed document text, addressed by the SHA-256 of the uncompressed UTF-8 text."""
+    __tablename__ = 'document_blobs'
+
+    hash = db.Column(db.Text, primary_key=True)
+    compression = db.Column(db.Text, nullable=False, default='zlib')
+    size = db.Column(db.Integer, nullable=False)  # Uncompressed bytes
+    compressed_size = db.Column(db.Integer, nullable=False)
+    data = deferred(db.Column(db.LargeBinary, nullable=False))
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<DocumentBlob {self.hash[:12]} {self.size} bytes>'
+
+    @classmethod
+    def store(cls, text):
+        """Return the blob for text, creating it only if identical text is not stored yet."""
+        raw = text.encode('utf-8')
+        content_hash = hashlib.sha256(raw).hexdigest()
+        blob = db.session.get(cls, content_hash)
+        if blob is None:
+            data = zlib.compress(raw, BLOB_COMPRESSION_LEVEL)
+            blob = cls(hash=content_hash, compression='zlib', size=len(raw), compressed_size=len(data), data=data)
+            db.session.add(blob)
+        return blob
+
+    @classmethod
+    def delete_unreferenced(cls):
+        """Remove blobs no input points at any more (blobs are shared, so inputs don't cascade)."""
+        referenced = select(Input.document_blob_hash).where(Input.document_blob_hash.isnot(None))
+        # Their page search entries go with them (SQLite does not enforce the ON DELETE CASCADE)
+        db.session.execute(delete(SearchEntry).where(
+            SearchEntry.blob_hash.isnot(None), SearchEntry.blob_hash.not_in(referenced)
+        ))
+        return db.session.execute(delete(cls).where(cls.hash.not_in(referenced))).rowcount
+
+    def read_text(self):
+        return zlib.decompress(self.data).decode('utf-8')
+
+    def iter_text(self, chunk_size=BLOB_READ_CHUNK_SIZE):
+        """Decompress incrementally, yielding text pieces of roughly chunk_size characters."""
+        decompressor = zlib.decompressobj()
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        data = memoryview(self.data)
+        for start in range(0, len(data), chunk_size):
+            piece = decoder.decode(decompressor.decompress(data[start:start + chunk_size]))
+            if piece:
+                yield piece
+        tail = decoder.decode(decompressor.flush(), final=True)
+        if tail:
+            yield tail
+
+class DocumentPage(db.Model):
+    """Hash of one extracted page, compared on refresh to find the pages that changed."""
+    __tablename__ = 'document_pages'
+
+    id = db.Column(db.Integer, primary_key=True)
+    input_id = db.Column(db.Integer, db.ForeignKey('inputs.id', ondelete='CASCADE'), nullable=False, index=True)
+    page_number = db.Column(db.Integer, nullable=False)  # 1-based position in the extracted text
+    content_hash = db.Column(db.Text, nullable=False)  # SHA-256 of the page text, see extract_contents.page_hashes
+
+    def __repr__(self):
+        return f'<DocumentPage {self.page_number} of Input {self.input_id}>'
+
+    @classmethod
+    def for_text(cls, text):
+        """Page rows for extracted text; the text itself stays in the blob store."""
+        if text is None:
+            return []
+        return [cls(page_number=number, content_hash=content_hash)
+                for number, content_hash in enumerate(page_hashes(text), start=1)]
+
 class ClaimEdit(db.Model):
     __tablename__ = 'claim_edits'
 
@@ -79,12 +247,247 @@ class ClaimEdit(db.Model):
     edit_message = db.Column(db.Text)
     edit_conditions = db.Column(db.Text)
     edit_non_conditions = db.Column(db.Text)
+    conflicts_analyzed_at = db.Column(db.DateTime, nullable=True)  # NULL until compared by conflict analysis
+    duplicate_cluster_id = db.Column(db.Integer, db.ForeignKey('duplicate_clusters.id', ondelete='SET NULL'),
+                                     nullable=True, index=True)
+    # Pages the edit was generated from; NULL (the whole document) for edits from before page tracking
+    page_start = db.Column(db.Integer, nullable=True)
+    page_end = db.Column(db.Integer, nullable=True)
+    # Machine-checkable form of the conditions, see claim_rules.py and rule_engine.py
+    rule = db.Column(db.Text, nullable=True)  # rule_engine rule as JSON
+    rule_status = db.Column(db.Text, nullable=True, index=True)  # NULL until compiled; 'compiled', 'unsupported', 'invalid' or 'reviewed'
+    rule_notes = db.Column(db.Text, nullable=True)
+    rule_compiled_at = db.Column(db.DateTime, nullable=True)
 
     # Relationship to Input
     input = db.relationship('Input', back_populates='claim_edits')
+    conflicts = db.relationship('EditConflict', secondary='edit_conflict_members', back_populates='claim_edits',
+                                passive_deletes=True)
+    segments = db.relationship('EditSegment', back_populates='claim_edit', cascade='all, delete-orphan')
+    duplicate_cluster = db.relationship('DuplicateCluster', back_populates='claim_edits')
+    minhash = db.relationship('EditMinHash', uselist=False, cascade='all, delete-orphan')
+    lsh_buckets = db.relationship('EditLSHBucket', cascade='all, delete-orphan')
 
     def __repr__(self):
         return f'<ClaimEdit {self.id} for Input {self.input_id}>'
 
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'input_id': self.input_id,
+            'input_name': self.input.document_name if self.input else None,
+            'edit_description': self.edit_description,
+            'edit_message': self.edit_message,
+            'edit_conditions': self.edit_conditions,
+            'edit_non_conditions': self.edit_non_conditions,
+            'page_start': self.page_start,
+            'page_end': self.page_end,
+            'rule_status': self.rule_status,
+        }
+
+class EditSegment(db.Model):
+    """Inverted index row: one claim data segment (or loop) referenced by a claim edit."""
+    __tablename__ = 'edit_segments'
+
+    id = db.Column(db.Integer, primary_key=True)
+    claim_edit_id = db.Column(db.Integer, db.ForeignKey('claim_edits.id', ondelete='CASCADE'), nullable=False, index=True)
+    segment = db.Column(db.Text, nullable=False, index=True)  # Segment id such as 'CLM', or a loop such as 'Loop 2300'
+    element = db.Column(db.Text, nullable=True)  # Element reference such as 'CLM05-1' when one is given
+    source = db.Column(db.Text, nullable=False)  # 'conditions' or 'non_conditions'
+
+    claim_edit = db.relationship('ClaimEdit', back_populates='segments')
+
+    def __repr__(self):
+        return f'<EditSegment {self.segment} {self.element or ""} for ClaimEdit {self.claim_edit_id}>'
+
+class DuplicateCluster(db.Model):
+    """Group of near-duplicate claim edits found by edit_duplicates.py."""
+    __tablename__ = 'duplicate_clusters'
+
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    claim_edits = db.relationship('ClaimEdit', back_populates='duplicate_cluster')
+
+    def __repr__(self):
+        return f'<DuplicateCluster {self.id}>'
+
+class EditMinHash(db.Model):
+    """MinHash signature of a claim edit's description and conditions."""
+    __tablename__ = 'edit_minhashes'
+
+    claim_edit_id = db.Column(db.Integer, db.ForeignKey('claim_edits.id', ondelete='CASCADE'), primary_key=True)
+    signature = db.Column(db.LargeBinary, nullable=False)  # NUM_PERMUTATIONS little-endian uint32 values
+
+class EditLSHBucket(db.Model):
+    """One LSH band of a signature; edits sharing a bucket are duplicate candidates."""
+    __tablename__ = 'edit_lsh_buckets'
+
+    id = db.Column(db.Integer, primary_key=True)
+    claim_edit_id = db.Column(db.Integer, db.ForeignKey('claim_edits.id', ondelete='CASCADE'), nullable=False, index=True)
+    bucket = db.Column(db.BigInteger, nullable=False, index=True)  # Hash of the band number and its rows
+
+edit_conflict_members = db.Table(
+    'edit_conflict_members',
+    db.Column('conflict_id', db.Integer, db.ForeignKey('edit_conflicts.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('claim_edit_id', db.Integer, db.ForeignKey('claim_edits.id', ondelete='CASCADE'), primary_key=True,
+              index=True)
+)
+
+class EditConflict(db.Model):
+    __tablename__ = 'edit_conflicts'
+
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.Text, nullable=False)
+    details = db.Column(db.Text, nullable=False)  # Markdown bullet points describing the conflict
+    details_html = db.Column(db.Text, nullable=True)  # Sanitized HTML of details, rendered on write
+    member_count = db.Column(db.Integer, nullable=False)  # Edits involved when found; fewer now means stale
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    claim_edits = db.relationship('ClaimEdit', secondary=edit_conflict_members, back_populates='conflicts')
+
+    def __repr__(self):
+        return f'<EditConflict {self.id} {self.title}>'
+
+    @property
+    def rendered_details(self):
+        if self.details_html is None:
+            return render_markdown(self.details)
+        return Markup(self.details_html)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'details': self.details,
+            'details_html': str(self.rendered_details),
+            'claim_edits': [{
+                'id': edit.id,
+                'input_id': edit.input_id,
+                'input_name': edit.input.document_name if edit.input else None,
+            } for edit in self.claim_edits],
+        }
+
+class SearchEntry(db.Model):
+    """Full-text search row: an input's name and summary, one page of its text, or a claim edit.
+
+    Pages of blob-stored text are indexed once per blob and keyed by blob_hash, so inputs that
+    share a blob share its page entries; every other row belongs to one input.
+
+    The index itself is dialect specific and created with the table: a generated tsvector
+    column with a GIN index on PostgreSQL, an FTS5 table kept in sync by triggers on SQLite.
+    Rows are written by search_index.py whenever inputs or claim edits change.
+    """
+    __tablename__ = 'search_entries'
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.Text, nullable=False)  # 'summary', 'page' or 'claim_edit'
+    input_id = db.Column(db.Integer, db.ForeignKey('inputs.id', ondelete='CASCADE'), nullable=True, index=True)
+    blob_hash = db.Column(db.Text, db.ForeignKey('document_blobs.hash', ondelete='CASCADE'), nullable=True, index=True)
+    claim_edit_id = db.Column(db.Integer, db.ForeignKey('claim_edits.id', ondelete='CASCADE'), nullable=True, index=True)
+    page = db.Column(db.Integer, nullable=True)  # Page number of 'page' rows
+    title = db.Column(db.Text, nullable=True)  # Weighted above content when ranking
+    content = db.Column(db.Text, nullable=False)
+
+    def __repr__(self):
+        owner = f"Input {self.input_id}" if self.input_id is not None else f"blob {self.blob_hash[:12]}"
+        return f'<SearchEntry {self.kind} {self.id} for {owner}>'
+
+SEARCH_INDEX_DDL = {
+    'postgresql': [
+        "ALTER TABLE search_entries ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', content), 'B')) STORED",
+        "CREATE INDEX ix_search_entries_search_vector ON search_entries USING gin (search_vector)",
+    ],
+    'sqlite': [
+        "CREATE VIRTUAL TABLE search_entries_fts USING fts5("
+        "title, content, content='search_entries', content_rowid='id', tokenize='porter unicode61')",
+        "CREATE TRIGGER search_entries_ai AFTER INSERT ON search_entries BEGIN "
+        "INSERT INTO search_entries_fts(rowid, title, content) VALUES (new.id, new.title, new.content); END",
+        "CREATE TRIGGER search_entries_ad AFTER DELETE ON search_entries BEGIN "
+        "INSERT INTO search_entries_fts(search_entries_fts, rowid, title, content) "
+        "VALUES ('delete', old.id, old.title, old.content); END",
+        "CREATE TRIGGER search_entries_au AFTER UPDATE ON search_entries BEGIN "
+        "INSERT INTO search_entries_fts(search_entries_fts, rowid, title, content) "
+        "VALUES ('delete', old.id, old.title, old.content); "
+        "INSERT INTO search_entries_fts(rowid, title, content) VALUES (new.id, new.title, new.content); END",
+    ],
+}
+
+for dialect, statements in SEARCH_INDEX_DDL.items():
+    for statement in statements:
+        event.listen(SearchEntry.__table__, 'after_create', DDL(statement).execute_if(dialect=dialect))
+event.listen(SearchEntry.__table__, 'before_drop', DDL("DROP TABLE IF EXISTS search_entries_fts").execute_if(dialect='sqlite'))
+
+class Job(db.Model):
+    __tablename__ = 'jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.Text, nullable=False)
+    input_id = db.Column(db.Integer, nullable=True)  # Not a foreign key so jobs outlive deleted inputs
+    dedupe_key = db.Column(db.Text, nullable=False, index=True)
+    status = db.Column(db.Text, nullable=False, default='queued')  # queued, running, succeeded, failed
+    progress = db.Column(db.Text, nullable=True)
+    result = db.Column(db.Text, nullable=True)  # JSON encoded return value of the job
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Job {self.id} {self.kind} {self.status}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'input_id': self.input_id,
+            'status': self.status,
+            'progress': self.progress,
+            'result': json.loads(self.result) if self.result else None,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+class LLMCacheEntry(db.Model):
+    __tablename__ = 'llm_cache'
+
+    key = db.Column(db.Text, primary_key=True)  # SHA-256 of model + messages + response_format
+    model = db.Column(db.Text, nullable=False)
+    response = db.Column(db.Text, nullable=False)  # Message content returned by the model
+    hit_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<LLMCacheEntry {self.key[:12]} {self.model}>'
+
 # Database configuration
-DATABASE_URL = os.environ['DATABASE_URL']
\ No newline at end of file
+DATABASE_URL = os.environ['DATABASE_URL']
+
+# Connection pool shared by the web app, background jobs and every module using db.session
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # Seconds, below typical server idle timeouts
+DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', '1') != '0'
+
+def engine_options(database_url=DATABASE_URL):
+    options = {
+        'pool_pre_ping': DB_POOL_PRE_PING,
+        'pool_recycle': DB_POOL_RECYCLE,
+    }
+    # SQLite (used for local runs and benchmarks) does not take queue pool sizing options
+    if not database_url.startswith('sqlite'):
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    return options
+
+def configure_database(app):
+    app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(DATABASE_URL)
+    db.init_app(app)
\ No newline at end of file
@@ -0,0 +1,144 @@
+"""In-process cache of rendered pages, revalidated with ETag / Last-Modified.
+
+Views decorated with cached_page are rendered once and then served from memory until a
+commit in this process writes to one of PAGE_TABLES: writes made through the ORM are
+noticed when the session flushes, bulk INSERT / UPDATE / DELETE statements when they are
+executed, and the cache is cleared once the transaction commits. Entries also expire after
+PAGE_CACHE_TTL seconds, which bounds how long writes made by other processes (the CLI
+scripts) go unseen.
+
+Every cached response carries an ETag (a hash of the page) and Last-Modified, with
+Cache-Control: no-cache so browsers revalidate on each view; an unchanged page is then
+answered with a bodiless 304 straight from memory.
+"""
+import os
+import time
+import hashlib
+import threading
+from itertools import chain
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timezone
+from functools import wraps
+from flask import request, Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Total size of the cached pages; least recently used pages beyond it are dropped
+PAGE_CACHE_MAX_BYTES = int(os.environ.get('PAGE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+# Seconds a page is served from memory before it is rendered again
+PAGE_CACHE_TTL = float(os.environ.get('PAGE_CACHE_TTL', 60))
+# Tables shown on cached pages; a commit that writes to any of them clears the cache
+PAGE_TABLES = {
+    'inputs', 'document_blobs', 'document_pages', 'claim_edits', 'edit_segments',
+    'edit_conflicts', 'edit_conflict_members',
+}
+STALE_KEY = 'page_cache_stale'
+
+CachedPage = namedtuple('CachedPage', ['body', 'etag', 'last_modified', 'expires_at', 'size'])
+
+_pages = OrderedDict()
+_size = 0
+_generation = 0
+_lock = threading.Lock()
+
+
+def cached_page(view):
+    """Serve the HTML a view returns from the cache and answer conditional requests with 304."""
+    @wraps(view)
+    def cached_view(*args, **kwargs):
+        key = request.full_path
+        page = _lookup(key)
+        status = 'hit'
+        if page is None:
+            status = 'miss'
+            generation = _generation
+            body = view(*args, **kwargs)
+            if not isinstance(body, str):
+                # Error pages, redirects and other responses are passed through uncached
+                return body
+            page = _store(key, generation, body)
+        response = Response(page.body, mimetype='text/html')
+        response.set_etag(page.etag)
+        response.last_modified = page.last_modified
+        response.cache_control.no_cache = True
+        response.headers['X-Page-Cache'] = status
+        return response.make_conditional(request)
+    return cached_view
+
+
+def invalidate():
+    """Drop every cached page."""
+    global _generation, _size
+    with _lock:
+        _generation += 1
+        _pages.clear()
+        _size = 0
+
+
+def _lookup(key):
+    with _lock:
+        page = _pages.get(key)
+        if page is None:
+            return None
+        if page.expires_at <= time.monotonic():
+            _drop(key)
+            return None
+        _pages.move_to_end(key)
+        return page
+
+
+def _store(key, generation, body):
+    global _size
+    encoded = body.encode('utf-8')
+    page = CachedPage(
+        body=encoded,
+        etag=hashlib.sha256(encoded).hexdigest()[:32],
+        # HTTP dates have whole seconds
+        last_modified=datetime.now(timezone.utc).replace(microsecond=0),
+        expires_at=time.monotonic() + PAGE_CACHE_TTL,
+        size=len(encoded)
+    )
+    with _lock:
+        # A commit while the page was rendering may have made it stale already
+        if generation != _generation or page.size > PAGE_CACHE_MAX_BYTES:
+            return page
+        _drop(key)
+        _pages[key] = page
+        _size += page.size
+        while _size > PAGE_CACHE_MAX_BYTES:
+            _drop(next(iter(_pages)))
+    return page
+
+
+def _drop(key):
+    global _size
+    page = _pages.pop(key, None)
+    if page is not None:
+        _size -= page.size
+
+
+@event.listens_for(Session, 'after_flush')
+def _note_flushed_writes(session, flush_context):
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if getattr(obj, '__tablename__', None) in PAGE_TABLES:
+            session.info[STALE_KEY] = True
+            return
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _note_bulk_writes(execute_state):
+    if execute_state.is_insert or execute_state.is_update or execute_state.is_delete:
+        table = getattr(execute_state.statement, 'table', None)
+        if getattr(table, 'name', None) in PAGE_TABLES:
+            execute_state.session.info[STALE_KEY] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_on_commit(session):
+    if session.info.pop(STALE_KEY, False):
+        invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_rolled_back_writes(session):
+    session.info.pop(STALE_KEY, None)
@@ -0,0 +1,239 @@
+"""Shrink extracted document text before it is sent to the model.
+
+Running headers, footers and page numbers repeat on every page of a PDF and carry no
+information after the first occurrence. compact_document() drops lines that repeat at
+the top or bottom of many pages, collapses whitespace, dot leaders and table rules, and
+keeps the page markers that chunking relies on.
+
+Token budget policy: a single prompt may carry at most PROMPT_TOKEN_BUDGET tokens of
+document text. Claim edit generation never reaches it because larger documents are split
+into page windows. Summaries of larger documents keep their leading pages (with a note
+saying which pages were left out), or raise PromptBudgetError when
+PROMPT_OVER_BUDGET=reject.
+
+Usage (report the savings for stored inputs):
+    python prompt_compaction.py [input_id ...]
+"""
+import os
+import re
+import sys
+import logging
+from collections import namedtuple, Counter
+from functools import lru_cache
+from extract_contents import PAGE_START_PATTERN, split_into_pages
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Maximum tokens of document text in a single prompt (gpt-4o-mini has a 128k context)
+PROMPT_TOKEN_BUDGET = int(os.environ.get('PROMPT_TOKEN_BUDGET', 100000))
+# 'truncate' keeps the leading pages that fit the budget; 'reject' raises PromptBudgetError
+PROMPT_OVER_BUDGET = os.environ.get('PROMPT_OVER_BUDGET', 'truncate')
+# A line is boilerplate when it appears on at least this share of pages (and at least REPEATED_LINE_MIN_PAGES)
+REPEATED_LINE_FRACTION = float(os.environ.get('REPEATED_LINE_FRACTION', 0.5))
+REPEATED_LINE_MIN_PAGES = 3
+# Running headers and footers are looked for in this many lines at each end of a page
+EDGE_LINES = 4
+# Tokenizer of the models the app calls, used when tiktoken is installed
+TOKEN_ENCODING = 'o200k_base'
+
+DIGITS = re.compile(r'\d+')
+PAGE_NUMBER_LINE = re.compile(r'^(page\s*)?#(\s*(of|/)\s*#)?$|^page\s*[ivxlc]+$|^-\s*#\s*-$')
+SEPARATOR_LINE = re.compile(r'^[\s\-_=.·•*~|+]+$')
+DOT_LEADER = re.compile(r'\s*(\.\s?){4,}\s*')
+COLUMN_GAP = re.compile(r'[ \t\u00a0]{3,}')
+SPACES = re.compile(r'[ \t\u00a0]+')
+
+Compaction = namedtuple('Compaction', ['text', 'tokens_before', 'tokens_after', 'lines_removed'])
+
+
+class PromptBudgetError(ValueError):
+    pass
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(TOKEN_ENCODING)
+    except Exception:
+        # Not installed, or the encoding file could not be downloaded
+        logger.info("tiktoken unavailable, estimating tokens as characters / 4")
+        return None
+
+
+def count_tokens(text):
+    """Tokens in text for the app's models; about four characters per token without tiktoken."""
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def compact_document(document_contents):
+    """Return a Compaction of extracted PDF text with boilerplate and redundant whitespace removed.
+
+    Text without page markers (HTML, plain text and code inputs) is returned unchanged.
+    """
+    document_contents = document_contents or ''
+    tokens_before = count_tokens(document_contents)
+    if not PAGE_START_PATTERN.search(document_contents):
+        return Compaction(document_contents, tokens_before, tokens_before, 0)
+
+    pages = [page.splitlines() for page in split_into_pages(document_contents)]
+    repeated = _repeated_edge_lines(pages)
+
+    compacted = []
+    lines_removed = 0
+    for lines in pages:
+        body_start = 1 if lines and PAGE_START_PATTERN.match(lines[0]) else 0
+        body_length = len(lines) - body_start
+        previous = None
+        for position, line in enumerate(lines):
+            if position < body_start:
+                compacted.append(line)
+                continue
+            edge = _edge_position(position - body_start, body_length)
+            key = _line_key(line)
+            if edge is not None and ((edge, key) in repeated or PAGE_NUMBER_LINE.match(key)):
+                lines_removed += 1
+                continue
+
+            line = _collapse(line)
+            # Blank lines, table rules and rows repeated back to back carry nothing
+            if not line or SEPARATOR_LINE.match(line) or line == previous:
+                lines_removed += 1
+                continue
+            compacted.append(line)
+            previous = line
+
+    text = '\n'.join(compacted) + '\n' if compacted else ''
+    return Compaction(text, tokens_before, count_tokens(text), lines_removed)
+
+
+def enforce_budget(document_contents, budget=None, policy=None):
+    """Fit text into budget tokens according to policy; returns (text, number of pages left out)."""
+    budget = budget or PROMPT_TOKEN_BUDGET
+    policy = policy or PROMPT_OVER_BUDGET
+    if count_tokens(document_contents) <= budget:
+        return document_contents, 0
+    if policy == 'reject':
+        raise PromptBudgetError(f"Document text exceeds the prompt budget of {budget} tokens")
+
+    pages = split_into_pages(document_contents)
+    kept = []
+    tokens = 0
+    for page in pages:
+        page_tokens = count_tokens(page)
+        if tokens + page_tokens > budget:
+            if not kept:
+                # A single oversized page (or marker-less text) is cut on line boundaries
+                kept.append(_truncate_lines(page, budget))
+            break
+        kept.append(page)
+        tokens += page_tokens
+
+    omitted = len(pages) - len(kept)
+    note = f"[{omitted} of {len(pages)} pages omitted to fit the token budget]\n" if omitted else "[Remaining text omitted to fit the token budget]\n"
+    return ''.join(kept) + note, omitted
+
+
+def compact_for_prompt(document_contents, caller, truncate=False):
+    """Compact document text for a prompt, logging and counting the tokens saved.
+
+    truncate=True also applies the PROMPT_TOKEN_BUDGET policy (for single-request callers
+    such as summaries; claim edit generation chunks large documents instead).
+    """
+    compaction = compact_document(document_contents)
+    text = compaction.text
+    omitted = 0
+    if truncate:
+        text, omitted = enforce_budget(text)
+        if text is not compaction.text:
+            metrics.prompt_truncations.inc(caller=caller)
+            logger.warning(f"{caller}: document over the {PROMPT_TOKEN_BUDGET} token budget, {omitted} pages left out")
+
+    saved = compaction.tokens_before - compaction.tokens_after
+    metrics.prompt_tokens_saved.inc(saved, caller=caller)
+    logger.info(
+        f"{caller}: compacted document text from {compaction.tokens_before} to {compaction.tokens_after} tokens "
+        f"({_percent(saved, compaction.tokens_before)} saved, {compaction.lines_removed} lines removed)"
+    )
+    return text
+
+
+def _repeated_edge_lines(pages):
+    if len(pages) < REPEATED_LINE_MIN_PAGES:
+        return set()
+    threshold = max(REPEATED_LINE_MIN_PAGES, REPEATED_LINE_FRACTION * len(pages))
+    page_counts = Counter()
+    for lines in pages:
+        body = [line for line in lines if not PAGE_START_PATTERN.match(line)]
+        page_counts.update({
+            (_edge_position(position, len(body)), _line_key(line))
+            for position, line in enumerate(body)
+            if line.strip() and _edge_position(position, len(body)) is not None
+        })
+    return {edge_key for edge_key, count in page_counts.items() if count >= threshold}
+
+
+def _edge_position(position, length):
+    # Headers sit at the same line from the top of each page, footers from the bottom
+    if position < EDGE_LINES:
+        return position
+    if position >= length - EDGE_LINES:
+        return position - length
+    return None
+
+
+def _line_key(line):
+    # Page numbers and dates change from page to page; the text around them does not
+    return DIGITS.sub('#', SPACES.sub(' ', line).strip().lower())
+
+
+def _collapse(line):
+    line = DOT_LEADER.sub(' … ', line)
+    line = COLUMN_GAP.sub(' | ', line)
+    return SPACES.sub(' ', line).strip()
+
+
+def _truncate_lines(text, budget):
+    kept = []
+    tokens = 0
+    for line in text.splitlines(keepends=True):
+        tokens += count_tokens(line)
+        if tokens > budget:
+            break
+        kept.append(line)
+    return ''.join(kept)
+
+
+def _percent(part, whole):
+    return f"{part / whole:.0%}" if whole else "0%"
+
+
+if __name__ == '__main__':
+    from sqlalchemy import select
+    from main import app
+    from models import db, Input
+
+    input_ids = [int(arg) for arg in sys.argv[1:]]
+    total_before = total_after = 0
+    with app.app_context():
+        query = select(Input.id).order_by(Input.id)
+        if input_ids:
+            query = query.where(Input.id.in_(input_ids))
+        for input_id in db.session.scalars(query).all():
+            input_doc = db.session.get(Input, input_id)
+            compaction = compact_document(input_doc.document_contents)
+            name = input_doc.document_name
+            # Only one document's text is held in memory at a time
+            db.session.expunge_all()
+            total_before += compaction.tokens_before
+            total_after += compaction.tokens_after
+            saved = compaction.tokens_before - compaction.tokens_after
+            print(f"{input_id:>6} {compaction.tokens_before:>9} -> {compaction.tokens_after:>9} tokens "
+                  f"({_percent(saved, compaction.tokens_before):>4} saved)  {name or ''}")
+    print(f"Total {total_before} -> {total_after} tokens ({_percent(total_before - total_after, total_before)} saved)")
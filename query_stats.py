@@ -0,0 +1,82 @@
+import os
+import time
+import logging
+import threading
+from collections import Counter
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Requests (or jobs) above either threshold are logged with their most repeated statements
+QUERY_COUNT_LOG_THRESHOLD = int(os.environ.get('QUERY_COUNT_LOG_THRESHOLD', 25))
+QUERY_TIME_LOG_THRESHOLD_MS = float(os.environ.get('QUERY_TIME_LOG_THRESHOLD_MS', 500))
+
+_local = threading.local()
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def report(self, label):
+        """Log the stats when a threshold is exceeded; repeated statements usually mean N+1 queries."""
+        db_ms = self.seconds * 1000
+        if self.count < QUERY_COUNT_LOG_THRESHOLD and db_ms < QUERY_TIME_LOG_THRESHOLD_MS:
+            return
+        repeated = '; '.join(
+            f"{times}x {statement[:120]}" for statement, times in self.statements.most_common(3) if times > 1
+        )
+        logger.warning(
+            f"{label}: {self.count} queries, {db_ms:.1f} ms in the database"
+            + (f" (most repeated: {repeated})" if repeated else "")
+        )
+
+
+def init_app(app):
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def start_request_stats():
+        start()
+
+    @app.after_request
+    def report_request_stats(response):
+        stats = finish()
+        if stats is not None:
+            response.headers['X-DB-Query-Count'] = str(stats.count)
+            response.headers['X-DB-Time-Ms'] = f"{stats.seconds * 1000:.1f}"
+            stats.report(f"{request.method} {request.path}")
+        return response
+
+
+def start():
+    """Begin counting queries issued on the current thread."""
+    _local.stats = QueryStats()
+
+
+def finish():
+    """Stop counting on the current thread and return the collected QueryStats (or None)."""
+    stats = getattr(_local, 'stats', None)
+    _local.stats = None
+    return stats
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the statement's own context: a statement that raises never reaches the after hook,
+    # and per-connection state would then leak into the timing of later statements
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_query_start', None)
+    stats = getattr(_local, 'stats', None)
+    if stats is not None and started is not None:
+        stats.count += 1
+        stats.seconds += time.perf_counter() - started
+        stats.statements[statement] += 1
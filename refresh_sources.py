@@ -0,0 +1,110 @@
+"""Re-check the source URL of every input and refresh the documents that changed.
+
+Each input keeps the ETag, Last-Modified and length of its last download, so a check is
+a conditional GET over a shared keep-alive pool: an unchanged document costs one 304
+response and no extraction or model calls. Servers that send no validators return the
+full body; it is hashed and compared, and only reprocessed if the bytes differ. Changed
+documents go through document_refresh.refresh_input, which regenerates only the claim
+edits of the pages that changed.
+
+Usage (e.g. nightly from cron, or --every 24 to keep running):
+    python refresh_sources.py [--older-than HOURS] [--workers N] [--every HOURS] [input_id ...]
+"""
+import os
+import time
+import logging
+import argparse
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import current_app
+from sqlalchemy import select, or_
+from models import db, Input, SOURCE_URL_PREFIXES
+from ingest import http_session, summarize_report
+from document_refresh import refresh_input
+
+logger = logging.getLogger(__name__)
+
+# Sources checked at the same time; also the size of the shared HTTP connection pool
+REFRESH_WORKERS = int(os.environ.get('REFRESH_WORKERS', 8))
+
+
+def select_sources(input_ids=None, older_than=None):
+    """Ids of inputs with an http(s) source, optionally only those not checked for older_than."""
+    query = select(Input.id).where(
+        or_(*(Input.document_url.like(f'{prefix}%') for prefix in SOURCE_URL_PREFIXES))
+    ).order_by(Input.id)
+    if input_ids:
+        query = query.where(Input.id.in_(input_ids))
+    if older_than is not None:
+        cutoff = datetime.utcnow() - older_than
+        query = query.where(or_(Input.source_checked_at.is_(None), Input.source_checked_at < cutoff))
+    return list(db.session.scalars(query))
+
+
+def refresh_sources(input_ids=None, older_than=None, workers=REFRESH_WORKERS, progress=None, force=False):
+    """Check sources concurrently; returns one report entry per input.
+
+    Statuses: 'unchanged', 'changed' (text and claim edits updated) and 'failed'.
+    """
+    selected = select_sources(input_ids, older_than)
+    db.session.commit()
+    report = []
+    if not selected:
+        return report
+
+    # Each worker thread needs its own app context (and so its own database session)
+    app = current_app._get_current_object()
+    # Concurrent refreshes extract in their own thread; a lone one can still use the page-level process pool
+    pdf_workers = 1 if workers > 1 and len(selected) > 1 else None
+
+    def check(input_id, session):
+        with app.app_context():
+            return refresh_input(input_id, force=force, http=session, pdf_workers=pdf_workers)
+
+    with http_session(workers) as session, ThreadPoolExecutor(max_workers=min(workers, len(selected))) as executor:
+        futures = {executor.submit(check, input_id, session): input_id for input_id in selected}
+        for completed, future in enumerate(as_completed(futures), start=1):
+            input_id = futures[future]
+            try:
+                result = future.result()
+                entry = {"input_id": input_id, "status": 'changed' if result.changed else 'unchanged'}
+                if result.changed:
+                    entry.update(changed_pages=result.changed_pages, pages=result.pages,
+                                 kept=result.kept, removed=result.removed, added=result.added)
+            except Exception as e:
+                logger.error(f"Error refreshing input {input_id}: {str(e)}")
+                entry = {"input_id": input_id, "status": 'failed', "error": str(e)}
+            report.append(entry)
+            if progress:
+                progress(f"Checked {completed} of {len(selected)} sources")
+    return report
+
+
+def _print_report(report):
+    for entry in report:
+        if entry["status"] == 'changed':
+            detail = (f"{entry['changed_pages']} of {entry['pages']} pages changed, kept {entry['kept']} edits, "
+                      f"replaced {entry['removed']} with {entry['added']}")
+        else:
+            detail = entry.get("error", '')
+        print(f"{entry['status']:<10} input {entry['input_id']} {detail}")
+    print(', '.join(f"{count} {status}" for status, count in summarize_report(report).items()) or "No sources to check")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Re-check input source URLs and refresh changed documents.")
+    parser.add_argument('input_ids', nargs='*', type=int, help="Only these inputs (default: all with a URL)")
+    parser.add_argument('--older-than', type=float, metavar='HOURS', help="Skip sources checked more recently")
+    parser.add_argument('--workers', type=int, default=REFRESH_WORKERS)
+    parser.add_argument('--every', type=float, metavar='HOURS', help="Keep running, checking again at this interval")
+    args = parser.parse_args()
+
+    from main import app
+
+    while True:
+        with app.app_context():
+            older_than = timedelta(hours=args.older_than) if args.older_than is not None else None
+            _print_report(refresh_sources(args.input_ids, older_than, args.workers))
+        if not args.every:
+            break
+        time.sleep(args.every * 3600)
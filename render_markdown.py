@@ -0,0 +1,168 @@
+"""Render the markdown of document summaries and conflict reports to HTML on the server.
+
+The HTML is rendered once when a summary or conflict is written and stored next to the
+markdown (inputs.document_summary_html, edit_conflicts.details_html), so pages no longer
+ship markdown for the browser to parse. Only the subset the prompts produce is supported:
+headings, bullet and numbered lists (nested by indentation), paragraphs with line breaks,
+fenced code, **bold**, *italic*, `code` and [links](url). All text is HTML escaped before
+any markup is added, and links are limited to http(s), mailto and relative URLs, so the
+result is safe to insert into a page as is.
+
+Usage (render the rows written before the HTML columns existed):
+    python render_markdown.py
+"""
+import re
+from markupsafe import Markup, escape
+
+HEADING_PATTERN = re.compile(r'^ {0,3}(#{1,6})\s+(.*?)(?:\s+#+)?\s*$')
+LIST_ITEM_PATTERN = re.compile(r'^(\s*)([*+-]|\d{1,9}[.)])\s+(.*)$')
+RULE_PATTERN = re.compile(r'^ {0,3}([-*_])(?:\s*\1){2,}\s*$')
+FENCE_PATTERN = re.compile(r'^ {0,3}(```|~~~)')
+CODE_SPAN_PATTERN = re.compile(r'(`+)(.+?)\1')
+LINK_PATTERN = re.compile(r'\[([^\]]+)\]\(\s*([^)\s]+)\s*\)')
+STRONG_PATTERN = re.compile(r'\*\*(?=\S)(.+?)(?<=\S)\*\*|__(?=\S)(.+?)(?<=\S)__')
+EMPHASIS_PATTERN = re.compile(r'(?<![\w*])\*(?=\S)(.+?)(?<=\S)\*(?!\*)|(?<!\w)_(?=\S)(.+?)(?<=\S)_(?!\w)')
+SAFE_URL_PATTERN = re.compile(r'^(?:https?:|mailto:|[/#?]|[^:/?#]*(?:[/?#]|$))', re.IGNORECASE)
+# Code spans and links are swapped for these while emphasis is applied to the rest
+PLACEHOLDER = '\x00{}\x00'
+PLACEHOLDER_PATTERN = re.compile('\x00(\\d+)\x00')
+BACKFILL_BATCH_SIZE = 500
+
+
+def render_markdown(text):
+    """Sanitized HTML for a markdown string (empty Markup for None or '')."""
+    if not text:
+        return Markup('')
+    html = []
+    paragraph = []
+    # Open lists, innermost last, as [indent, tag]; each has an <li> that is still open
+    lists = []
+    after_blank = False
+    lines = text.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+
+    def close_paragraph():
+        if paragraph:
+            html.append('<p>' + '<br>\n'.join(paragraph) + '</p>\n')
+            paragraph.clear()
+
+    def close_lists(indent=-1):
+        while lists and lists[-1][0] > indent:
+            html.append(f'</li></{lists.pop()[1]}>\n')
+
+    index = 0
+    while index < len(lines):
+        line = lines[index]
+        index += 1
+        if not line.strip():
+            close_paragraph()
+            after_blank = True
+            continue
+
+        fence = FENCE_PATTERN.match(line)
+        if fence:
+            close_paragraph()
+            close_lists()
+            code = []
+            while index < len(lines) and not lines[index].strip().startswith(fence.group(1)):
+                code.append(lines[index])
+                index += 1
+            index += 1
+            html.append(f'<pre><code>{escape(chr(10).join(code))}</code></pre>\n')
+            after_blank = False
+            continue
+
+        heading = HEADING_PATTERN.match(line)
+        item = LIST_ITEM_PATTERN.match(line)
+        if heading or RULE_PATTERN.match(line):
+            close_paragraph()
+            close_lists()
+            if heading:
+                level = len(heading.group(1))
+                html.append(f'<h{level}>{_inline(heading.group(2))}</h{level}>\n')
+            else:
+                html.append('<hr>\n')
+        elif item:
+            close_paragraph()
+            indent = len(item.group(1).expandtabs(4))
+            tag = 'ul' if item.group(2) in '*+-' else 'ol'
+            close_lists(indent)
+            if lists and lists[-1][0] == indent and lists[-1][1] != tag:
+                close_lists(indent - 1)
+            if lists and lists[-1][0] == indent:
+                html.append('</li>\n<li>')
+            else:
+                lists.append([indent, tag])
+                html.append(f'<{tag}>\n<li>')
+            html.append(_inline(item.group(3)))
+        elif lists and (not after_blank or line[0].isspace()):
+            # Continuation of the current list item
+            html.append('<br>\n' + _inline(line.strip()))
+        else:
+            close_lists()
+            paragraph.append(_inline(line.strip()))
+        after_blank = False
+
+    close_paragraph()
+    close_lists()
+    return Markup(''.join(html).strip())
+
+
+def _inline(text):
+    protected = []
+
+    def protect(markup):
+        protected.append(markup)
+        return PLACEHOLDER.format(len(protected) - 1)
+
+    def restore(html):
+        return PLACEHOLDER_PATTERN.sub(lambda match: protected[int(match.group(1))], html)
+
+    def code_span(match):
+        return protect(f'<code>{escape(match.group(2).strip())}</code>')
+
+    def link(match):
+        label, url = match.group(1), match.group(2)
+        if not SAFE_URL_PATTERN.match(url):
+            return label
+        return protect(f'<a href="{escape(url)}">{restore(_emphasis(escape(label)))}</a>')
+
+    text = CODE_SPAN_PATTERN.sub(code_span, text.replace('\x00', ''))
+    text = LINK_PATTERN.sub(link, text)
+    return restore(_emphasis(escape(text)))
+
+
+def _emphasis(html):
+    html = STRONG_PATTERN.sub(lambda match: f'<strong>{match.group(1) or match.group(2)}</strong>', html)
+    return EMPHASIS_PATTERN.sub(lambda match: f'<em>{match.group(1) or match.group(2)}</em>', html)
+
+
+def backfill(progress=None):
+    """Render the stored markdown of rows that have no HTML yet; returns the number of rows updated."""
+    from sqlalchemy import select, update
+    from models import db, Input, EditConflict
+
+    updated = 0
+    for model, source, target in ((Input, Input.document_summary, Input.document_summary_html),
+                                  (EditConflict, EditConflict.details, EditConflict.details_html)):
+        while True:
+            rows = db.session.execute(
+                select(model.id, source).where(target.is_(None), source.isnot(None), source != '')
+                .order_by(model.id).limit(BACKFILL_BATCH_SIZE)
+            ).all()
+            if not rows:
+                break
+            db.session.execute(update(model), [
+                {'id': row_id, target.key: str(render_markdown(markdown))} for row_id, markdown in rows
+            ])
+            db.session.commit()
+            updated += len(rows)
+            if progress:
+                progress(f"Rendered {updated} summaries and conflict reports")
+    return updated
+
+
+if __name__ == '__main__':
+    from main import app
+
+    with app.app_context():
+        print(f"Rendered {backfill(progress=print)} rows")
@@ -0,0 +1,331 @@
+"""Vectorized evaluation of compiled claim edit rules over batches of claims.
+
+Rule format (stored as JSON in claim_edits.rule, produced by claim_rules.py):
+
+    {"when": <predicate or null>, "require": <predicate>, "unless": <predicate or null>}
+
+An edit fires for a claim when `when` holds (always, if null), `require` does not hold and
+`unless` (the edit's non-conditions) does not hold. Predicates are
+
+    {"all": [<predicate>, ...]}    {"any": [<predicate>, ...]}    {"not": <predicate>}
+    {"field": "CLM05-1", "op": "in", "values": ["11", "22"]}
+
+Field names follow claim_files (CLM05-1, NM1*85.NM109, DTP*472.DTP03). Operators: in,
+not_in, present, absent, starts_with, matches (regular expression over the whole value),
+length_in, and gt, ge, lt, le (numeric; values that are not numbers never match).
+
+Claims are held column by column, each column factorized into its distinct values and an
+int32 code per claim. A comparison is evaluated once per distinct value and broadcast to
+the claims through the codes, and predicates shared by several rules are evaluated once
+per batch. Files are split into batches that worker processes parse and evaluate.
+
+Usage:
+    python rule_engine.py claims.csv|claims.jsonl|claims.837 [--workers N] [--output hits.jsonl] [input_id ...]
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# Claims parsed and evaluated together; larger batches amortize the per-rule overhead
+CLAIM_BATCH_SIZE = int(os.environ.get('CLAIM_BATCH_SIZE', 50000))
+# Worker processes evaluating batches; 1 evaluates in the calling process
+RULE_ENGINE_WORKERS = int(os.environ.get('RULE_ENGINE_WORKERS', os.cpu_count() or 1))
+
+OPERATORS = {'in', 'not_in', 'present', 'absent', 'starts_with', 'matches', 'length_in', 'gt', 'ge', 'lt', 'le'}
+NUMERIC_OPERATORS = {'gt': np.greater, 'ge': np.greater_equal, 'lt': np.less, 'le': np.less_equal}
+VALUELESS_OPERATORS = {'present', 'absent'}
+
+
+class RuleError(ValueError):
+    pass
+
+
+def validate_rule(rule):
+    """Check a rule against the format above; returns it unchanged or raises RuleError."""
+    if not isinstance(rule, dict) or set(rule) - {'when', 'require', 'unless'}:
+        raise RuleError("A rule is an object with 'when', 'require' and 'unless' keys")
+    if rule.get('require') is None:
+        raise RuleError("A rule needs a 'require' predicate")
+    for part in ('when', 'require', 'unless'):
+        if rule.get(part) is not None:
+            _validate_predicate(rule[part], part)
+    return rule
+
+
+def _validate_predicate(node, path):
+    if not isinstance(node, dict) or len(node) == 0:
+        raise RuleError(f"{path}: a predicate must be an object")
+    if 'all' in node or 'any' in node:
+        key = 'all' if 'all' in node else 'any'
+        if len(node) != 1 or not isinstance(node[key], list) or not node[key]:
+            raise RuleError(f"{path}.{key}: expected a non-empty list of predicates")
+        for index, child in enumerate(node[key]):
+            _validate_predicate(child, f"{path}.{key}[{index}]")
+        return
+    if 'not' in node:
+        if len(node) != 1:
+            raise RuleError(f"{path}.not: 'not' takes a single predicate")
+        _validate_predicate(node['not'], f"{path}.not")
+        return
+
+    if set(node) - {'field', 'op', 'values'} or not isinstance(node.get('field'), str) or not node['field']:
+        raise RuleError(f"{path}: a comparison has a 'field', an 'op' and 'values'")
+    op = node.get('op')
+    if op not in OPERATORS:
+        raise RuleError(f"{path}: unknown operator {op!r}")
+    values = node.get('values', [])
+    if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+        raise RuleError(f"{path}: 'values' must be a list of strings")
+    if op not in VALUELESS_OPERATORS and not values:
+        raise RuleError(f"{path}: {op} needs at least one value")
+    try:
+        if op == 'matches':
+            for value in values:
+                re.compile(value)
+        elif op in NUMERIC_OPERATORS:
+            float(values[0])
+        elif op == 'length_in':
+            [int(value) for value in values]
+    except (re.error, ValueError) as e:
+        raise RuleError(f"{path}: bad value for {op}: {e}")
+
+
+def _compile(node):
+    # Hashable form of a predicate; equal sub-predicates of different rules share one cache entry
+    if node is None:
+        return None
+    if 'all' in node or 'any' in node:
+        key = 'all' if 'all' in node else 'any'
+        return (key, tuple(_compile(child) for child in node[key]))
+    if 'not' in node:
+        return ('not', _compile(node['not']))
+    return ('field', node['field'], node['op'], tuple(node.get('values', ())))
+
+
+class Column:
+    """Factorized column: distinct string values ('' when absent) and one int32 code per claim."""
+    __slots__ = ('values', 'codes', '_numbers')
+
+    def __init__(self, values, codes):
+        self.values = values
+        self.codes = codes
+        self._numbers = None
+
+    @classmethod
+    def from_values(cls, items):
+        table = {}
+        codes = np.fromiter((table.setdefault(item, len(table)) for item in items), dtype=np.int32)
+        return cls(np.array(list(table), dtype=str) if table else np.array([''], dtype=str), codes)
+
+    def numbers(self):
+        """Distinct values as floats, NaN where a value is not a number."""
+        if self._numbers is None:
+            numbers = np.full(len(self.values), np.nan)
+            present = self.values != ''
+            try:
+                numbers[present] = self.values[present].astype(np.float64)
+            except ValueError:
+                numbers = np.array([_to_float(value) for value in self.values], dtype=np.float64)
+            self._numbers = numbers
+        return self._numbers
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return np.nan
+
+
+class ClaimBatch:
+    """A batch of claims whose columns are built on first use from a field -> values loader.
+
+    load(field) returns one string per claim, or None when the field does not exist in the
+    source; only fields that rules reference are ever materialized.
+    """
+
+    def __init__(self, claim_ids, load):
+        self.claim_ids = claim_ids
+        self.size = len(claim_ids)
+        self._load = load
+        self._columns = {}
+
+    def column(self, field):
+        column = self._columns.get(field)
+        if column is None:
+            items = self._load(field)
+            if items is None:
+                column = Column(np.array([''], dtype=str), np.zeros(self.size, dtype=np.int32))
+            else:
+                column = Column.from_values(items)
+            self._columns[field] = column
+        return column
+
+
+class RuleSet:
+    """Compiled rules of many claim edits, evaluated together against ClaimBatches."""
+
+    def __init__(self, rules):
+        self.edit_ids = []
+        self.rules = []
+        for edit_id, rule in rules:
+            validate_rule(rule)
+            self.edit_ids.append(edit_id)
+            self.rules.append(tuple(_compile(rule.get(part)) for part in ('when', 'require', 'unless')))
+
+    def __len__(self):
+        return len(self.rules)
+
+    def evaluate(self, batch):
+        """Return (claim indexes, edit ids) of every edit that fires, ordered by claim index."""
+        cache = {}
+        claim_parts = []
+        edit_parts = []
+        for edit_id, (when, require, unless) in zip(self.edit_ids, self.rules):
+            fires = ~self._mask(require, batch, cache)
+            if when is not None:
+                fires &= self._mask(when, batch, cache)
+            if unless is not None:
+                fires &= ~self._mask(unless, batch, cache)
+            hits = np.flatnonzero(fires)
+            if hits.size:
+                claim_parts.append(hits)
+                edit_parts.append(np.full(hits.size, edit_id, dtype=np.int64))
+        if not claim_parts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        claims = np.concatenate(claim_parts)
+        edits = np.concatenate(edit_parts)
+        order = np.argsort(claims, kind='stable')
+        return claims[order], edits[order]
+
+    def fired_by_claim(self, batch):
+        """[(claim id, [edit ids])] for the claims of batch that at least one edit fires for."""
+        claims, edits = self.evaluate(batch)
+        if not claims.size:
+            return []
+        starts = np.flatnonzero(np.diff(claims, prepend=-1))
+        groups = np.split(edits, starts[1:])
+        return [(batch.claim_ids[claims[start]], group.tolist()) for start, group in zip(starts, groups)]
+
+    def _mask(self, node, batch, cache):
+        mask = cache.get(node)
+        if mask is not None:
+            return mask
+        kind = node[0]
+        if kind == 'all':
+            mask = np.logical_and.reduce([self._mask(child, batch, cache) for child in node[1]])
+        elif kind == 'any':
+            mask = np.logical_or.reduce([self._mask(child, batch, cache) for child in node[1]])
+        elif kind == 'not':
+            mask = ~self._mask(node[1], batch, cache)
+        else:
+            column = batch.column(node[1])
+            mask = _distinct_mask(column, node[2], node[3])[column.codes]
+        cache[node] = mask
+        return mask
+
+
+def _distinct_mask(column, op, values):
+    # Evaluated over the distinct values only, then gathered per claim by the caller
+    distinct = column.values
+    if op == 'in':
+        return np.isin(distinct, values)
+    if op == 'not_in':
+        return ~np.isin(distinct, values)
+    if op == 'present':
+        return distinct != ''
+    if op == 'absent':
+        return distinct == ''
+    if op == 'starts_with':
+        return np.logical_or.reduce([np.char.startswith(distinct, value) for value in values]) & (distinct != '')
+    if op == 'length_in':
+        return np.isin(np.char.str_len(distinct), [int(value) for value in values]) & (distinct != '')
+    if op == 'matches':
+        patterns = [re.compile(value) for value in values]
+        return np.array([any(pattern.fullmatch(value) for pattern in patterns) for value in distinct], dtype=bool)
+    with np.errstate(invalid='ignore'):
+        return NUMERIC_OPERATORS[op](column.numbers(), float(values[0]))
+
+
+_worker_rules = None
+
+
+def _init_worker(rules):
+    global _worker_rules
+    _worker_rules = RuleSet(rules)
+
+
+def _evaluate_chunk(chunk):
+    from claim_files import build_batch
+    batch = build_batch(chunk)
+    return batch.size, _worker_rules.fired_by_claim(batch)
+
+
+def evaluate_file(path, rules, file_format=None, workers=None, batch_size=None):
+    """Evaluate rules ((edit id, rule) pairs) over a claims file.
+
+    Yields (claims in batch, [(claim id, [edit ids])]) per batch, in file order.
+    """
+    from claim_files import read_chunks, build_batch
+
+    workers = RULE_ENGINE_WORKERS if workers is None else workers
+    chunks = read_chunks(path, file_format, batch_size or CLAIM_BATCH_SIZE)
+    if workers <= 1:
+        rule_set = RuleSet(rules)
+        for chunk in chunks:
+            batch = build_batch(chunk)
+            yield batch.size, rule_set.fired_by_claim(batch)
+        return
+
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                             initargs=(list(rules),)) as executor:
+        # A bounded window of batches in flight keeps memory flat on large files
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(_evaluate_chunk, chunk))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Apply compiled claim edit rules to a file of claims.")
+    parser.add_argument('path', help="CSV, JSON Lines or X12 837 file")
+    parser.add_argument('input_ids', nargs='*', type=int, help="Only the edits of these inputs")
+    parser.add_argument('--format', choices=('csv', 'jsonl', 'x12'), help="Default: from the file extension")
+    parser.add_argument('--workers', type=int, default=RULE_ENGINE_WORKERS)
+    parser.add_argument('--batch-size', type=int, default=CLAIM_BATCH_SIZE)
+    parser.add_argument('--output', help="JSON Lines file of claims with fired edits (default: stdout)")
+    args = parser.parse_args()
+
+    from main import app
+    from claim_rules import load_rules
+
+    with app.app_context():
+        rules = load_rules(args.input_ids or None)
+    if not rules:
+        sys.exit("No compiled rules; run `python claim_rules.py` first")
+
+    started = time.perf_counter()
+    claims = flagged = 0
+    out = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        for batch_claims, fired in evaluate_file(args.path, rules, args.format, args.workers, args.batch_size):
+            claims += batch_claims
+            flagged += len(fired)
+            out.writelines(json.dumps({"claim_id": claim_id, "edit_ids": edit_ids}) + '\n' for claim_id, edit_ids in fired)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    seconds = time.perf_counter() - started
+    print(f"{claims} claims, {flagged} with fired edits, {len(rules)} rules, {seconds:.2f}s "
+          f"({claims / seconds if seconds else 0:,.0f} claims/s)", file=sys.stderr)
@@ -0,0 +1,288 @@
+"""Full-text search over input names, summaries, document pages and claim edits.
+
+search_entries rows are kept in sync on write: input changes made through the ORM are
+picked up when the session flushes, and the bulk claim edit writes in
+generate_claim_edits.py call index_claim_edit_rows / remove_claim_edits directly.
+Documents are indexed page by page, so results point at the page that matched and no
+single row approaches PostgreSQL's tsvector size limit. Pages are indexed once per
+document blob: inputs sharing a blob (mirror URLs, copies) share its page entries, and a
+matching page is reported for the lowest input id that references the blob.
+
+Usage (rebuild the whole index, e.g. after the migration that adds it):
+    python search_index.py
+"""
+import re
+from collections import namedtuple
+from markupsafe import Markup, escape
+from sqlalchemy import select, delete, insert, event, func, literal_column, text, inspect
+from sqlalchemy.orm import Session
+from models import db, Input, ClaimEdit, SearchEntry, DocumentBlob
+from extract_contents import PAGE_START_PATTERN, split_into_pages
+
+SEARCH_CONFIG = 'english'
+SEARCH_KINDS = ('summary', 'page', 'claim_edit')
+# Snippet highlight delimiters; replaced by <mark> after the snippet has been HTML escaped
+MATCH_START, MATCH_END = '\x02', '\x03'
+REINDEX_BATCH_SIZE = 200
+
+SearchResult = namedtuple('SearchResult', [
+    'kind', 'input_id', 'input_name', 'claim_edit_id', 'page', 'title', 'snippet', 'rank'
+])
+
+search_entries = SearchEntry.__table__
+
+
+def summary_row(input_id, name, summary):
+    return {'kind': 'summary', 'input_id': input_id, 'blob_hash': None, 'claim_edit_id': None, 'page': None,
+            'title': name, 'content': summary or ''}
+
+
+def page_rows(document_contents, input_id=None, blob_hash=None):
+    """Page entries of a blob's text, or of an input's inline text (rows from before the blob store)."""
+    rows = []
+    for number, page in enumerate(split_into_pages(document_contents or ''), start=1):
+        marker = PAGE_START_PATTERN.match(page)
+        if marker:
+            number = int(re.search(r'\d+', marker.group()).group())
+            page = page[marker.end():]
+        if page.strip():
+            rows.append({'kind': 'page', 'input_id': input_id, 'blob_hash': blob_hash, 'claim_edit_id': None,
+                         'page': number, 'title': None, 'content': page.strip()})
+    return rows
+
+
+def claim_edit_row(claim_edit_id, input_id, description, message, conditions, non_conditions):
+    content = '\n'.join(part for part in (message, conditions, non_conditions) if part)
+    return {'kind': 'claim_edit', 'input_id': input_id, 'blob_hash': None, 'claim_edit_id': claim_edit_id,
+            'page': None, 'title': description, 'content': content}
+
+
+def index_claim_edit_rows(rows):
+    """Bulk insert entries for (claim_edit_id, input_id, description, message, conditions, non_conditions) tuples."""
+    entries = [claim_edit_row(*row) for row in rows]
+    if entries:
+        db.session.execute(insert(search_entries), entries)
+
+
+def remove_claim_edits(claim_edit_ids=None, input_id=None):
+    """Delete the entries of claim edits, by id or for a whole input (caller commits)."""
+    query = delete(search_entries).where(search_entries.c.kind == 'claim_edit')
+    if input_id is not None:
+        query = query.where(search_entries.c.input_id == input_id)
+    else:
+        if not claim_edit_ids:
+            return
+        query = query.where(search_entries.c.claim_edit_id.in_(claim_edit_ids))
+    db.session.execute(query)
+
+
+def index_summaries(input_ids):
+    """Rewrite the summary entries of inputs changed with bulk UPDATEs, which skip the flush hook."""
+    if not input_ids:
+        return
+    rows = db.session.execute(
+        select(Input.id, Input.document_name, Input.document_summary).where(Input.id.in_(input_ids))
+    ).all()
+    _replace_entries(db.session.connection(), 'summary', input_ids, [summary_row(*row) for row in rows])
+
+
+@event.listens_for(Session, 'after_flush')
+def _sync_inputs(session, flush_context):
+    changed = [obj for obj in list(session.new) + list(session.dirty) if isinstance(obj, Input)]
+    deleted = [obj.id for obj in session.deleted if isinstance(obj, Input)]
+    if not changed and not deleted:
+        return
+    connection = session.connection()
+    if deleted:
+        # SQLite does not enforce the ON DELETE CASCADE of the foreign keys
+        connection.execute(delete(search_entries).where(search_entries.c.input_id.in_(deleted)))
+
+    indexed_blobs = set()
+    for input_doc in changed:
+        state = inspect(input_doc)
+        is_new = input_doc in session.new
+        if is_new or _changed(state, 'document_name', 'document_summary'):
+            _replace_entries(connection, 'summary', [input_doc.id],
+                             [summary_row(input_doc.id, input_doc.document_name, input_doc.document_summary)])
+        if is_new or _changed(state, 'document_blob', '_document_contents'):
+            _index_pages(connection, input_doc, indexed_blobs)
+
+
+def _index_pages(connection, input_doc, indexed_blobs):
+    # Entries of the input's own inline text, if it had any
+    _replace_entries(connection, 'page', [input_doc.id], [])
+    blob_hash = input_doc.document_blob_hash
+    if blob_hash is None:
+        rows = page_rows(input_doc.document_contents, input_id=input_doc.id)
+    elif blob_hash in indexed_blobs or _blob_indexed(connection, blob_hash):
+        # Text shared with another input is already indexed; the old blob's entries are
+        # removed along with the blob by DocumentBlob.delete_unreferenced
+        return
+    else:
+        indexed_blobs.add(blob_hash)
+        rows = page_rows(input_doc.document_contents, blob_hash=blob_hash)
+    if rows:
+        connection.execute(insert(search_entries), rows)
+
+
+def _blob_indexed(connection, blob_hash):
+    return connection.execute(
+        select(search_entries.c.id).where(search_entries.c.kind == 'page', search_entries.c.blob_hash == blob_hash)
+        .limit(1)
+    ).first() is not None
+
+
+def _result_input_id():
+    """Input a search entry is reported for: its own, or the first input referencing its blob."""
+    first_input = select(func.min(Input.id)).where(
+        Input.document_blob_hash == SearchEntry.blob_hash
+    ).correlate(SearchEntry).scalar_subquery()
+    return func.coalesce(SearchEntry.input_id, first_input)
+
+
+def _changed(state, *attributes):
+    return any(state.attrs[attribute].history.has_changes() for attribute in attributes)
+
+
+def _replace_entries(connection, kind, input_ids, rows):
+    connection.execute(delete(search_entries).where(
+        search_entries.c.kind == kind, search_entries.c.input_id.in_(input_ids)
+    ))
+    if rows:
+        connection.execute(insert(search_entries), rows)
+
+
+def search(query, kind=None, page=1, per_page=50):
+    """Ranked matches for a web-search style query; returns (results, has_more).
+
+    Words must all match; "quoted phrases", OR and -excluded words are supported.
+    """
+    if not query or not query.strip():
+        return [], False
+    page = max(1, page)
+    if db.engine.dialect.name == 'postgresql':
+        rows = _search_postgresql(query, kind, per_page + 1, (page - 1) * per_page)
+    else:
+        rows = _search_sqlite(query, kind, per_page + 1, (page - 1) * per_page)
+    results = [SearchResult(*row[:6], highlight(row[6]), row[7]) for row in rows[:per_page]]
+    return results, len(rows) > per_page
+
+
+def _search_postgresql(query, kind, limit, offset):
+    tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+    vector = literal_column('search_entries.search_vector')
+    rank = func.ts_rank_cd(vector, tsquery)
+    matches = select(SearchEntry.id, rank.label('rank')).where(vector.op('@@')(tsquery))
+    if kind:
+        matches = matches.where(SearchEntry.kind == kind)
+    # Rank on the GIN index matches first; snippets are only built for the page returned
+    matches = matches.order_by(rank.desc(), SearchEntry.id).limit(limit).offset(offset).subquery()
+    snippet = func.ts_headline(
+        SEARCH_CONFIG, SearchEntry.content, tsquery,
+        f'StartSel="{MATCH_START}", StopSel="{MATCH_END}", MaxFragments=2, MaxWords=25, MinWords=8'
+    )
+    return db.session.execute(
+        select(SearchEntry.kind, Input.id, Input.document_name, SearchEntry.claim_edit_id,
+               SearchEntry.page, SearchEntry.title, snippet, matches.c.rank)
+        .join(matches, SearchEntry.id == matches.c.id)
+        .join(Input, Input.id == _result_input_id())
+        .order_by(matches.c.rank.desc(), SearchEntry.id)
+    ).all()
+
+
+def _search_sqlite(query, kind, limit, offset):
+    # bm25 is lower-is-better; titles weigh ten times the content, as 'A' over 'B' weights do in PostgreSQL
+    statement = text(f"""
+        SELECT e.kind, i.id, i.document_name, e.claim_edit_id, e.page, e.title,
+               snippet(search_entries_fts, -1, '{MATCH_START}', '{MATCH_END}', '…', 24),
+               -bm25(search_entries_fts, 10.0, 1.0) AS rank
+        FROM search_entries_fts
+        JOIN search_entries e ON e.id = search_entries_fts.rowid
+        JOIN inputs i ON i.id = COALESCE(
+            e.input_id, (SELECT min(m.id) FROM inputs m WHERE m.document_blob_hash = e.blob_hash))
+        WHERE search_entries_fts MATCH :match {'AND e.kind = :kind' if kind else ''}
+        ORDER BY rank DESC, e.id
+        LIMIT :limit OFFSET :offset
+    """)
+    params = {'match': fts5_query(query), 'limit': limit, 'offset': offset}
+    if kind:
+        params['kind'] = kind
+    return db.session.execute(statement, params).all()
+
+
+def fts5_query(query):
+    """Translate web-search syntax into an FTS5 MATCH expression with every term quoted."""
+    parts = []
+    for token in re.findall(r'-?"[^"]*"|\S+', query):
+        if token == 'OR':
+            if parts and parts[-1] != 'OR':
+                parts.append('OR')
+            continue
+        negate = token.startswith('-') and len(token) > 1
+        term = token[1:] if negate else token
+        term = term.strip('"').replace('"', '""')
+        if not term.strip():
+            continue
+        if negate:
+            # FTS5 NOT is binary; a leading exclusion has nothing to subtract from
+            if parts:
+                parts.append(f'NOT "{term}"')
+            continue
+        parts.append(f'"{term}"')
+    while parts and parts[-1] == 'OR':
+        parts.pop()
+    return ' '.join(parts) or '""'
+
+
+def highlight(snippet):
+    """HTML for a snippet: the document text escaped, matched words wrapped in <mark>."""
+    escaped = str(escape(snippet or ''))
+    return Markup(escaped.replace(MATCH_START, '<mark>').replace(MATCH_END, '</mark>'))
+
+
+def reindex_all():
+    """Rebuild every search entry from the inputs and claim edits tables."""
+    db.session.execute(delete(search_entries))
+    total = 0
+    input_ids = db.session.scalars(select(Input.id).order_by(Input.id)).all()
+    for input_id in input_ids:
+        input_doc = db.session.get(Input, input_id)
+        rows = [summary_row(input_id, input_doc.document_name, input_doc.document_summary)]
+        if input_doc.document_blob_hash is None:
+            rows += page_rows(input_doc.document_contents, input_id=input_id)
+        db.session.execute(insert(search_entries), rows)
+        total += len(rows)
+        # Keep one document's text in memory at a time
+        db.session.expunge_all()
+
+    blob_hashes = db.session.scalars(
+        select(Input.document_blob_hash).where(Input.document_blob_hash.isnot(None)).distinct()
+    ).all()
+    for blob_hash in sorted(blob_hashes):
+        rows = page_rows(db.session.get(DocumentBlob, blob_hash).read_text(), blob_hash=blob_hash)
+        if rows:
+            db.session.execute(insert(search_entries), rows)
+            total += len(rows)
+        db.session.expunge_all()
+
+    last_id = 0
+    while True:
+        batch = db.session.execute(
+            select(ClaimEdit.id, ClaimEdit.input_id, ClaimEdit.edit_description, ClaimEdit.edit_message,
+                   ClaimEdit.edit_conditions, ClaimEdit.edit_non_conditions)
+            .where(ClaimEdit.id > last_id).order_by(ClaimEdit.id).limit(REINDEX_BATCH_SIZE)
+        ).all()
+        if not batch:
+            break
+        index_claim_edit_rows(batch)
+        total += len(batch)
+        last_id = batch[-1][0]
+    db.session.commit()
+    return total
+
+
+if __name__ == '__main__':
+    from main import app
+
+    with app.app_context():
+        print(f"Indexed {reindex_all()} search entries")
@@ -37,11 +37,32 @@ document.addEventListener('DOMContentLoaded', function() {
         addInputForm.addEventListener('submit', handleAddInput);
     }
 
+    const addInputsBulkForm = document.getElementById('addInputsBulkForm');
+    if (addInputsBulkForm) {
+        addInputsBulkForm.addEventListener('submit', handleAddInput);
+    }
+
     const importLegacyCodeForm = document.getElementById('importLegacyCodeForm');
     if (importLegacyCodeForm) {
         importLegacyCodeForm.addEventListener('submit', handleAddLegacyCode);
     }
 
+    const loadMoreButton = document.getElementById('loadMoreButton');
+    if (loadMoreButton) {
+        loadMoreButton.addEventListener('click', function() {
+            loadMoreRows(this);
+        });
+    }
+
+    const refreshInputButton = document.getElementById('refreshInputButton');
+    if (refreshInputButton) {
+        refreshInputButton.addEventListener('click', function() {
+            if (!this.disabled) {
+                refreshInput(this.dataset.inputId, this);
+            }
+        });
+    }
+
     const deleteButton = document.getElementById('deleteButton');
     if (deleteButton) {
         // Remove any existing event listeners
@@ -63,6 +84,130 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 });
 
+// Poll a background job until it finishes; resolves with the job result or rejects with its error
+function pollJob(jobId, intervalMs = 2000) {
+    return new Promise((resolve, reject) => {
+        function check() {
+            fetch(`/jobs/${jobId}`)
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`HTTP error! status: ${response.status}`);
+                }
+                return response.json();
+            })
+            .then(data => {
+                const job = data.job;
+                if (job.status === 'succeeded') {
+                    resolve(job.result);
+                } else if (job.status === 'failed') {
+                    reject(new Error(job.error || 'Job failed'));
+                } else {
+                    setTimeout(check, intervalMs);
+                }
+            })
+            .catch(reject);
+        }
+        check();
+    });
+}
+
+// Open a server-sent event stream; resolves with the 'done' payload, rejects on 'failed' or a dropped connection.
+// When the same work is already running as a job the server only names it; the job is polled instead and
+// its result is resolved with fromJob set.
+function streamEvents(url, handlers) {
+    return new Promise((resolve, reject) => {
+        const source = new EventSource(url);
+        Object.entries(handlers).forEach(([name, handler]) => {
+            source.addEventListener(name, event => handler(JSON.parse(event.data)));
+        });
+        source.addEventListener('job', event => {
+            source.close();
+            pollJob(JSON.parse(event.data).job_id)
+            .then(result => resolve({ ...result, fromJob: true }), reject);
+        });
+        source.addEventListener('done', event => {
+            source.close();
+            resolve(JSON.parse(event.data));
+        });
+        source.addEventListener('failed', event => {
+            source.close();
+            reject(new Error(JSON.parse(event.data).error));
+        });
+        source.onerror = () => {
+            // Close instead of letting the browser reconnect and start the work again
+            source.close();
+            reject(new Error('Connection to the server was lost'));
+        };
+    });
+}
+
+function escapeHtml(value) {
+    const element = document.createElement('div');
+    element.textContent = value == null ? '' : String(value);
+    return element.innerHTML;
+}
+
+const listingRowRenderers = {
+    input: item => `
+        <tr>
+            <td><a href="/input/${item.id}">${escapeHtml(item.document_name)}</a></td>
+            <td>
+                ${item.document_summary ? `
+                    <div id="summary-${item.id}" class="editable-summary" data-input-id="${item.id}">
+                        <div class="markdown-content">${item.document_summary_html}</div>
+                        <div class="markdown-source" style="display: none;">${escapeHtml(item.document_summary)}</div>
+                    </div>
+                ` : `<button onclick="generateSummary(${item.id})">✨ Generate Document Summary ✨</button>`}
+            </td>
+        </tr>`,
+    claimEdit: item => `
+        <tr>
+            <td>${item.id}</td>
+            <td><a href="/input/${item.input_id}">${escapeHtml(item.input_name)}</a></td>
+            <td><div class="cell-content">${escapeHtml(item.edit_description)}</div></td>
+            <td><div class="cell-content">${escapeHtml(item.edit_message)}</div></td>
+            <td><div class="cell-content">${escapeHtml(item.edit_conditions)}</div></td>
+            <td><div class="cell-content">${escapeHtml(item.edit_non_conditions)}</div></td>
+        </tr>`
+};
+
+// Append the next keyset page of a listing table from its JSON API
+function loadMoreRows(button) {
+    const url = new URL(button.dataset.apiUrl, window.location.origin);
+    url.searchParams.set('after', button.dataset.nextCursor);
+    const tableBody = document.getElementById(button.dataset.target);
+    const renderRow = listingRowRenderers[button.dataset.rowType];
+
+    button.disabled = true;
+    fetch(url)
+    .then(response => {
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        return response.json();
+    })
+    .then(data => {
+        data.items.forEach(item => {
+            tableBody.insertAdjacentHTML('beforeend', renderRow(item));
+            const summary = document.getElementById(`summary-${item.id}`);
+            if (summary && button.dataset.rowType === 'input') {
+                setupEditableSummary(summary);
+            }
+        });
+        if (data.next_cursor) {
+            button.dataset.nextCursor = data.next_cursor;
+            button.disabled = false;
+        } else {
+            button.remove();
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert(`Error loading more rows: ${error.message}`);
+        button.disabled = false;
+    });
+}
+
 function deleteInput(inputId) {
     if (confirm('Are you sure you want to delete this input?')) {
         fetch(`/input/${inputId}/delete`, {
@@ -83,6 +228,38 @@ function deleteInput(inputId) {
     }
 }
 
+// Re-fetch the source document; only the claim edits of changed pages are regenerated
+function refreshInput(inputId, button) {
+    const status = document.getElementById('refreshInputStatus');
+    button.disabled = true;
+    status.textContent = 'Checking the source document...';
+
+    fetch(`/input/${inputId}/refresh`, {
+        method: 'POST',
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            return pollJob(data.job_id);
+        } else {
+            throw new Error(data.error || "Failed to refresh input");
+        }
+    })
+    .then(result => {
+        status.textContent = result.message;
+        if (result.changed) {
+            window.location.reload();
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        status.textContent = `Error: ${error.message}`;
+    })
+    .finally(() => {
+        button.disabled = false;
+    });
+}
+
 function handleAddInput(event) {
     event.preventDefault();
     const form = event.target;
@@ -104,12 +281,15 @@ function handleAddInput(event) {
     .then(response => response.json())
     .then(data => {
         if (data.success) {
-            alert(data.message);
-            location.reload();
+            return pollJob(data.job_id);
         } else {
             throw new Error(data.error || "Failed to add input");
         }
     })
+    .then(result => {
+        alert(result.message);
+        location.reload();
+    })
     .catch(error => {
         console.error('Error:', error);
         alert(`Error adding input: ${error.message}`);
@@ -123,7 +303,7 @@ function handleAddInput(event) {
     });
     function updateAddInputButtonText() {
         const elapsedSeconds = Math.floor((Date.now() - startTime) / 1000);
-        submitButton.textContent = `🔄 Adding Input... ${elapsedSeconds}s`;
+        submitButton.textContent = `🔄 Adding ${form.id === 'addInputsBulkForm' ? 'Inputs' : 'Input'}... ${elapsedSeconds}s`;
     }
 }
 
@@ -147,13 +327,19 @@ function handleAddLegacyCode(event) {
     })
     .then(response => response.json())
     .then(data => {
-        if (data.success) {
+        if (data.success && !data.job_id) {
             alert(data.message);
-            location.reload();
+        } else if (data.success) {
+            return pollJob(data.job_id)
+                .then(() => alert('Legacy code added and summarized successfully'))
+                .catch(error => alert(`Legacy code added successfully, but summarization failed: ${error.message}`));
         } else {
             throw new Error(data.error || "Failed to add legacy code input");
         }
     })
+    .then(() => {
+        location.reload();
+    })
     .catch(error => {
         console.error('Error:', error);
         alert(`Error adding legacy code input: ${error.message}`);
@@ -184,25 +370,67 @@ function generateEdits(inputId) {
     // Start the timer
     timerInterval = setInterval(updateGenerateButtonText, 1000);
 
-    // Call the generate_edits endpoint
-    fetch(`/input/${inputId}/generate_edits`, {
-        method: 'POST',
-    })
-    .then(response => response.json())
-    .then(data => {
-        console.log('Response data:', data); // For debugging
-        if (data.success) {
+    const tableBody = document.getElementById('claimEditsTable');
+    let received = 0;
+    let request;
+
+    if (window.EventSource) {
+        // Show each edit as soon as the server has stored it
+        request = streamEvents(`/input/${inputId}/generate_edits/stream`, {
+            edit: edit => {
+                if (received === 0) {
+                    // The previous edits are replaced by the new set
+                    tableBody.innerHTML = '';
+                }
+                received += 1;
+                tableBody.insertAdjacentHTML('beforeend', `
+                    <tr>
+                        <td>${edit.id}</td>
+                        <td>${escapeHtml(edit.edit_description)}</td>
+                        <td>${escapeHtml(edit.edit_message)}</td>
+                        <td>${escapeHtml(edit.edit_conditions)}</td>
+                        <td>${escapeHtml(edit.edit_non_conditions)}</td>
+                    </tr>`);
+            }
+        })
+        .then(result => {
+            if (result.fromJob) {
+                // Generated by a request that was already running; show its edits
+                alert(result.message);
+                location.reload();
+                return;
+            }
+            document.getElementById('editResults').textContent = result.message;
+        });
+    } else {
+        // Call the generate_edits endpoint
+        request = fetch(`/input/${inputId}/generate_edits`, {
+            method: 'POST',
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                return pollJob(data.job_id);
+            } else {
+                throw new Error(data.error || "Failed to generate edits");
+            }
+        })
+        .then(result => {
             // Show an alert with the returned string
-            alert(data.message);
+            alert(result.message);
             // Refresh the page to show new edits
             location.reload();
-        } else {
-            throw new Error(data.error || "Failed to generate edits");
-        }
-    })
+        });
+    }
+
+    request
     .catch(error => {
         console.error('Error:', error);
         alert(`Error generating edits: ${error.message}`);
+        if (received > 0) {
+            // The partial new set was discarded on the server, show the previous edits again
+            location.reload();
+        }
     })
     .finally(() => {
         // Stop the timer and reset the button
@@ -218,19 +446,10 @@ function generateEdits(inputId) {
     }
 }
 
+// The summary HTML is rendered and sanitized by the server; the markdown source is kept for editing
 function setupEditableSummary(summary) {
-    const markdownContent = summary.querySelector('.markdown-content');
     const markdownSource = summary.querySelector('.markdown-source');
 
-    if (markdownContent && markdownSource) {
-        let sourceText = markdownSource.textContent;
-        // Convert to string if it's somehow still an array
-        if (Array.isArray(sourceText)) {
-            sourceText = sourceText.join('\n\n');
-        }
-        markdownContent.innerHTML = marked.parse(sourceText);
-    }
-
     summary.addEventListener('dblclick', function() {
         if (!this.querySelector('textarea')) {
             const content = markdownSource ? markdownSource.textContent.trim() : '';
@@ -278,8 +497,8 @@ function saveSummary(summaryElement, newContent) {
         if (data.success) {
             // Recreate the markdown content structure
             summaryElement.innerHTML = `
-                <div class="markdown-content">${marked.parse(newContent)}</div>
-                <div class="markdown-source" style="display: none;">${newContent}</div>
+                <div class="markdown-content">${data.document_summary_html}</div>
+                <div class="markdown-source" style="display: none;">${escapeHtml(newContent)}</div>
             `;
 
             // Re-setup the editable summary
@@ -321,19 +540,22 @@ function generateSummary(inputId) {
     })
     .then(data => {
         if (data.success) {
-            // Convert summary to string if it's an array
-            let summaryText = Array.isArray(data.summary) ? data.summary.join('\n') : data.summary;
-
-            summaryElement.innerHTML = `
-                <div class="markdown-content">${marked.parse(summaryText)}</div>
-                <div class="markdown-source" style="display: none;">${summaryText}</div>
-            `;
-
-            setupEditableSummary(summaryElement);
+            return pollJob(data.job_id);
         } else {
             throw new Error(data.error || "Failed to generate summary");
         }
     })
+    .then(result => {
+        // Convert summary to string if it's an array
+        let summaryText = Array.isArray(result.summary) ? result.summary.join('\n') : result.summary;
+
+        summaryElement.innerHTML = `
+            <div class="markdown-content">${result.summary_html}</div>
+            <div class="markdown-source" style="display: none;">${escapeHtml(summaryText)}</div>
+        `;
+
+        setupEditableSummary(summaryElement);
+    })
     .catch(error => {
         console.error('Error:', error);
         summaryElement.textContent = `Error: ${error.message}`;
@@ -422,6 +644,38 @@ function analyzeConflicts() {
     // Start the timer
     timerInterval = setInterval(updateButtonText, 1000);
 
+    if (window.EventSource) {
+        let received = 0;
+        streamEvents('/analyze_conflicts/stream', {
+            conflict: conflict => {
+                if (received === 0 && !resultsDiv.querySelector('.conflict')) {
+                    resultsDiv.innerHTML = '<h3>Conflict Analysis Results:</h3>';
+                }
+                received += 1;
+                resultsDiv.insertAdjacentHTML('beforeend', renderConflict(conflict));
+            }
+        })
+        .then(result => {
+            if (result.fromJob) {
+                // Analyzed by a request that was already running; show the stored conflicts
+                location.reload();
+                return;
+            }
+            resultsDiv.insertAdjacentHTML('beforeend', `<p>${escapeHtml(result.message)}</p>`);
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            resultsDiv.insertAdjacentHTML('beforeend', `<p>Error analyzing conflicts: ${escapeHtml(error.message)}</p>`);
+        })
+        .finally(() => {
+            clearInterval(timerInterval);
+            analyzeButton.disabled = false;
+            analyzeButton.style.backgroundColor = '';
+            analyzeButton.textContent = '✨ Analyze Claim Edits for Conflicting Logic ✨';
+        });
+        return;
+    }
+
     // Call the analyze_conflicts endpoint
     fetch('/analyze_conflicts', {
         method: 'GET',
@@ -429,12 +683,10 @@ function analyzeConflicts() {
     .then(response => response.json())
     .then(data => {
         if (data.success) {
-            // Parse the summary using marked and create HTML
-            const summaryHtml = marked.parse(data.summary);
-            resultsDiv.innerHTML = `
-                <h3>Conflict Analysis Results:</h3>
-                <div class="markdown-content">${summaryHtml}</div>
-            `;
+            return pollJob(data.job_id).then(() => {
+                // Reload to show the stored conflicts, now including the new edits
+                location.reload();
+            });
         } else {
             resultsDiv.innerHTML = `<p>Error: ${data.error}</p>`;
         }
@@ -455,4 +707,16 @@ function analyzeConflicts() {
         const elapsedSeconds = Math.floor((Date.now() - startTime) / 1000);
         analyzeButton.textContent = `🔄 Analyzing Claim Edits for Conflicting Logic... ${elapsedSeconds} 🔄`;
     }
-}
\ No newline at end of file
+}
+
+function renderConflict(conflict) {
+    const edits = conflict.claim_edits.map(edit =>
+        `<a href="/input/${edit.input_id}">#${edit.id} (${escapeHtml(edit.input_name)})</a>`
+    ).join(', ');
+    return `
+        <div class="conflict">
+            <h3>${escapeHtml(conflict.title)}</h3>
+            <p>Claim Edits: ${edits}</p>
+            <div class="markdown-content">${conflict.details_html}</div>
+        </div>`;
+}
@@ -1,21 +1,37 @@
 import os
 import json
-from openai import OpenAI
 from models import db, Input
+import llm_cache
+from prompt_compaction import compact_for_prompt
+from render_markdown import render_markdown
 
-client = OpenAI(api_key=os.environ['OPENAI_API_KEY'])
-
-def summarize_input(input_id):
+def summarize_input(input_id, force=False):
     # Retrieve the input from the database
     input_doc = Input.query.get_or_404(input_id)
+    payload = build_summary_payload(input_doc.document_contents)
+
+    # Send request to ChatGPT API (identical earlier requests are served from the cache unless forced)
+    content = llm_cache.cached_completion(payload, bypass=force, caller='summarize_input')
+
+    # Extract the summary, generated name, and document type from the response
+    result = json.loads(content)
+    # Update the document_summary, name, and document_type in the database
+    for column, value in summary_columns(result).items():
+        setattr(input_doc, column, value)
+    db.session.commit()
+
+    return result['summary'], result['generated_name']
 
+def build_summary_payload(document_contents):
+    # Drop running headers and footers, and keep within the prompt token budget
+    document_contents = compact_for_prompt(document_contents, 'summarize_input', truncate=True)
     # Prepare the ChatGPT API request
     payload = {
         "model": "gpt-4o-mini", #Mini Model
         # "model": "gpt-4o-2024-08-06",
         "messages": [
             {"role": "system", "content": "You are a helpful assistant that summarizes documents and generates names for them."},
-            {"role": "user", "content": f"Please summarize the following document in three bullet points, each starting with an emoji, and generate a name for it. Format the summary as markdown:\n\n{input_doc.document_contents}"}
+            {"role": "user", "content": f"Please summarize the following document in three bullet points, each starting with an emoji, and generate a name for it. Format the summary as markdown:\n\n{document_contents}"}
         ],
         "response_format": {
             "type": "json_schema",
@@ -45,16 +61,13 @@ def summarize_input(input_id):
         }
     }
 
-    # Send request to ChatGPT API
-    response = client.chat.completions.create(**payload)
+    return payload
 
-    # Extract the summary, generated name, and document type from the response
-    result = json.loads(response.choices[0].message.content)
-
-    # Update the document_summary, name, and document_type in the database
-    input_doc.document_summary = result['summary']
-    input_doc.document_name = result['generated_name']
-    input_doc.document_type = result['document_type']
-    db.session.commit()
-
-    return result['summary'], result['generated_name']
\ No newline at end of file
+def summary_columns(result):
+    """Map a summary response onto Input columns, with the summary rendered to HTML once here."""
+    return {
+        'document_summary': result['summary'],
+        'document_summary_html': str(render_markdown(result['summary'])),
+        'document_name': result['generated_name'],
+        'document_type': result['document_type']
+    }
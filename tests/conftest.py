@@ -0,0 +1,20 @@
+import os
+import sys
+import tempfile
+import pytest
+
+# The application modules live at the repository root, and models.py reads DATABASE_URL on import
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.sqlite'))
+
+
+@pytest.fixture
+def app():
+    from main import app
+    from models import db
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
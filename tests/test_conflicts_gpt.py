@@ -0,0 +1,39 @@
+from datetime import datetime
+from claim_segments import index_claim_edits
+from conflicts_gpt import find_candidate_edits, plan_comparisons
+from models import db, Input, ClaimEdit
+
+
+def add_edits(input_id, conditions, analyzed):
+    edits = [ClaimEdit(input_id=input_id, edit_description=text, edit_conditions=text,
+                       conflicts_analyzed_at=datetime.utcnow() if analyzed else None) for text in conditions]
+    db.session.add_all(edits)
+    db.session.flush()
+    index_claim_edits(edits)
+    return edits
+
+
+def test_only_unindexed_pending_edits_are_compared_with_the_whole_catalog(app):
+    input_doc = Input(document_name='Manual', document_contents='')
+    db.session.add(input_doc)
+    db.session.flush()
+    same_segment, other_segment, no_segment = add_edits(
+        input_doc.id, ['CLM05-1 must be 11', 'NM109 is required', 'Bill the payer'], analyzed=True
+    )
+    indexed, unindexed = add_edits(input_doc.id, ['CLM05 is required', 'Use the right form'], analyzed=False)
+    db.session.commit()
+
+    candidates, rest, unindexed_ids = find_candidate_edits(db.session, [indexed, unindexed])
+
+    assert [edit.id for edit, _ in candidates] == [same_segment.id]
+    assert [edit.id for edit, _ in rest] == [other_segment.id, no_segment.id]
+    assert unindexed_ids == {unindexed.id}
+
+    pending = [(indexed, 'Manual'), (unindexed, 'Manual')]
+    comparisons = plan_comparisons(pending, candidates, [(unindexed, 'Manual')], rest)
+    # New edits of a batch are also compared with each other
+    pairs = {(new.id, other.id) for new_batch, others in comparisons
+             for new, _ in new_batch for other, _ in new_batch + others if other is not new}
+    assert (indexed.id, other_segment.id) not in pairs and (indexed.id, no_segment.id) not in pairs
+    assert {(unindexed.id, edit.id) for edit in (same_segment, other_segment, no_segment)} <= pairs
+    assert (indexed.id, unindexed.id) in pairs and (indexed.id, same_segment.id) in pairs
@@ -0,0 +1,62 @@
+import hashlib
+import document_refresh
+from document_refresh import plan_refresh, refresh_input
+from extract_contents import format_pages, page_hashes
+from models import db, Input, DocumentPage
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, content):
+        self.content = content
+        self.headers = {'Content-Type': 'text/plain', 'ETag': hashlib.sha256(content).hexdigest()}
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        yield self.content
+
+    def close(self):
+        pass
+
+
+class FakeHttp:
+    def __init__(self, content):
+        self.content = content
+
+    def get(self, url, stream=False, headers=None):
+        return FakeResponse(self.content)
+
+
+def no_requests(*args, **kwargs):
+    raise AssertionError("No claim edits should be requested for an input without edits")
+
+
+def test_plan_without_edits_regenerates_nothing():
+    old = page_hashes(format_pages(['first page', 'second page']))
+    new = page_hashes(format_pages(['first page', 'second page, revised', 'third page']))
+    plan = plan_refresh(old, new, [])
+    assert plan.changed_pages == {2, 3}
+    assert plan.regenerate == set()
+
+
+def test_refresh_input_without_edits_only_updates_text(app, monkeypatch):
+    monkeypatch.setattr(document_refresh, 'request_chunks', no_requests)
+    old_contents = format_pages(['Loop 2300 claim rules', 'Loop 2400 service lines'])
+    input_doc = Input(document_name='Manual', document_url='http://example.test/manual.txt',
+                      document_contents=old_contents, content_hash='old')
+    db.session.add(input_doc)
+    db.session.commit()
+
+    new_contents = format_pages(['Loop 2300 claim rules', 'Loop 2400 service lines, revised', 'Appendix'])
+    result = refresh_input(input_doc.id, http=FakeHttp(new_contents.encode('utf-8')))
+
+    assert result.changed and result.changed_pages == 2
+    assert (result.kept, result.removed, result.added, result.requests) == (0, 0, 0, 0)
+    input_doc = db.session.get(Input, input_doc.id)
+    assert input_doc.document_contents == new_contents
+    assert input_doc.content_hash == hashlib.sha256(new_contents.encode('utf-8')).hexdigest()
+    stored = db.session.query(DocumentPage.content_hash).filter_by(input_id=input_doc.id).order_by(DocumentPage.page_number)
+    assert [page_hash for page_hash, in stored] == page_hashes(new_contents)
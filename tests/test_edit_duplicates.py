@@ -0,0 +1,45 @@
+import string
+import numpy as np
+from edit_duplicates import (DUPLICATE_THRESHOLD, LSH_RECALL, SHINGLE_SIZE, band_buckets, edit_text, lsh_shape,
+                             minhash_signatures)
+
+
+def shingles(text):
+    data = text.encode('utf-8').ljust(SHINGLE_SIZE)
+    return {data[start:start + SHINGLE_SIZE] for start in range(len(data) - SHINGLE_SIZE + 1)}
+
+
+def jaccard(a, b):
+    a, b = shingles(a), shingles(b)
+    return len(a & b) / len(a | b)
+
+
+def near_duplicate(rng, text, low, high):
+    """A copy of text with random characters replaced until its shingle similarity falls in [low, high)."""
+    while True:
+        copy = list(text)
+        while jaccard(text, ''.join(copy)) >= high:
+            copy[rng.integers(len(copy))] = rng.choice(list(string.ascii_lowercase))
+        if jaccard(text, ''.join(copy)) >= low:
+            return ''.join(copy)
+
+
+def test_lsh_shape_reaches_recall_at_threshold():
+    bands, rows = lsh_shape(DUPLICATE_THRESHOLD)
+    assert bands * rows == 128
+    assert 1 - (1 - DUPLICATE_THRESHOLD ** rows) ** bands >= LSH_RECALL
+
+
+def test_pairs_just_above_threshold_become_candidates():
+    rng = np.random.default_rng(7)
+    words = ['claim', 'provider', 'modifier', 'units', 'service', 'date', 'diagnosis', 'billing', 'loop', 'segment',
+             'must', 'not', 'exceed', 'when', 'present', 'required', 'ambulance', 'dental', 'revenue', 'code']
+    originals, copies = [], []
+    for _ in range(200):
+        text = edit_text(' '.join(rng.choice(words, 12)), ' '.join(rng.choice(words, 30)))
+        originals.append(text)
+        copies.append(near_duplicate(rng, text, DUPLICATE_THRESHOLD, DUPLICATE_THRESHOLD + 0.05))
+
+    buckets = band_buckets(minhash_signatures(originals + copies))
+    shared = (buckets[:len(originals)] == buckets[len(originals):]).any(axis=1)
+    assert shared.mean() >= 0.97